@@ -0,0 +1,38 @@
+"""orders user keyset index
+
+Revision ID: 20261018_0002
+Revises: 20260127_0001
+Create Date: 2026-10-18 00:02:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_0002"
+down_revision = "20260127_0001"
+branch_labels = None
+depends_on = None
+
+# Covers "orders of a user, newest first" pages: the keyset condition and ORDER BY come
+# from the key columns and every OrderSchema column is in INCLUDE, so pages are served
+# by an index-only scan. It also serves plain user_id lookups, which makes
+# ix_orders_user_id redundant.
+INCLUDED_COLUMNS = ["address_id", "quantity", "status", "total", "created_at"]
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_orders_user_id_id",
+        "orders",
+        ["user_id", sa.text("id DESC")],
+        postgresql_include=INCLUDED_COLUMNS,
+    )
+    op.drop_index("ix_orders_user_id", table_name="orders")
+
+
+def downgrade() -> None:
+    op.create_index("ix_orders_user_id", "orders", ["user_id"])
+    op.drop_index("ix_orders_user_id_id", table_name="orders")
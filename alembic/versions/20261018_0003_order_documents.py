@@ -0,0 +1,168 @@
+"""order documents read model
+
+Revision ID: 20261018_0003
+Revises: 20261018_0002
+Create Date: 2026-10-18 00:03:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_0003"
+down_revision = "20261018_0002"
+branch_labels = None
+depends_on = None
+
+# Same document as orders_core.ORDER_DOCUMENT_SQL (the "json" fetch strategy), frozen
+# here so later edits to the app do not rewrite this migration.
+DOCUMENT_SELECT = """
+SELECT o.id, json_build_object(
+    'order', json_build_object(
+        'id', o.id,
+        'user_id', o.user_id,
+        'address_id', o.address_id,
+        'quantity', o.quantity,
+        'status', o.status,
+        'total', o.total::float8,
+        'created_at', o.created_at
+    ),
+    'user', json_build_object(
+        'id', u.id,
+        'email', u.email,
+        'full_name', u.full_name,
+        'created_at', u.created_at
+    ),
+    'address', json_build_object(
+        'id', a.id,
+        'user_id', a.user_id,
+        'line1', a.line1,
+        'line2', a.line2,
+        'city', a.city,
+        'state', a.state,
+        'postal_code', a.postal_code,
+        'created_at', a.created_at
+    ),
+    'products', items.products
+)::text AS document
+FROM orders o
+JOIN users u ON u.id = o.user_id
+JOIN addresses a ON a.id = o.address_id
+CROSS JOIN LATERAL (
+    SELECT json_agg(
+        json_build_object(
+            'order_item_id', oi.id,
+            'product_id', p.id,
+            'name', p.name,
+            'sku', p.sku,
+            'price', p.price::float8,
+            'quantity', oi.quantity,
+            'unit_price', oi.unit_price::float8
+        )
+        ORDER BY oi.id
+    ) AS products
+    FROM order_items oi
+    JOIN products p ON p.id = oi.product_id
+    WHERE oi.order_id = o.id
+) items
+WHERE o.id = ANY(order_ids) AND items.products IS NOT NULL
+ORDER BY o.id
+"""
+
+# Rebuilds the documents of the given orders and drops those of orders that no longer
+# exist or have no items. Timestamps are rendered in UTC whatever the caller's TimeZone.
+REFRESH_FUNCTION = f"""
+CREATE FUNCTION refresh_order_documents(order_ids int[]) RETURNS void
+LANGUAGE sql SET "TimeZone" = 'UTC' AS $$
+    WITH fresh AS ({DOCUMENT_SELECT}),
+    upserted AS (
+        INSERT INTO order_documents (order_id, document)
+        SELECT id, document FROM fresh
+        ON CONFLICT (order_id) DO UPDATE
+            SET document = EXCLUDED.document, updated_at = now()
+            WHERE order_documents.document IS DISTINCT FROM EXCLUDED.document
+    )
+    DELETE FROM order_documents
+    WHERE order_id = ANY(order_ids) AND order_id NOT IN (SELECT id FROM fresh);
+$$
+"""
+
+# Statement-level triggers: each statement maps its transition table to the affected
+# order ids and refreshes them in one call, however many rows it touched.
+SOURCES = {
+    "orders": (("INSERT", "UPDATE"), "SELECT id FROM {rows}"),
+    "order_items": (("INSERT", "UPDATE", "DELETE"), "SELECT order_id FROM {rows}"),
+    "products": (
+        ("UPDATE",),
+        "SELECT oi.order_id FROM order_items oi JOIN {rows} r ON r.id = oi.product_id",
+    ),
+    "addresses": (
+        ("UPDATE",),
+        "SELECT o.id FROM orders o JOIN {rows} r ON r.id = o.address_id",
+    ),
+    "users": (
+        ("UPDATE",),
+        "SELECT o.id FROM orders o JOIN {rows} r ON r.id = o.user_id",
+    ),
+}
+TRANSITION_TABLES = {
+    "INSERT": "NEW TABLE AS new_rows",
+    "UPDATE": "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+    "DELETE": "OLD TABLE AS old_rows",
+}
+
+
+def trigger_function(table: str, ids_sql: str) -> str:
+    new_ids = ids_sql.format(rows="new_rows")
+    old_ids = ids_sql.format(rows="old_rows")
+    return f"""
+CREATE FUNCTION order_documents_{table}_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_order_documents(ARRAY({new_ids}));
+    ELSIF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_order_documents(ARRAY({new_ids} UNION {old_ids}));
+    ELSE
+        PERFORM refresh_order_documents(ARRAY({old_ids}));
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "order_documents",
+        sa.Column("order_id", sa.Integer(), primary_key=True),
+        sa.Column("document", sa.Text(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.id"], ondelete="CASCADE"),
+    )
+    op.execute(REFRESH_FUNCTION)
+    for table, (events, ids_sql) in SOURCES.items():
+        op.execute(trigger_function(table, ids_sql))
+        for event in events:
+            op.execute(
+                f"CREATE TRIGGER order_documents_{table}_{event.lower()} "
+                f"AFTER {event} ON {table} "
+                f"REFERENCING {TRANSITION_TABLES[event]} "
+                f"FOR EACH STATEMENT EXECUTE FUNCTION order_documents_{table}_changed()"
+            )
+
+
+def downgrade() -> None:
+    for table, (events, _) in SOURCES.items():
+        for event in events:
+            op.execute(f"DROP TRIGGER order_documents_{table}_{event.lower()} ON {table}")
+        op.execute(f"DROP FUNCTION order_documents_{table}_changed()")
+    op.execute("DROP FUNCTION refresh_order_documents(int[])")
+    op.drop_table("order_documents")
@@ -0,0 +1,50 @@
+"""catalog version stamps
+
+Revision ID: 20261018_0004
+Revises: 20261018_0003
+Create Date: 2026-10-18 00:04:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "20261018_0004"
+down_revision = "20261018_0003"
+branch_labels = None
+depends_on = None
+
+# Every statement that writes products bumps the stamp once, so a cached copy of the
+# table (catalog.py) only has to compare one number to know whether it is current.
+BUMP_FUNCTION = """
+CREATE FUNCTION bump_products_catalog_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE catalog_versions SET version = version + 1 WHERE name = 'products';
+    RETURN NULL;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "catalog_versions",
+        sa.Column("name", sa.Text(), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="1"),
+    )
+    op.execute("INSERT INTO catalog_versions (name) VALUES ('products')")
+    op.execute(BUMP_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER products_catalog_version "
+        "AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON products "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_products_catalog_version()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER products_catalog_version ON products")
+    op.execute("DROP FUNCTION bump_products_catalog_version()")
+    op.drop_table("catalog_versions")
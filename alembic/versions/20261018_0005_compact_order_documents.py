@@ -0,0 +1,109 @@
+"""compact order documents
+
+Revision ID: 20261018_0005
+Revises: 20261018_0004
+Create Date: 2026-10-18 00:05:00.000000
+"""
+
+from __future__ import annotations
+
+from alembic import context, op
+from alembic.script import ScriptDirectory
+
+
+revision = "20261018_0005"
+down_revision = "20261018_0004"
+branch_labels = None
+depends_on = None
+
+# Same document as orders_core.ORDER_DOCUMENT_SQL (the "json" fetch strategy), frozen
+# here: compact JSON formatted like the Python encoders, with isoformat() timestamps
+# in UTC and money as repr(float), instead of json_build_object's text.
+DOCUMENT_SELECT = """
+SELECT o.id,
+    '{"order":{"id":' || o.id
+    || ',"user_id":' || o.user_id
+    || ',"address_id":' || o.address_id
+    || ',"quantity":' || o.quantity
+    || ',"status":' || coalesce(to_json(o.status)::text, 'null')
+    || ',"total":' || CASE WHEN o.total = trunc(o.total)
+        THEN trunc(o.total)::text || '.0' ELSE o.total::float8::text END
+    || ',"created_at":"'
+    || to_char(o.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS')
+    || coalesce(nullif(to_char(o.created_at AT TIME ZONE 'UTC', '.US'), '.000000'), '')
+    || '+00:00"},"user":{"id":' || u.id
+    || ',"email":' || coalesce(to_json(u.email)::text, 'null')
+    || ',"full_name":' || coalesce(to_json(u.full_name)::text, 'null')
+    || ',"created_at":"'
+    || to_char(u.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS')
+    || coalesce(nullif(to_char(u.created_at AT TIME ZONE 'UTC', '.US'), '.000000'), '')
+    || '+00:00"},"address":{"id":' || a.id
+    || ',"user_id":' || a.user_id
+    || ',"line1":' || coalesce(to_json(a.line1)::text, 'null')
+    || ',"line2":' || coalesce(to_json(a.line2)::text, 'null')
+    || ',"city":' || coalesce(to_json(a.city)::text, 'null')
+    || ',"state":' || coalesce(to_json(a.state)::text, 'null')
+    || ',"postal_code":' || coalesce(to_json(a.postal_code)::text, 'null')
+    || ',"created_at":"'
+    || to_char(a.created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS')
+    || coalesce(nullif(to_char(a.created_at AT TIME ZONE 'UTC', '.US'), '.000000'), '')
+    || '+00:00"},"products":' || items.products || '}' AS document
+FROM orders o
+JOIN users u ON u.id = o.user_id
+JOIN addresses a ON a.id = o.address_id
+CROSS JOIN LATERAL (
+    SELECT '[' || string_agg(
+        '{"order_item_id":' || oi.id
+        || ',"product_id":' || p.id
+        || ',"name":' || coalesce(to_json(p.name)::text, 'null')
+        || ',"sku":' || coalesce(to_json(p.sku)::text, 'null')
+        || ',"price":' || CASE WHEN p.price = trunc(p.price)
+            THEN trunc(p.price)::text || '.0' ELSE p.price::float8::text END
+        || ',"quantity":' || oi.quantity
+        || ',"unit_price":' || CASE WHEN oi.unit_price = trunc(oi.unit_price)
+            THEN trunc(oi.unit_price)::text || '.0' ELSE oi.unit_price::float8::text END
+        || '}',
+        ',' ORDER BY oi.id
+    ) || ']' AS products
+    FROM order_items oi
+    JOIN products p ON p.id = oi.product_id
+    WHERE oi.order_id = o.id
+) items
+WHERE o.id = ANY(order_ids) AND items.products IS NOT NULL
+ORDER BY o.id
+"""
+
+REFRESH_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION refresh_order_documents(order_ids int[]) RETURNS void
+LANGUAGE sql SET "TimeZone" = 'UTC' AS $$
+    WITH fresh AS ({DOCUMENT_SELECT}),
+    upserted AS (
+        INSERT INTO order_documents (order_id, document)
+        SELECT id, document FROM fresh
+        ON CONFLICT (order_id) DO UPDATE
+            SET document = EXCLUDED.document, updated_at = now()
+            WHERE order_documents.document IS DISTINCT FROM EXCLUDED.document
+    )
+    DELETE FROM order_documents
+    WHERE order_id = ANY(order_ids) AND order_id NOT IN (SELECT id FROM fresh);
+$$
+"""
+
+# Stored documents are rewritten in the new format; without this the "document"
+# strategy would keep serving the old text until each order changes.
+REBUILD_DOCUMENTS = (
+    "SELECT refresh_order_documents(ARRAY(SELECT order_id FROM order_documents))"
+)
+
+
+def upgrade() -> None:
+    op.execute(REFRESH_FUNCTION)
+    op.execute(REBUILD_DOCUMENTS)
+
+
+def downgrade() -> None:
+    # The previous definition is the one 20261018_0003 created.
+    script = ScriptDirectory.from_config(context.config)
+    previous = script.get_revision("20261018_0003").module.REFRESH_FUNCTION
+    op.execute(previous.replace("CREATE FUNCTION", "CREATE OR REPLACE FUNCTION", 1))
+    op.execute(REBUILD_DOCUMENTS)
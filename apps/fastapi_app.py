@@ -1,47 +1,110 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
 
-from cache import clear_cache, get_cached_json, order_cache_key, set_cached_json
-from db import AsyncSessionLocal
-from orders_service import fetch_order_by_id, fetch_order_lite
-from schemas import OrderResponse, OrderSchema
+from cache import init_cache
+from catalog import start_catalog
+from metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
+from orders_service import (
+    load_order_batch_payload,
+    load_order_payload,
+    load_user_orders_payload,
+    parse_export_range,
+    parse_order_ids,
+    parse_page_params,
+    start_order_existence_filter,
+    stream_order_export,
+)
+from profiler import PROFILE_ADMIN, install_profiler, request_profile, uninstall_profiler
+from schemas import OrderResponse, OrderSchema, UserOrdersPage
 
 app = FastAPI()
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+
+def json_response(payload: bytes | str) -> Response:
+    return Response(content=payload, media_type="application/json")
 
 
 @app.on_event("startup")
-async def clear_cache_on_startup() -> None:
-    await clear_cache()
+async def init_cache_on_startup() -> None:
+    await init_cache()
+    await start_catalog()
+    await start_order_existence_filter()
+    install_profiler()
 
 
-@app.get("/orders/{order_id}", response_model=OrderResponse)
-async def get_order(order_id: int) -> OrderResponse:
-    cache_key = order_cache_key(order_id, lite=False)
-    cached = await get_cached_json(cache_key)
-    if cached is not None:
-        return OrderResponse.model_validate_json(cached)
+@app.on_event("shutdown")
+async def uninstall_profiler_on_shutdown() -> None:
+    uninstall_profiler()
 
-    async with AsyncSessionLocal() as session:
-        data = await fetch_order_by_id(session, order_id)
 
-    if data is None:
-        raise HTTPException(status_code=404, detail="No orders found")
+async def batch_response(ids: str, lite: bool) -> Response:
+    try:
+        order_ids = parse_order_ids(ids)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from None
+    return json_response(await load_order_batch_payload(order_ids, lite=lite))
 
-    await set_cached_json(cache_key, data.model_dump_json())
-    return data
 
+@app.get("/metrics")
+async def get_metrics() -> Response:
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+if PROFILE_ADMIN:
+
+    @app.post("/admin/profile", status_code=202)
+    async def profile_workers(seconds: float = Query(30, gt=0)) -> dict:
+        return request_profile(seconds)
+
+
+@app.get("/orders")
+async def get_orders(ids: str = Query(...)) -> Response:
+    return await batch_response(ids, lite=False)
 
-@app.get("/orders/{order_id}/lite", response_model=OrderSchema)
-async def get_order_lite(order_id: int) -> OrderSchema:
-    cache_key = order_cache_key(order_id, lite=True)
-    cached = await get_cached_json(cache_key)
-    if cached is not None:
-        return OrderSchema.model_validate_json(cached)
 
-    async with AsyncSessionLocal() as session:
-        data = await fetch_order_lite(session, order_id)
+@app.get("/orders/lite")
+async def get_orders_lite(ids: str = Query(...)) -> Response:
+    return await batch_response(ids, lite=True)
 
-    if data is None:
+
+# Declared before /orders/{order_id} so "export" is not parsed as an id.
+@app.get("/orders/export")
+async def export_orders(
+    from_id: str | None = None, to_id: str | None = None
+) -> StreamingResponse:
+    try:
+        start, end = parse_export_range(from_id, to_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from None
+    return StreamingResponse(
+        stream_order_export(start, end), media_type="application/x-ndjson"
+    )
+
+
+@app.get("/orders/{order_id}", response_model=OrderResponse)
+async def get_order(order_id: int) -> Response:
+    payload = await load_order_payload(order_id, lite=False)
+    if payload is None:
         raise HTTPException(status_code=404, detail="No orders found")
+    return json_response(payload)
+
+
+@app.get("/orders/{order_id}/lite", response_model=OrderSchema)
+async def get_order_lite(order_id: int) -> Response:
+    payload = await load_order_payload(order_id, lite=True)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="No orders found")
+    return json_response(payload)
+
 
-    await set_cached_json(cache_key, data.model_dump_json())
-    return data
+@app.get("/users/{user_id}/orders", response_model=UserOrdersPage)
+async def get_user_orders(
+    user_id: int, cursor: str | None = None, limit: str | None = None
+) -> Response:
+    try:
+        before_id, page_size = parse_page_params(user_id, cursor, limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from None
+    return json_response(await load_user_orders_payload(user_id, before_id, page_size))
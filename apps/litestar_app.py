@@ -1,41 +1,112 @@
-from litestar import Litestar, get
+from typing import Annotated
 
-from cache import clear_cache, get_cached_json, order_cache_key, set_cached_json
-from db import AsyncSessionLocal
-from orders_service import fetch_order_by_id, fetch_order_lite
-from schemas import OrderResponse, OrderSchema
+from litestar import Litestar, MediaType, Response, get, post
+from litestar.params import Parameter
+from litestar.response import Stream
+
+from cache import init_cache
+from catalog import start_catalog
+from metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
+from orders_service import (
+    load_order_batch_payload,
+    load_order_payload,
+    load_user_orders_payload,
+    parse_export_range,
+    parse_order_ids,
+    parse_page_params,
+    start_order_existence_filter,
+    stream_order_export,
+)
+from profiler import PROFILE_ADMIN, install_profiler, request_profile, uninstall_profiler
+
+
+def json_response(payload: bytes | str) -> Response:
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return Response(content=payload, media_type=MediaType.JSON)
+
+
+async def batch_response(ids: str, lite: bool) -> Response:
+    try:
+        order_ids = parse_order_ids(ids)
+    except ValueError as exc:
+        return Response(content={"detail": str(exc)}, status_code=400)
+    return json_response(await load_order_batch_payload(order_ids, lite=lite))
+
+
+@get("/metrics")
+async def get_metrics() -> Response:
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
 
-@get("/orders/{order_id:int}")
-async def get_order(order_id: int) -> dict:
-    cache_key = order_cache_key(order_id, lite=False)
-    cached = await get_cached_json(cache_key)
-    if cached is not None:
-        return OrderResponse.model_validate_json(cached).model_dump()
 
-    async with AsyncSessionLocal() as session:
-        data = await fetch_order_by_id(session, order_id)
+@post("/admin/profile", status_code=202)
+async def profile_workers(seconds: Annotated[float, Parameter(gt=0)] = 30) -> dict:
+    return request_profile(seconds)
 
-    if data is None:
-        return {"detail": "No orders found"}
 
-    await set_cached_json(cache_key, data.model_dump_json())
-    return data.model_dump()
+@get("/orders")
+async def get_orders(ids: str) -> Response:
+    return await batch_response(ids, lite=False)
+
+
+@get("/orders/lite")
+async def get_orders_lite(ids: str) -> Response:
+    return await batch_response(ids, lite=True)
+
+
+@get("/orders/export")
+async def export_orders(from_id: str | None = None, to_id: str | None = None) -> Response:
+    try:
+        start, end = parse_export_range(from_id, to_id)
+    except ValueError as exc:
+        return Response(content={"detail": str(exc)}, status_code=400)
+    return Stream(stream_order_export(start, end), media_type="application/x-ndjson")
+
+
+@get("/orders/{order_id:int}")
+async def get_order(order_id: int) -> Response:
+    payload = await load_order_payload(order_id, lite=False)
+    if payload is None:
+        return Response(content={"detail": "No orders found"})
+    return json_response(payload)
 
 
 @get("/orders/{order_id:int}/lite")
-async def get_order_lite(order_id: int) -> dict:
-    cache_key = order_cache_key(order_id, lite=True)
-    cached = await get_cached_json(cache_key)
-    if cached is not None:
-        return OrderSchema.model_validate_json(cached).model_dump()
+async def get_order_lite(order_id: int) -> Response:
+    payload = await load_order_payload(order_id, lite=True)
+    if payload is None:
+        return Response(content={"detail": "No orders found"})
+    return json_response(payload)
 
-    async with AsyncSessionLocal() as session:
-        data = await fetch_order_lite(session, order_id)
 
-    if data is None:
-        return {"detail": "No orders found"}
+@get("/users/{user_id:int}/orders")
+async def get_user_orders(
+    user_id: int, cursor: str | None = None, limit: str | None = None
+) -> Response:
+    try:
+        before_id, page_size = parse_page_params(user_id, cursor, limit)
+    except ValueError as exc:
+        return Response(content={"detail": str(exc)}, status_code=400)
+    return json_response(await load_user_orders_payload(user_id, before_id, page_size))
 
-    await set_cached_json(cache_key, data.model_dump_json())
-    return data.model_dump()
 
-app = Litestar(route_handlers=[get_order, get_order_lite], on_startup=[clear_cache])
+app = Litestar(
+    route_handlers=[
+        get_metrics,
+        get_orders,
+        get_orders_lite,
+        export_orders,
+        get_order,
+        get_order_lite,
+        get_user_orders,
+        *([profile_workers] if PROFILE_ADMIN else []),
+    ],
+    on_startup=[
+        init_cache,
+        start_catalog,
+        start_order_existence_filter,
+        install_profiler,
+    ],
+    on_shutdown=[uninstall_profiler],
+    middleware=[MetricsMiddleware] if METRICS_ENABLED else [],
+)
@@ -1,50 +1,138 @@
 from __future__ import annotations
 
-import json as pyjson
-
 from sanic import Sanic
-from sanic.response import json
+from sanic.response import json, raw, text
 
-from cache import clear_cache, get_cached_json, order_cache_key, set_cached_json
-from db import AsyncSessionLocal
-from orders_service import fetch_order_by_id, fetch_order_lite
+from cache import init_cache
+from catalog import start_catalog
+from metrics import (
+    METRICS_ENABLED,
+    METRICS_PATH,
+    begin_request,
+    end_request,
+    finish_request,
+    render_metrics,
+)
+from orders_service import (
+    load_order_batch_payload,
+    load_order_payload,
+    load_user_orders_payload,
+    parse_export_range,
+    parse_order_ids,
+    parse_page_params,
+    start_order_existence_filter,
+    stream_order_export,
+)
+from profiler import PROFILE_ADMIN, install_profiler, request_profile, uninstall_profiler
 
 app = Sanic("perf_test")
 
 
+def json_response(payload: bytes | str):
+    return raw(payload, content_type="application/json")
+
+
 @app.before_server_start
-async def clear_cache_on_startup(app):
-    await clear_cache()
+async def init_cache_on_startup(app):
+    await init_cache()
+    await start_catalog()
+    await start_order_existence_filter()
+    install_profiler()
 
-@app.get("/orders/<order_id:int>")
-async def get_order(request, order_id: int):
-    cache_key = order_cache_key(order_id, lite=False)
-    cached = await get_cached_json(cache_key)
-    if cached is not None:
-        return json(pyjson.loads(cached), status=200)
 
-    async with AsyncSessionLocal() as session:
-        data = await fetch_order_by_id(session, order_id)
+@app.after_server_stop
+async def uninstall_profiler_on_stop(app):
+    uninstall_profiler()
 
-    if data is None:
-        return json({"detail": "No orders found"}, status=404)
 
-    await set_cached_json(cache_key, data.model_dump_json())
-    return json(data.model_dump())
+if METRICS_ENABLED:
 
+    @app.on_request
+    async def start_timing(request):
+        if request.path != METRICS_PATH:
+            request.ctx.timing = begin_request()
 
-@app.get("/orders/<order_id:int>/lite")
-async def get_order_lite(request, order_id: int):
-    cache_key = order_cache_key(order_id, lite=True)
-    cached = await get_cached_json(cache_key)
-    if cached is not None:
-        return json(pyjson.loads(cached), status=200)
+    @app.on_response
+    async def add_server_timing(request, response):
+        timing = getattr(request.ctx, "timing", None)
+        if timing is not None:
+            token, timings = timing
+            response.headers["Server-Timing"] = finish_request(timings, request.path)
+            end_request(token)
+
+
+async def batch_response(request, lite: bool):
+    try:
+        order_ids = parse_order_ids(request.args.get("ids"))
+    except ValueError as exc:
+        return json({"detail": str(exc)}, status=400)
+    return json_response(await load_order_batch_payload(order_ids, lite=lite))
+
+
+@app.get(METRICS_PATH)
+async def get_metrics(request):
+    return text(render_metrics(), content_type="text/plain; version=0.0.4")
+
+
+if PROFILE_ADMIN:
+
+    @app.post("/admin/profile")
+    async def profile_workers(request):
+        try:
+            seconds = float(request.args.get("seconds", 30))
+        except ValueError:
+            return json({"detail": "seconds must be a number"}, status=400)
+        if seconds <= 0:
+            return json({"detail": "seconds must be positive"}, status=400)
+        return json(request_profile(seconds), status=202)
 
-    async with AsyncSessionLocal() as session:
-        data = await fetch_order_lite(session, order_id)
 
-    if data is None:
+@app.get("/orders")
+async def get_orders(request):
+    return await batch_response(request, lite=False)
+
+
+@app.get("/orders/lite")
+async def get_orders_lite(request):
+    return await batch_response(request, lite=True)
+
+
+@app.get("/orders/export")
+async def export_orders(request):
+    try:
+        start, end = parse_export_range(
+            request.args.get("from_id"), request.args.get("to_id")
+        )
+    except ValueError as exc:
+        return json({"detail": str(exc)}, status=400)
+    response = await request.respond(content_type="application/x-ndjson")
+    async for chunk in stream_order_export(start, end):
+        await response.send(chunk)
+    await response.eof()
+
+
+@app.get("/orders/<order_id:int>")
+async def get_order(request, order_id: int):
+    payload = await load_order_payload(order_id, lite=False)
+    if payload is None:
         return json({"detail": "No orders found"}, status=404)
+    return json_response(payload)
+
+
+@app.get("/orders/<order_id:int>/lite")
+async def get_order_lite(request, order_id: int):
+    payload = await load_order_payload(order_id, lite=True)
+    if payload is None:
+        return json({"detail": "No orders found"}, status=404)
+    return json_response(payload)
+
 
-    await set_cached_json(cache_key, data.model_dump_json())
-    return json(data.model_dump())
+@app.get("/users/<user_id:int>/orders")
+async def get_user_orders(request, user_id: int):
+    try:
+        before_id, page_size = parse_page_params(
+            user_id, request.args.get("cursor"), request.args.get("limit")
+        )
+    except ValueError as exc:
+        return json({"detail": str(exc)}, status=400)
+    return json_response(await load_user_orders_payload(user_id, before_id, page_size))
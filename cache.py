@@ -1,15 +1,254 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import os
+import secrets
+import socket
+import tempfile
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import TypeVar
 
 from redis.asyncio import Redis
+from redis.exceptions import RedisError, WatchError
+
+from shared_cache import SharedCache
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 ORDER_CACHE_TTL = int(os.getenv("ORDER_CACHE_TTL", "0"))
+CACHE_SOFT_TTL = float(os.getenv("CACHE_SOFT_TTL", "0"))
 APP_NAME = os.getenv("APP_NAME", "app")
 CACHE_PREFIX = os.getenv("CACHE_PREFIX", f"orders:{APP_NAME}")
+LOCAL_CACHE_MAX_BYTES = int(os.getenv("LOCAL_CACHE_MAX_BYTES", "0"))
+LOCAL_CACHE_TTL = float(os.getenv("LOCAL_CACHE_TTL", "0"))
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", "0"))
+SHARED_CACHE_TTL = float(os.getenv("SHARED_CACHE_TTL", "0"))
+SHARED_CACHE_SLOT_BYTES = int(os.getenv("SHARED_CACHE_SLOT_BYTES", "4096"))
+SHARED_CACHE_WAYS = int(os.getenv("SHARED_CACHE_WAYS", "8"))
+SHARED_CACHE_STRIPES = int(os.getenv("SHARED_CACHE_STRIPES", "64"))
+SHARED_CACHE_DIR = Path(
+    os.getenv(
+        "SHARED_CACHE_DIR",
+        "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+    )
+)
+CACHE_FILL_LOCK_MS = int(os.getenv("CACHE_FILL_LOCK_MS", "0"))
+CACHE_FILL_POLL_MS = int(os.getenv("CACHE_FILL_POLL_MS", "5"))
+CACHE_FLUSH_WAIT = float(os.getenv("CACHE_FLUSH_WAIT", "10"))
+CACHE_RECLAIM_BATCH = int(os.getenv("CACHE_RECLAIM_BATCH", "500"))
+CACHE_RECLAIM_PAUSE_MS = int(os.getenv("CACHE_RECLAIM_PAUSE_MS", "10"))
+
+
+def _default_deployment_id() -> str:
+    # Workers spawned by one uvicorn/granian supervisor share its pid and start time.
+    parent = os.getppid()
+    try:
+        with open(f"/proc/{parent}/stat") as stat:
+            started = stat.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        started = "0"
+    return f"{socket.gethostname()}:{parent}:{started}"
+
+
+DEPLOYMENT_ID = os.getenv("DEPLOYMENT_ID") or _default_deployment_id()
+
+if CACHE_SOFT_TTL > 0 and 0 < ORDER_CACHE_TTL <= CACHE_SOFT_TTL:
+    raise ValueError("CACHE_SOFT_TTL must be shorter than ORDER_CACHE_TTL")
+
+# With CACHE_SOFT_TTL (stale-while-revalidate), every cached order payload is stored
+# behind its soft and hard expiry, in milliseconds since the epoch (0: never). Past the
+# soft expiry an entry is served as stale and refreshed in the background; past the hard
+# expiry (ORDER_CACHE_TTL, also the Redis TTL) it is a miss in every tier.
+_EXPIRY_DIGITS = 13
+_ENVELOPE_SIZE = 2 * _EXPIRY_DIGITS
+
+T = TypeVar("T")
 
 _redis_client: Redis | None = None
+_redis_bytes_client: Redis | None = None
+_generation = 0
+_background_tasks: set[asyncio.Task] = set()
+
+
+class LocalCache:
+    """Per-process LRU in front of Redis, bounded by payload bytes."""
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at and expires_at < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        """ttl caps the entry below self.ttl (a copy's remaining lifetime elsewhere)."""
+        entry_size = len(key) + len(value)
+        if entry_size > self.max_bytes or (ttl is not None and ttl <= 0):
+            return
+        if key in self._entries:
+            self._remove(key)
+        if ttl is None or 0 < self.ttl < ttl:
+            ttl = self.ttl
+        expires_at = time.monotonic() + ttl if ttl > 0 else 0.0
+        self._entries[key] = (value, expires_at)
+        self.size += entry_size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self.size -= len(key) + len(value)
+
+
+class StaleWhileRevalidate:
+    """Lookup counters, and at most one background refresh per stale key."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshed = 0
+        self.refresh_skipped = 0
+        self.refresh_failed = 0
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    def record(self, cached: bytes | None, stale: bool) -> None:
+        if cached is None:
+            self.misses += 1
+        elif stale:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+
+    def revalidate(
+        self, keys: list[str], refresh: Callable[[list[str]], Awaitable[int]]
+    ) -> None:
+        """Refresh the keys without a refresh in flight; refresh returns how many it did."""
+        pending = [key for key in keys if key not in self._refreshing]
+        if not pending:
+            return
+        # A fresh context, so the refresh is not timed as part of the request.
+        task = asyncio.get_running_loop().create_task(
+            self._run(pending, refresh), context=contextvars.Context()
+        )
+        for key in pending:
+            self._refreshing[key] = task
+
+        def done(_: asyncio.Task) -> None:
+            for key in pending:
+                self._refreshing.pop(key, None)
+
+        task.add_done_callback(done)
+
+    async def _run(
+        self, keys: list[str], refresh: Callable[[list[str]], Awaitable[int]]
+    ) -> None:
+        try:
+            refreshed = await refresh(keys)
+        except Exception:
+            # Stale entries keep being served until their hard expiry.
+            self.refresh_failed += len(keys)
+            return
+        self.refreshed += refreshed
+        self.refresh_skipped += len(keys) - refreshed
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshed": self.refreshed,
+            "refresh_skipped": self.refresh_skipped,
+            "refresh_failed": self.refresh_failed,
+            "refreshing": len(self._refreshing),
+        }
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one in-flight task."""
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda _: self._calls.pop(key, None))
+        # Shielded so a cancelled caller does not cancel the fill for the others.
+        return await asyncio.shield(call)
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+def _capped_ttl(ttl: float) -> float:
+    """A tier in front of Redis never keeps entries longer than Redis does."""
+    if ttl > 0 and ORDER_CACHE_TTL > 0:
+        return min(ttl, ORDER_CACHE_TTL)
+    return ttl or ORDER_CACHE_TTL
+
+
+def _shared_cache_path() -> Path:
+    # One segment per cache prefix: a restarted deployment reuses it, and clear_cache()
+    # empties it when that deployment moves to a new generation.
+    name = CACHE_PREFIX.replace(":", "_").replace("/", "_")
+    return SHARED_CACHE_DIR / f"perf_test_cache-{name}.bin"
+
+
+_local_cache: LocalCache | None = (
+    LocalCache(LOCAL_CACHE_MAX_BYTES, _capped_ttl(LOCAL_CACHE_TTL))
+    if LOCAL_CACHE_MAX_BYTES > 0
+    else None
+)
+_shared_cache: SharedCache | None = (
+    SharedCache(
+        _shared_cache_path(),
+        SHARED_CACHE_MAX_BYTES,
+        SHARED_CACHE_SLOT_BYTES,
+        SHARED_CACHE_WAYS,
+        SHARED_CACHE_STRIPES,
+        _capped_ttl(SHARED_CACHE_TTL),
+    )
+    if SHARED_CACHE_MAX_BYTES > 0
+    else None
+)
 
 
 def get_redis() -> Redis:
@@ -19,31 +258,396 @@ def get_redis() -> Redis:
     return _redis_client
 
 
+def get_redis_bytes() -> Redis:
+    global _redis_bytes_client
+    if _redis_bytes_client is None:
+        _redis_bytes_client = Redis.from_url(REDIS_URL, decode_responses=False)
+    return _redis_bytes_client
+
+
+def generation_key() -> str:
+    return f"{CACHE_PREFIX}:generation"
+
+
+def current_generation() -> int:
+    return _generation
+
+
 def order_cache_key(order_id: int, lite: bool) -> str:
     suffix = "lite" if lite else "full"
-    return f"{CACHE_PREFIX}:{suffix}:{order_id}"
+    return f"{CACHE_PREFIX}:g{_generation}:{suffix}:{order_id}"
+
+
+def user_orders_cache_key(user_id: int) -> str:
+    return f"{CACHE_PREFIX}:g{_generation}:user_orders:{user_id}"
+
+
+def user_orders_version_key(user_id: int) -> str:
+    return f"{user_orders_cache_key(user_id)}:version"
+
+
+def local_cache_stats() -> dict[str, int] | None:
+    if _local_cache is None:
+        return None
+    return _local_cache.stats()
+
+
+def shared_cache_stats() -> dict[str, int] | None:
+    if _shared_cache is None:
+        return None
+    return _shared_cache.stats()
+
+
+def _wrap(value: bytes) -> bytes:
+    if CACHE_SOFT_TTL <= 0:
+        return value
+    now = time.time()
+    soft = int((now + CACHE_SOFT_TTL) * 1000)
+    hard = int((now + ORDER_CACHE_TTL) * 1000) if ORDER_CACHE_TTL > 0 else 0
+    return b"%013d%013d" % (soft, hard) + value
+
+
+def _unwrap(value: bytes | None) -> tuple[bytes | None, bool]:
+    """(payload, stale); the payload is None once the hard expiry has passed."""
+    if value is None or CACHE_SOFT_TTL <= 0:
+        return value, False
+    now = int(time.time() * 1000)
+    hard = int(value[_EXPIRY_DIGITS:_ENVELOPE_SIZE])
+    if hard and hard <= now:
+        return None, False
+    return value[_ENVELOPE_SIZE:], int(value[:_EXPIRY_DIGITS]) <= now
+
+
+def _envelope_ttl(value: bytes) -> float | None:
+    """Seconds until an envelope's hard expiry; None when it has none."""
+    hard = int(value[_EXPIRY_DIGITS:_ENVELOPE_SIZE])
+    return hard / 1000 - time.time() if hard else None
+
+
+async def _redis_get_many(keys: list[str]) -> list[tuple[bytes | None, float | None]]:
+    """Values and the seconds each Redis copy has left (None: no expiry), so copies
+    into the in-memory tiers never outlive the Redis copy they came from."""
+    redis = get_redis_bytes()
+    if CACHE_SOFT_TTL > 0 or ORDER_CACHE_TTL <= 0 or (
+        _local_cache is None and _shared_cache is None
+    ):
+        values = await redis.mget(keys)
+        if CACHE_SOFT_TTL <= 0:
+            return [(value, None) for value in values]
+        return [
+            (value, _envelope_ttl(value) if value is not None else None)
+            for value in values
+        ]
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.mget(keys)
+        for key in keys:
+            pipe.pttl(key)
+        values, *pttls = await pipe.execute()
+    return [
+        (value, pttl / 1000 if pttl >= 0 else None)
+        for value, pttl in zip(values, pttls)
+    ]
+
+
+def _get_in_memory(key: str) -> bytes | None:
+    """The per-worker LRU, then the shared segment (copying hits into the LRU)."""
+    if _local_cache is not None:
+        cached = _local_cache.get(key)
+        if cached is not None:
+            return cached
+    if _shared_cache is None:
+        return None
+    cached, expires_at = _shared_cache.get_with_expiry(key)
+    if cached is not None and _local_cache is not None:
+        _local_cache.set(key, cached, expires_at - time.time() if expires_at else None)
+    return cached
+
+
+def _set_in_memory(key: str, value: bytes, ttl: float | None = None) -> None:
+    if _local_cache is not None:
+        _local_cache.set(key, value, ttl)
+    if _shared_cache is not None:
+        _shared_cache.set(key, value, ttl)
 
 
 async def get_cached_json(key: str) -> str | None:
-    return await get_redis().get(key)
+    if _local_cache is None and _shared_cache is None and CACHE_SOFT_TTL <= 0:
+        return await get_redis().get(key)
+    cached = await get_cached_bytes(key)
+    return cached.decode() if cached is not None else None
+
+
+async def get_cached_bytes(key: str) -> bytes | None:
+    return (await get_cached_entry(key))[0]
+
+
+async def get_cached_entry(key: str) -> tuple[bytes | None, bool]:
+    """Cached payload and whether it is past its soft TTL (never without CACHE_SOFT_TTL)."""
+    cached = _get_in_memory(key)
+    if cached is None:
+        [(cached, ttl)] = await _redis_get_many([key])
+        if cached is not None:
+            _set_in_memory(key, cached, ttl)
+    return _unwrap(cached)
+
+
+async def get_many_cached_bytes(keys: list[str]) -> list[bytes | None]:
+    return [payload for payload, _ in await get_many_cached_entries(keys)]
+
+
+async def get_many_cached_entries(keys: list[str]) -> list[tuple[bytes | None, bool]]:
+    results: list[bytes | None] = [None] * len(keys)
+    pending: list[int] = []
+    for index, key in enumerate(keys):
+        results[index] = _get_in_memory(key)
+        if results[index] is None:
+            pending.append(index)
+    if pending:
+        values = await _redis_get_many([keys[index] for index in pending])
+        for index, (value, ttl) in zip(pending, values):
+            if value is not None:
+                results[index] = value
+                _set_in_memory(keys[index], value, ttl)
+    return [_unwrap(value) for value in results]
 
 
-async def set_cached_json(key: str, value: str) -> None:
+async def adopt_refreshed_entries(keys: list[str]) -> list[str]:
+    """Copy entries another worker already refreshed from Redis into the in-memory
+    tiers; returns the keys that are still stale or gone."""
+    values = await get_redis_bytes().mget(keys)
+    stale = []
+    for key, value in zip(keys, values):
+        payload, is_stale = _unwrap(value)
+        if payload is None or is_stale:
+            stale.append(key)
+        else:
+            _set_in_memory(key, value, _envelope_ttl(value))
+    return stale
+
+
+async def set_cached_json(key: str, value: str | bytes) -> None:
+    value = _wrap(value.encode() if isinstance(value, str) else value)
+    _set_in_memory(key, value)
     if ORDER_CACHE_TTL > 0:
         await get_redis().set(key, value, ex=ORDER_CACHE_TTL)
     else:
         await get_redis().set(key, value)
 
 
+async def set_many_cached_json(items: dict[str, bytes]) -> None:
+    if not items:
+        return
+    async with get_redis_bytes().pipeline(transaction=False) as pipe:
+        for key, value in items.items():
+            value = _wrap(value)
+            _set_in_memory(key, value)
+            if ORDER_CACHE_TTL > 0:
+                pipe.set(key, value, ex=ORDER_CACHE_TTL)
+            else:
+                pipe.set(key, value)
+        await pipe.execute()
+
+
+# First pages of a user's order listing live in one hash per user (one field per page
+# size), next to a version counter. A fill only lands if the version it read before
+# querying Postgres is still current, so a page read before an invalidation can never
+# be written back after it. The in-memory tiers are bypassed: they have no version to
+# check a fill against.
+
+
+async def get_user_orders_page(user_id: int, limit: int) -> tuple[bytes | None, int]:
+    """Cached first page and the version to pass to set_user_orders_page on a miss."""
+    async with get_redis_bytes().pipeline(transaction=False) as pipe:
+        pipe.get(user_orders_version_key(user_id))
+        pipe.hget(user_orders_cache_key(user_id), str(limit))
+        version, page = await pipe.execute()
+    return page, int(version or 0)
+
+
+async def set_user_orders_page(
+    user_id: int, limit: int, payload: bytes, version: int
+) -> bool:
+    version_key = user_orders_version_key(user_id)
+    page_key = user_orders_cache_key(user_id)
+    async with get_redis_bytes().pipeline(transaction=True) as pipe:
+        try:
+            await pipe.watch(version_key)
+            if int(await pipe.get(version_key) or 0) != version:
+                return False
+            pipe.multi()
+            pipe.hset(page_key, str(limit), payload)
+            if ORDER_CACHE_TTL > 0:
+                pipe.expire(page_key, ORDER_CACHE_TTL)
+            await pipe.execute()
+        except WatchError:
+            return False
+    return True
+
+
+async def invalidate_user_orders(user_id: int) -> None:
+    """Drop a user's cached first pages; call after creating or changing their orders."""
+    async with get_redis_bytes().pipeline(transaction=True) as pipe:
+        pipe.incr(user_orders_version_key(user_id))
+        pipe.delete(user_orders_cache_key(user_id))
+        await pipe.execute()
+
+
 async def clear_cache() -> None:
+    """Invalidate every cached entry by moving to a new key generation."""
+    global _generation
+    if _local_cache is not None:
+        _local_cache.clear()
+    if _shared_cache is not None:
+        # The segment outlives restarts, but generation numbers restart with Redis
+        # (FLUSHALL, a new container): old entries could match the new generation.
+        _shared_cache.clear()
+    _generation = await get_redis().incr(generation_key())
+    task = asyncio.create_task(reclaim_stale_generations(_generation))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _keep_flush_marker(marker: str, ttl: int) -> None:
+    # A worker the supervisor restarts later must find the marker and adopt the
+    # generation instead of flushing again, so it lives as long as the deployment does;
+    # the TTL only reclaims markers of deployments that are gone.
     redis = get_redis()
-    pattern = f"{CACHE_PREFIX}:*"
+    while True:
+        await asyncio.sleep(ttl / 3)
+        try:
+            if not await redis.expire(marker, ttl):
+                # Lost with Redis (FLUSHALL, a restart): put back what this worker uses.
+                await redis.set(marker, _generation, nx=True, ex=ttl)
+        except (OSError, RedisError):
+            continue
+
+
+async def init_cache() -> None:
+    """Flush once per deployment, then adopt the current generation in every worker."""
+    global _generation
+    redis = get_redis()
+    marker = f"{CACHE_PREFIX}:flush:{DEPLOYMENT_ID}"
+    ttl = max(int(CACHE_FLUSH_WAIT * 6), 60)
+    task = asyncio.create_task(_keep_flush_marker(marker, ttl))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    if await redis.set(marker, "", nx=True, ex=ttl):
+        await clear_cache()
+        await redis.set(marker, _generation, ex=ttl)
+        return
+
+    deadline = time.monotonic() + CACHE_FLUSH_WAIT
+    while time.monotonic() < deadline:
+        flushed = await redis.get(marker)
+        if flushed:
+            _generation = int(flushed)
+            return
+        await asyncio.sleep(0.05)
+    _generation = int(await redis.get(generation_key()) or 0)
+
+
+async def adopt_current_generation() -> int:
+    """Use the generation the running workers use, without flushing (for tools)."""
+    global _generation
+    _generation = int(await get_redis().get(generation_key()) or 0)
+    return _generation
+
+
+async def purge_current_generation() -> int:
+    """Drop every cached entry while workers keep their generation; returns the count."""
+    if _local_cache is not None:
+        _local_cache.clear()
+    if _shared_cache is not None:
+        _shared_cache.clear()
+    current = await adopt_current_generation()
+    return await reclaim_stale_generations(current + 1)
+
+
+def _key_generation(key: bytes) -> int | None:
+    head = key[len(CACHE_PREFIX) + 2 :].split(b":", 1)[0]
+    return int(head) if head.isdigit() else None
+
+
+async def reclaim_stale_generations(current: int) -> int:
+    """Unlink keys of older generations in bounded batches; returns the count removed."""
+    redis = get_redis_bytes()
+    pattern = f"{CACHE_PREFIX}:g[0-9]*"
+    removed = 0
     cursor = 0
-    keys: list[str] = []
     while True:
-        cursor, batch = await redis.scan(cursor=cursor, match=pattern, count=1000)
-        keys.extend(batch)
+        cursor, batch = await redis.scan(
+            cursor=cursor, match=pattern, count=CACHE_RECLAIM_BATCH
+        )
+        stale = []
+        for key in batch:
+            generation = _key_generation(key)
+            if generation is not None and generation < current:
+                stale.append(key)
+        if stale:
+            removed += await redis.unlink(*stale)
+            await asyncio.sleep(CACHE_RECLAIM_PAUSE_MS / 1000)
         if cursor == 0:
-            break
-    if keys:
-        await redis.delete(*keys)
+            return removed
+
+
+def fill_lock_key(key: str) -> str:
+    return f"{key}:lock"
+
+
+# Deletes the lock only while it still holds our token: a fill that outlived
+# CACHE_FILL_LOCK_MS must not release the lock another worker has taken since.
+_RELEASE_FILL_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+async def acquire_fill_lock(key: str) -> str | None:
+    """The lock's token, or None while another worker holds it."""
+    if CACHE_FILL_LOCK_MS <= 0:
+        return ""
+    token = secrets.token_hex(8)
+    acquired = await get_redis().set(
+        fill_lock_key(key), token, nx=True, px=CACHE_FILL_LOCK_MS
+    )
+    return token if acquired else None
+
+
+async def release_fill_lock(key: str, token: str) -> None:
+    if CACHE_FILL_LOCK_MS > 0:
+        await get_redis().eval(_RELEASE_FILL_LOCK, 1, fill_lock_key(key), token)
+
+
+async def acquire_fill_locks(keys: list[str]) -> dict[str, str]:
+    """acquire_fill_lock for many keys in one round trip; only acquired keys are returned."""
+    if CACHE_FILL_LOCK_MS <= 0:
+        return dict.fromkeys(keys, "")
+    if not keys:
+        return {}
+    tokens = {key: secrets.token_hex(8) for key in keys}
+    async with get_redis().pipeline(transaction=False) as pipe:
+        for key, token in tokens.items():
+            pipe.set(fill_lock_key(key), token, nx=True, px=CACHE_FILL_LOCK_MS)
+        acquired = await pipe.execute()
+    return {key: tokens[key] for key, ok in zip(tokens, acquired) if ok}
+
+
+async def release_fill_locks(tokens: dict[str, str]) -> None:
+    if CACHE_FILL_LOCK_MS <= 0 or not tokens:
+        return
+    async with get_redis().pipeline(transaction=False) as pipe:
+        for key, token in tokens.items():
+            pipe.eval(_RELEASE_FILL_LOCK, 1, fill_lock_key(key), token)
+        await pipe.execute()
+
+
+async def wait_for_cached_bytes(key: str) -> bytes | None:
+    deadline = time.monotonic() + CACHE_FILL_LOCK_MS / 1000
+    while time.monotonic() < deadline:
+        await asyncio.sleep(CACHE_FILL_POLL_MS / 1000)
+        cached = await get_cached_bytes(key)
+        if cached is not None:
+            return cached
+    return None
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+from bisect import bisect_left
+from collections.abc import AsyncIterator
+from decimal import Decimal
+from pathlib import Path
+
+import asyncpg
+
+from cache import DEPLOYMENT_ID
+from db import ASYNCPG_DSN
+
+# Read-only copy of the products table shared by every worker process. The first
+# worker to start streams the table into a file on tmpfs (/dev/shm); all workers mmap
+# it, so the page cache holds one copy however many workers read it. The file is
+# array-backed, sorted by id:
+#
+#   header   magic, version stamp, product count, first id, heap size
+#   ids      int32[count]
+#   prices   int64[count]        price in cents
+#   offsets  uint32[2*count+1]   name i = heap[o[2i]:o[2i+1]], sku i = heap[o[2i+1]:o[2i+2]]
+#   heap     UTF-8 names and skus
+#
+# The version stamp is catalog_versions.version for 'products', which a statement
+# trigger bumps on every write. Workers compare it every CATALOG_REFRESH_INTERVAL
+# seconds and rebuild (one worker, under a file lock) or remap when it moved.
+
+PRODUCT_CATALOG = os.getenv("PRODUCT_CATALOG", "0") == "1"
+CATALOG_DIR = Path(
+    os.getenv(
+        "CATALOG_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    )
+)
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "30"))
+CATALOG_PREFETCH_ROWS = int(os.getenv("CATALOG_PREFETCH_ROWS", "10000"))
+
+MAGIC = b"PCATv001"
+HEADER = struct.Struct("<8sQQqQ")
+HEADER_SIZE = 64
+
+VERSION_SQL = "SELECT version FROM catalog_versions WHERE name = 'products'"
+SIZE_SQL = (
+    "SELECT count(*), coalesce(sum(octet_length(name) + octet_length(sku)), 0) "
+    "FROM products"
+)
+PRODUCTS_SQL = "SELECT id, name, sku, (price * 100)::int8 FROM products ORDER BY id"
+
+_catalog: ProductCatalog | None = None
+_refresher: asyncio.Task | None = None
+
+
+def _layout(count: int) -> tuple[int, int, int, int]:
+    """Offsets of the ids, prices, offsets and heap sections."""
+    ids = HEADER_SIZE
+    prices = ids + (count * 4 + 7) // 8 * 8
+    offsets = prices + count * 8
+    heap = offsets + (2 * count + 1) * 4
+    return ids, prices, offsets, heap
+
+
+class ProductCatalog:
+    """A mapped catalog file; lookups read the shared pages without copying them."""
+
+    def __init__(self, path: Path) -> None:
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.count, self._first_id, heap_size = HEADER.unpack_from(
+            self._map
+        )
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a product catalog")
+        ids, prices, offsets, heap = _layout(self.count)
+        view = memoryview(self._map)
+        self._ids = view[ids:ids + self.count * 4].cast("i")
+        self._prices = view[prices:offsets].cast("q")
+        self._offsets = view[offsets:heap].cast("I")
+        self._heap = view[heap:heap + heap_size]
+        # Ids without gaps (the usual case) index the arrays directly.
+        self._dense = (
+            self.count == 0 or self._ids[-1] - self._first_id + 1 == self.count
+        )
+        self.size = len(self._map)
+
+    def product(self, product_id: int) -> tuple[str, str, Decimal] | None:
+        """(name, sku, price) of a product, None if the catalog does not have it."""
+        if self._dense:
+            row = product_id - self._first_id
+            if not 0 <= row < self.count:
+                return None
+        else:
+            row = bisect_left(self._ids, product_id)
+            if row == self.count or self._ids[row] != product_id:
+                return None
+        offsets = self._offsets
+        start = offsets[2 * row]
+        middle = offsets[2 * row + 1]
+        end = offsets[2 * row + 2]
+        return (
+            str(self._heap[start:middle], "utf-8"),
+            str(self._heap[middle:end], "utf-8"),
+            Decimal(self._prices[row]).scaleb(-2),
+        )
+
+
+def get_catalog() -> ProductCatalog | None:
+    """The mapped catalog, or None when PRODUCT_CATALOG is off or it is not loaded."""
+    return _catalog
+
+
+def catalog_path() -> Path:
+    name = DEPLOYMENT_ID.replace(":", "_").replace("/", "_")
+    return CATALOG_DIR / f"perf_test_products-{name}.bin"
+
+
+def _remove_old_catalogs(current: Path) -> None:
+    """Delete the catalogs (and lock files) of earlier deployments from tmpfs."""
+    # A deployment still running keeps its mapping after the unlink, and rebuilds its
+    # file if products change, so removing a live one is safe, only slower.
+    for path in CATALOG_DIR.glob("perf_test_products-*.bin"):
+        if path != current:
+            path.unlink(missing_ok=True)
+            Path(f"{path}.lock").unlink(missing_ok=True)
+
+
+def _open_current(path: Path, version: int) -> ProductCatalog | None:
+    try:
+        catalog = ProductCatalog(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    return catalog if catalog.version >= version else None
+
+
+def _lock(path: Path) -> int:
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    return fd
+
+
+async def write_catalog(
+    path: Path,
+    version: int,
+    count: int,
+    heap_size: int,
+    records: AsyncIterator[tuple[int, str, str, int]],
+) -> None:
+    """Write (id, name, sku, price in cents) records, sorted by id, into a catalog file.
+
+    count and heap_size (UTF-8 bytes of all names and skus) size the file up front, so
+    records go straight into the mapped file without being collected first.
+    """
+    ids_at, prices_at, offsets_at, heap_at = _layout(count)
+    with open(path, "w+b") as file:
+        file.truncate(heap_at + heap_size)
+        with mmap.mmap(file.fileno(), heap_at + heap_size) as buffer:
+            view = memoryview(buffer)
+            ids = view[ids_at:ids_at + count * 4].cast("i")
+            prices = view[prices_at:offsets_at].cast("q")
+            offsets = view[offsets_at:heap_at].cast("I")
+            heap = view[heap_at:]
+            row = position = 0
+            async for product_id, name, sku, cents in records:
+                ids[row] = product_id
+                prices[row] = cents
+                for index, text in enumerate((name, sku)):
+                    encoded = text.encode()
+                    offsets[2 * row + index] = position
+                    heap[position:position + len(encoded)] = encoded
+                    position += len(encoded)
+                row += 1
+            if row != count or position != heap_size:
+                raise ValueError("records do not match the declared count and heap size")
+            offsets[2 * count] = position
+            first_id = ids[0] if count else 0
+            for section in (ids, prices, offsets, heap, view):
+                section.release()
+            HEADER.pack_into(buffer, 0, MAGIC, version, count, first_id, heap_size)
+
+
+async def build_catalog(conn: asyncpg.Connection, path: Path) -> None:
+    """Stream the products table into a new catalog file and swap it in atomically."""
+    partial = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    async with conn.transaction(isolation="repeatable_read", readonly=True):
+        # One snapshot for the stamp, the sizes and the rows.
+        version = await conn.fetchval(VERSION_SQL)
+        count, heap_size = await conn.fetchrow(SIZE_SQL)
+        records = conn.cursor(PRODUCTS_SQL, prefetch=CATALOG_PREFETCH_ROWS)
+        try:
+            await write_catalog(partial, version, count, heap_size, records)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+    os.replace(partial, path)
+
+
+async def refresh_catalog() -> ProductCatalog:
+    """Map the shared catalog, rebuilding it first if products changed since it was built."""
+    global _catalog
+    conn = await asyncpg.connect(ASYNCPG_DSN)
+    try:
+        version = await conn.fetchval(VERSION_SQL)
+        if _catalog is not None and _catalog.version >= version:
+            return _catalog
+        path = catalog_path()
+        catalog = _open_current(path, version)
+        if catalog is None:
+            CATALOG_DIR.mkdir(parents=True, exist_ok=True)
+            lock = await asyncio.to_thread(_lock, path)
+            try:
+                # Another worker may have built it while this one waited for the lock.
+                catalog = _open_current(path, version)
+                if catalog is None:
+                    await build_catalog(conn, path)
+                    catalog = ProductCatalog(path)
+                    _remove_old_catalogs(path)
+            finally:
+                os.close(lock)
+    finally:
+        await conn.close()
+    # Lookups never await, so swapping the reference cannot tear a request's reads.
+    _catalog = catalog
+    return catalog
+
+
+async def _refresh_periodically() -> None:
+    while True:
+        await asyncio.sleep(CATALOG_REFRESH_INTERVAL)
+        try:
+            await refresh_catalog()
+        except (OSError, asyncpg.PostgresError):
+            # Keep serving the mapped catalog; the next interval tries again.
+            continue
+
+
+async def start_catalog() -> None:
+    """App startup hook: load the catalog and keep it current, if PRODUCT_CATALOG is on."""
+    global _refresher
+    if not PRODUCT_CATALOG:
+        return
+    await refresh_catalog()
+    if _refresher is None and CATALOG_REFRESH_INTERVAL > 0:
+        _refresher = asyncio.get_running_loop().create_task(_refresh_periodically())
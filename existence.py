@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+from metrics import register_collector
+
+# Per-worker index of the ids in orders, checked before the cache and Postgres so a
+# request for an order that does not exist is answered without touching either.
+#
+#   bitmap  one bit per id up to the largest id: exact, 125 KB per million ids
+#   bloom   EXISTENCE_FILTER_FP_RATE false positives, about 9.6 bits per id at 1%
+#
+# The filter is built in the background after startup (requests pass through until it
+# is ready) and then catches up every EXISTENCE_FILTER_REFRESH_INTERVAL seconds with the
+# ids above what it has seen. Ids above that high-water mark are answered as missing, so
+# an order created by another process can 404 for up to one interval; code that creates
+# orders calls mark_order_exists() to make them visible in its own worker at once. Each
+# catch-up rescans the ids of the previous one, so an insert that commits after a
+# higher id is still picked up.
+
+EXISTENCE_FILTER = os.getenv("EXISTENCE_FILTER", "off")
+EXISTENCE_FILTER_FP_RATE = float(os.getenv("EXISTENCE_FILTER_FP_RATE", "0.01"))
+EXISTENCE_FILTER_HEADROOM = float(os.getenv("EXISTENCE_FILTER_HEADROOM", "0.25"))
+EXISTENCE_FILTER_REFRESH_INTERVAL = float(
+    os.getenv("EXISTENCE_FILTER_REFRESH_INTERVAL", "1")
+)
+EXISTENCE_FILTER_BATCH_ROWS = int(os.getenv("EXISTENCE_FILTER_BATCH_ROWS", "50000"))
+
+if EXISTENCE_FILTER not in ("off", "bitmap", "bloom"):
+    raise ValueError("EXISTENCE_FILTER must be off, bitmap or bloom")
+
+_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+class IdBitmap:
+    """One bit per id from 0 up; grows when larger ids are added."""
+
+    def __init__(self, max_id: int) -> None:
+        self._bits = bytearray(max(max_id, 0) // 8 + 1)
+
+    def add(self, item_id: int) -> None:
+        index = item_id >> 3
+        if index >= len(self._bits):
+            grow = max(index + 1 - len(self._bits), len(self._bits) // 4)
+            self._bits.extend(bytes(grow))
+        self._bits[index] |= 1 << (item_id & 7)
+
+    def __contains__(self, item_id: int) -> bool:
+        index = item_id >> 3
+        if not 0 <= index < len(self._bits):
+            return False
+        return bool(self._bits[index] >> (item_id & 7) & 1)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class BloomFilter:
+    """Bloom filter over integer ids, sized for capacity ids at fp_rate."""
+
+    def __init__(self, capacity: int, fp_rate: float) -> None:
+        capacity = max(capacity, 1)
+        self.bits = max(round(-capacity * math.log(fp_rate) / math.log(2) ** 2), 64)
+        self.hashes = max(round(self.bits / capacity * math.log(2)), 1)
+        self.capacity = capacity
+        self._bits = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, item_id: int) -> list[int]:
+        # splitmix64 finalizer; two halves of it drive double hashing.
+        mixed = (item_id + 0x9E3779B97F4A7C15) & _MASK
+        mixed = ((mixed ^ (mixed >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+        mixed = ((mixed ^ (mixed >> 27)) * 0x94D049BB133111EB) & _MASK
+        mixed ^= mixed >> 31
+        first, step = mixed >> 32, (mixed & 0xFFFFFFFF) | 1
+        bits = self.bits
+        return [(first + index * step) % bits for index in range(self.hashes)]
+
+    def add(self, item_id: int) -> None:
+        array = self._bits
+        for position in self._positions(item_id):
+            array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item_id: int) -> bool:
+        array = self._bits
+        for position in self._positions(item_id):
+            if not array[position >> 3] >> (position & 7) & 1:
+                return False
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+def new_filter(kind: str, max_id: int) -> IdBitmap | BloomFilter:
+    """An empty filter for ids up to max_id, with EXISTENCE_FILTER_HEADROOM to grow."""
+    expected = int(max_id * (1 + EXISTENCE_FILTER_HEADROOM))
+    if kind == "bloom":
+        return BloomFilter(expected, EXISTENCE_FILTER_FP_RATE)
+    return IdBitmap(expected)
+
+
+class ExistenceTelemetry:
+    def __init__(self) -> None:
+        self.absent = 0
+        self.maybe = 0
+        # "maybe" answers for ids the database did not have: false positives, or
+        # orders deleted since they were added.
+        self.false_positives = 0
+
+
+telemetry = ExistenceTelemetry()
+_filter: IdBitmap | BloomFilter | None = None
+# Ids above _high_water are answered as missing; _scanned is the largest id read from
+# the database, and the next catch-up reads the ids above _rescan_from.
+_high_water = 0
+_scanned = 0
+_rescan_from = 0
+_refresher: asyncio.Task | None = None
+
+MaxOrderId = Callable[[], Awaitable[int]]
+OrderIdsAfter = Callable[[int], AsyncIterator[list[int]]]
+
+
+def order_may_exist(order_id: int) -> bool:
+    """False only for ids not in orders; True while the filter is off or loading."""
+    if _filter is None:
+        return True
+    if order_id <= _high_water and order_id in _filter:
+        telemetry.maybe += 1
+        return True
+    telemetry.absent += 1
+    return False
+
+
+def record_false_positive(count: int = 1) -> None:
+    if _filter is not None:
+        telemetry.false_positives += count
+
+
+def mark_order_exists(order_id: int) -> None:
+    """Call after creating an order, so this worker serves it before the catch-up."""
+    global _high_water
+    if _filter is not None:
+        _filter.add(order_id)
+        _high_water = max(_high_water, order_id)
+
+
+async def _add_ids_after(
+    target: IdBitmap | BloomFilter, after_id: int, order_ids_after: OrderIdsAfter
+) -> int:
+    """Add every id above after_id; returns the largest one seen."""
+    largest = after_id
+    add = target.add
+    async for batch in order_ids_after(after_id):
+        for order_id in batch:
+            add(order_id)
+        largest = max(largest, batch[-1])
+        # Building from millions of ids must not stall this worker's requests.
+        await asyncio.sleep(0)
+    return largest
+
+
+async def _build(max_order_id: MaxOrderId, order_ids_after: OrderIdsAfter) -> None:
+    global _filter, _high_water, _scanned, _rescan_from
+    max_id = await max_order_id()
+    built = new_filter(EXISTENCE_FILTER, max_id)
+    scanned = await _add_ids_after(built, 0, order_ids_after)
+    _filter, _high_water, _scanned = built, scanned, scanned
+    # Ids committed while the scan ran are picked up by the first catch-up.
+    _rescan_from = min(max_id, scanned)
+
+
+async def _build_and_refresh(
+    max_order_id: MaxOrderId, order_ids_after: OrderIdsAfter
+) -> None:
+    global _high_water, _scanned, _rescan_from
+    while _filter is None:
+        try:
+            await _build(max_order_id, order_ids_after)
+        except Exception:
+            # Requests pass through until the database is reachable.
+            await asyncio.sleep(EXISTENCE_FILTER_REFRESH_INTERVAL or 1)
+    while EXISTENCE_FILTER_REFRESH_INTERVAL > 0:
+        await asyncio.sleep(EXISTENCE_FILTER_REFRESH_INTERVAL)
+        try:
+            seen = await _add_ids_after(_filter, _rescan_from, order_ids_after)
+        except Exception:
+            continue
+        _rescan_from, _scanned = _scanned, max(_scanned, seen)
+        _high_water = max(_high_water, _scanned)
+
+
+def start_existence_filter(
+    max_order_id: MaxOrderId, order_ids_after: OrderIdsAfter
+) -> None:
+    """App startup hook: build the filter in the background and keep it current."""
+    global _refresher
+    if EXISTENCE_FILTER == "off" or _refresher is not None:
+        return
+    _refresher = asyncio.get_running_loop().create_task(
+        _build_and_refresh(max_order_id, order_ids_after)
+    )
+
+
+def stats() -> dict:
+    return {
+        "absent": telemetry.absent,
+        "maybe": telemetry.maybe,
+        "false_positives": telemetry.false_positives,
+        "bytes": _filter.nbytes if _filter is not None else 0,
+        "high_water": _high_water,
+        "ready": int(_filter is not None),
+    }
+
+
+def _render(dumps: list[dict]) -> list[str]:
+    totals = dict.fromkeys(("absent", "maybe", "false_positives", "bytes", "ready"), 0)
+    high_water = 0
+    for dump in dumps:
+        for key in totals:
+            totals[key] += dump[key]
+        high_water = max(high_water, dump["high_water"])
+    return [
+        "# HELP order_existence_checks_total Existence filter answers, all workers.",
+        "# TYPE order_existence_checks_total counter",
+        f'order_existence_checks_total{{result="absent"}} {totals["absent"]}',
+        f'order_existence_checks_total{{result="maybe"}} {totals["maybe"]}',
+        "# HELP order_existence_false_positives_total "
+        "Ids the filter passed that the database did not have.",
+        "# TYPE order_existence_false_positives_total counter",
+        f"order_existence_false_positives_total {totals['false_positives']}",
+        "# HELP order_existence_filter_bytes Filter memory, summed over workers.",
+        "# TYPE order_existence_filter_bytes gauge",
+        f"order_existence_filter_bytes {totals['bytes']}",
+        "# HELP order_existence_filter_ready Workers with a loaded filter.",
+        "# TYPE order_existence_filter_ready gauge",
+        f"order_existence_filter_ready {totals['ready']}",
+        "# HELP order_existence_high_water Largest order id known to a filter.",
+        "# TYPE order_existence_high_water gauge",
+        f"order_existence_high_water {high_water}",
+    ]
+
+
+if EXISTENCE_FILTER != "off":
+    register_collector(
+        "existence",
+        stats,
+        _render,
+        lambda dump: {**dump, "bytes": 0, "high_water": 0, "ready": 0},
+    )
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BatchLoader(Generic[K, V]):
+    """Collects the keys that concurrent requests load into one batch call (a DataLoader).
+
+    Keys requested in the same event loop tick, or within max_wait seconds of the first
+    one, are fetched together by fetch_many, at most max_batch per call. Each caller gets
+    the value for its own key, or None when fetch_many did not return it.
+    """
+
+    def __init__(
+        self,
+        fetch_many: Callable[[list[K]], Awaitable[dict[K, V]]],
+        max_batch: int,
+        max_wait: float,
+    ) -> None:
+        self._fetch_many = fetch_many
+        self.max_batch = max(max_batch, 1)
+        self.max_wait = max_wait
+        self._pending: dict[K, asyncio.Future] = {}
+        self._handle: asyncio.Handle | None = None
+        self._running: set[asyncio.Task] = set()
+        self.batches = 0
+        self.keys = 0
+
+    async def load(self, key: K) -> V | None:
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._handle is None:
+                if self.max_wait > 0:
+                    self._handle = loop.call_later(self.max_wait, self._dispatch)
+                else:
+                    self._handle = loop.call_soon(self._dispatch)
+        # Shielded so a cancelled caller does not cancel the batch for the others.
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        self.batches += 1
+        self.keys += len(batch)
+        # A fresh context: the batch serves many requests and is timed by none of them.
+        task = asyncio.get_running_loop().create_task(
+            self._run(batch), context=contextvars.Context()
+        )
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: dict[K, asyncio.Future]) -> None:
+        try:
+            found = await self._fetch_many(list(batch))
+        except asyncio.CancelledError:
+            # Shutdown: release the waiters instead of leaving them hanging.
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(key))
+
+    def stats(self) -> dict[str, int]:
+        return {"batches": self.batches, "keys": self.keys, "waiting": len(self._pending)}
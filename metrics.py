@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+import asyncio
+import atexit
+import fcntl
+import json
+import os
+import tempfile
+import time
+from bisect import bisect_left
+from collections.abc import Callable
+from contextlib import nullcontext
+from contextvars import ContextVar, Token
+from pathlib import Path
+
+from cache import DEPLOYMENT_ID
+
+# Per-request phase timings (Server-Timing header) and per-phase latency histograms.
+# Each worker process keeps its own histograms and periodically writes them to
+# METRICS_DIR/<deployment>/<pid>.json; /metrics sums the files of the live workers, which
+# is exact for histogram buckets, counts and sums. The counters of workers that exited
+# are folded into RETIRED_FILE, so a respawn never makes a counter go down.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_DIR = Path(
+    os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "perf_test_metrics"))
+)
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+RETIRED_FILE = "retired.json"
+METRIC_NAME = "order_request_phase_seconds"
+METRICS_PATH = "/metrics"
+# Route label values; every other path (scanners, typos, /orders/abc) is "other", so
+# the number of series stays bounded.
+ROUTES = frozenset(
+    (
+        "/orders",
+        "/orders/lite",
+        "/orders/export",
+        "/orders/{id}",
+        "/orders/{id}/lite",
+        "/users/{id}/orders",
+        "/admin/profile",
+    )
+)
+
+_timings: ContextVar[RequestTimings | None] = ContextVar(
+    "request_timings", default=None
+)
+_noop = nullcontext()
+_flusher: asyncio.Task | None = None
+# Extra per-worker state written next to the histograms: name -> (dump, render,
+# counters), where render turns the dumps of all workers into exposition lines and
+# counters keeps the part of an exited worker's dump that stays counted.
+_collectors: dict[
+    str,
+    tuple[
+        Callable[[], dict],
+        Callable[[list[dict]], list[str]],
+        Callable[[dict], dict] | None,
+    ],
+] = {}
+
+
+class RequestTimings:
+    """Exclusive wall time per phase: entering a nested phase pauses the outer one."""
+
+    __slots__ = ("started", "phases", "_stack")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self._stack: list[list] = []
+
+    def enter(self, name: str) -> None:
+        now = time.perf_counter()
+        if self._stack:
+            self._charge(self._stack[-1], now)
+        self._stack.append([name, now])
+
+    def exit(self) -> None:
+        now = time.perf_counter()
+        self._charge(self._stack.pop(), now)
+        if self._stack:
+            self._stack[-1][1] = now
+
+    def _charge(self, frame: list, now: float) -> None:
+        name, since = frame
+        self.phases[name] = self.phases.get(name, 0.0) + now - since
+
+    def finish(self) -> dict[str, float]:
+        # "app" is the time outside named phases: framework, routing and socket I/O.
+        total = time.perf_counter() - self.started
+        phases = dict(self.phases)
+        phases["app"] = max(total - sum(phases.values()), 0.0)
+        phases["total"] = total
+        return phases
+
+
+class _Phase:
+    __slots__ = ("timings", "name")
+
+    def __init__(self, timings: RequestTimings, name: str) -> None:
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.timings.enter(self.name)
+
+    def __exit__(self, *exc_info) -> None:
+        self.timings.exit()
+
+
+def phase(name: str):
+    """Time a block as part of the current request; a no-op outside requests."""
+    timings = _timings.get()
+    if timings is None:
+        return _noop
+    return _Phase(timings, name)
+
+
+class PhaseHistograms:
+    def __init__(self) -> None:
+        # (route, phase) -> [bucket counts..., +Inf count], sum of seconds
+        self.series: dict[tuple[str, str], tuple[list[int], list[float]]] = {}
+
+    def observe(self, route: str, name: str, seconds: float) -> None:
+        series = self.series.get((route, name))
+        if series is None:
+            series = self.series[route, name] = ([0] * (len(BUCKETS) + 1), [0.0])
+        series[0][bisect_left(BUCKETS, seconds)] += 1
+        series[1][0] += seconds
+
+    def dump(self) -> list:
+        return [
+            [route, name, counts, total[0]]
+            for (route, name), (counts, total) in self.series.items()
+        ]
+
+    def load(self, rows: list) -> None:
+        for route, name, counts, total in rows:
+            series = self.series.get((route, name))
+            if series is None:
+                series = self.series[route, name] = ([0] * (len(BUCKETS) + 1), [0.0])
+            for index, count in enumerate(counts):
+                series[0][index] += count
+            series[1][0] += total
+
+
+_histograms = PhaseHistograms()
+
+
+def route_label(path: str) -> str:
+    """The route template of path (numeric segments become {id}), or "other"."""
+    route = "/".join(
+        "{id}" if segment.isdigit() else segment for segment in path.split("/")
+    )
+    return route if route in ROUTES else "other"
+
+
+def begin_request() -> tuple[Token, RequestTimings]:
+    global _flusher
+    if _flusher is None:
+        _flusher = asyncio.get_running_loop().create_task(_flush_periodically())
+    timings = RequestTimings()
+    return _timings.set(timings), timings
+
+
+def end_request(token: Token) -> None:
+    _timings.reset(token)
+
+
+def finish_request(timings: RequestTimings, path: str) -> str:
+    """Record the request's phases and return the Server-Timing header value."""
+    phases = timings.finish()
+    route = route_label(path)
+    for name, seconds in phases.items():
+        _histograms.observe(route, name, seconds)
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.3f}" for name, seconds in phases.items()
+    )
+
+
+def register_collector(
+    name: str,
+    dump: Callable[[], dict],
+    render: Callable[[list[dict]], list[str]],
+    counters: Callable[[dict], dict] | None = None,
+) -> None:
+    """counters maps a dump to the same shape with its gauges zeroed or left out; it is
+    what /metrics keeps counting after the worker exits. None: the dump is all gauges."""
+    _collectors[name] = (dump, render, counters)
+
+
+def _worker_dir() -> Path:
+    return METRICS_DIR / DEPLOYMENT_ID.replace(":", "_").replace("/", "_")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _add(total, value):
+    """Sum two dumps of the same shape: nested dicts and lists of numbers."""
+    if total is None:
+        return value
+    if isinstance(value, dict):
+        summed = dict(total)
+        for key, item in value.items():
+            summed[key] = _add(summed.get(key), item)
+        return summed
+    if isinstance(value, list):
+        return [_add(a, b) for a, b in zip(total, value)]
+    return total + value
+
+
+def _read_workers(directory: Path) -> tuple[dict, list[dict]]:
+    """The retired totals and the payloads of the live workers.
+
+    Files of workers that exited are folded into RETIRED_FILE first: their counters
+    stay in the totals (Prometheus would read a drop as a counter reset), their
+    gauges no longer count."""
+    path = directory / RETIRED_FILE
+    # Every worker renders; the lock keeps two of them from folding one file twice or
+    # reading a file after another one folded it.
+    with open(directory / ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            retired = json.loads(path.read_text())
+        except (OSError, ValueError):
+            retired = {"phases": []}
+        live = []
+        dead = []
+        for worker in sorted(directory.glob("*.json")):
+            if not worker.stem.isdigit():
+                continue
+            try:
+                payload = json.loads(worker.read_text())
+            except (OSError, ValueError):
+                payload = None
+            if _pid_alive(int(worker.stem)):
+                if payload is not None:
+                    live.append(payload)
+            else:
+                dead.append((worker, payload))
+        if dead:
+            phases = PhaseHistograms()
+            phases.load(retired["phases"])
+            for _, payload in dead:
+                if payload is None:
+                    continue
+                phases.load(payload["phases"])
+                for name, (_, _, counters) in _collectors.items():
+                    if counters is not None and name in payload:
+                        retired[name] = _add(retired.get(name), counters(payload[name]))
+            retired["phases"] = phases.dump()
+            partial = path.with_suffix(".tmp")
+            partial.write_text(json.dumps(retired))
+            os.replace(partial, path)
+            for worker, _ in dead:
+                worker.unlink(missing_ok=True)
+    return retired, live
+
+
+def flush(force: bool = False) -> None:
+    if not _histograms.series and not force:
+        return
+    directory = _worker_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{os.getpid()}.json"
+    partial = path.with_suffix(".tmp")
+    payload = {"phases": _histograms.dump()}
+    for name, (dump, _, _) in _collectors.items():
+        payload[name] = dump()
+    partial.write_text(json.dumps(payload))
+    os.replace(partial, path)
+
+
+async def _flush_periodically() -> None:
+    while True:
+        await asyncio.sleep(METRICS_FLUSH_INTERVAL)
+        flush()
+
+
+atexit.register(flush)
+
+
+def _labels(route: str, name: str, le: str | None = None) -> str:
+    labels = f'route="{route}",phase="{name}"'
+    if le is not None:
+        labels += f',le="{le}"'
+    return "{" + labels + "}"
+
+
+def render_metrics() -> str:
+    """Prometheus text exposition of the histograms summed over all workers."""
+    # Written even before this worker has timed a request, so its collectors count.
+    flush(force=True)
+    merged = PhaseHistograms()
+    collected: dict[str, list[dict]] = {name: [] for name in _collectors}
+    # flush() above created the directory.
+    retired, live = _read_workers(_worker_dir())
+    for payload in (retired, *live):
+        merged.load(payload["phases"])
+        for name, dumps in collected.items():
+            if name in payload:
+                dumps.append(payload[name])
+
+    lines = [
+        f"# HELP {METRIC_NAME} Wall time per request phase.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    for (route, name), (counts, total) in sorted(merged.series.items()):
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), counts):
+            cumulative += count
+            le = bound if isinstance(bound, str) else repr(bound)
+            lines.append(f"{METRIC_NAME}_bucket{_labels(route, name, le)} {cumulative}")
+        lines.append(f"{METRIC_NAME}_sum{_labels(route, name)} {total[0]:.6f}")
+        lines.append(f"{METRIC_NAME}_count{_labels(route, name)} {cumulative}")
+    lines.append("# HELP order_metrics_workers Worker processes that reported metrics.")
+    lines.append("# TYPE order_metrics_workers gauge")
+    lines.append(f"order_metrics_workers {len(live)}")
+    for name, (_, render, _) in _collectors.items():
+        lines.extend(render(collected[name]))
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times requests and adds a Server-Timing header."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] == METRICS_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        token, timings = begin_request()
+        finished = False
+
+        async def send_with_timing(message) -> None:
+            nonlocal finished
+            if message["type"] == "http.response.start" and not finished:
+                finished = True
+                header = finish_request(timings, scope["path"])
+                message = dict(message)
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", header.encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if not finished:
+                finish_request(timings, scope["path"])
+            end_request(token)
@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+from catalog import get_catalog
+from db import ASYNCPG_DSN, DB_BACKEND, SERVER_SETTINGS
+from orders_core import (
+    ADDRESS_FIELDS,
+    ITEM_START,
+    ORDER_DOCUMENT_SQL,
+    ORDER_FIELDS,
+    STORED_DOCUMENT_SQL,
+    USER_FIELDS,
+    OrderRows,
+    build_order_response,
+    build_order_responses,
+    fill_products,
+    group_order_rows,
+    order_schema,
+)
+from pool import (
+    DB_MAX_OVERFLOW,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    MonitoredPool,
+    PoolState,
+    checkout_timer,
+    register_pool,
+)
+from schemas import OrderResponse, OrderSchema
+
+# Raw asyncpg data layer with the same fetch contract as orders_service. The SQL
+# strings below are fixed, so asyncpg's per-connection statement cache prepares each
+# one as a named server-side statement on first use and reuses it afterwards.
+
+# Sized from the same per-worker connection budget as the SQLAlchemy engine.
+ASYNCPG_POOL_MAX_SIZE = int(
+    os.getenv("ASYNCPG_POOL_MAX_SIZE", str(DB_POOL_SIZE + DB_MAX_OVERFLOW))
+)
+ASYNCPG_POOL_MIN_SIZE = min(
+    int(os.getenv("ASYNCPG_POOL_MIN_SIZE", "2")), ASYNCPG_POOL_MAX_SIZE
+)
+
+_ORDER_COLUMNS = ", ".join(f"o.{name}" for name in ORDER_FIELDS)
+_USER_COLUMNS = ", ".join(f"u.{name}" for name in USER_FIELDS)
+_ADDRESS_COLUMNS = ", ".join(f"a.{name}" for name in ADDRESS_FIELDS)
+_ITEM_COLUMNS = (
+    "oi.id, p.id, p.name, p.sku, p.price, oi.quantity, oi.unit_price"
+)
+_HEADER_FROM = """
+FROM orders o
+JOIN users u ON u.id = o.user_id
+JOIN addresses a ON a.id = o.address_id
+"""
+_CATALOG_ITEM_COLUMNS = "oi.id, oi.product_id, oi.quantity, oi.unit_price"
+_CATALOG_ITEMS_FROM = "JOIN order_items oi ON oi.order_id = o.id"
+_ITEMS_FROM = f"{_CATALOG_ITEMS_FROM} JOIN products p ON p.id = oi.product_id"
+
+STATEMENTS = {
+    "order_join": (
+        f"SELECT {_ORDER_COLUMNS}, {_USER_COLUMNS}, {_ADDRESS_COLUMNS}, {_ITEM_COLUMNS}"
+        f"{_HEADER_FROM}{_ITEMS_FROM} WHERE o.id = $1"
+    ),
+    "order_join_batch": (
+        f"SELECT {_ORDER_COLUMNS}, {_USER_COLUMNS}, {_ADDRESS_COLUMNS}, {_ITEM_COLUMNS}"
+        f"{_HEADER_FROM}{_ITEMS_FROM} WHERE o.id = ANY($1::int[]) ORDER BY o.id, oi.id"
+    ),
+    "order_header": (
+        f"SELECT {_ORDER_COLUMNS}, {_USER_COLUMNS}, {_ADDRESS_COLUMNS}"
+        f"{_HEADER_FROM} WHERE o.id = $1"
+    ),
+    "order_items": (
+        f"SELECT {_ITEM_COLUMNS} FROM order_items oi "
+        "JOIN products p ON p.id = oi.product_id "
+        "WHERE oi.order_id = $1 ORDER BY oi.id"
+    ),
+    # Without the products join; orders_core.fill_products() adds the product fields.
+    "catalog_order_join": (
+        f"SELECT {_ORDER_COLUMNS}, {_USER_COLUMNS}, {_ADDRESS_COLUMNS}, "
+        f"{_CATALOG_ITEM_COLUMNS}{_HEADER_FROM}{_CATALOG_ITEMS_FROM} WHERE o.id = $1"
+    ),
+    "catalog_order_join_batch": (
+        f"SELECT {_ORDER_COLUMNS}, {_USER_COLUMNS}, {_ADDRESS_COLUMNS}, "
+        f"{_CATALOG_ITEM_COLUMNS}{_HEADER_FROM}{_CATALOG_ITEMS_FROM} "
+        "WHERE o.id = ANY($1::int[]) ORDER BY o.id, oi.id"
+    ),
+    "catalog_order_items": (
+        f"SELECT {_CATALOG_ITEM_COLUMNS} FROM order_items oi "
+        "WHERE oi.order_id = $1 ORDER BY oi.id"
+    ),
+    "order_lite": f"SELECT {_ORDER_COLUMNS} FROM orders o WHERE o.id = $1",
+    "order_lite_batch": (
+        f"SELECT {_ORDER_COLUMNS} FROM orders o WHERE o.id = ANY($1::int[])"
+    ),
+    "order_export": (
+        f"SELECT {_ORDER_COLUMNS}, {_USER_COLUMNS}, {_ADDRESS_COLUMNS}, {_ITEM_COLUMNS}"
+        f"{_HEADER_FROM}{_ITEMS_FROM} WHERE o.id BETWEEN $1 AND $2 ORDER BY o.id, oi.id"
+    ),
+    "order_ids_after": "SELECT id FROM orders WHERE id > $1 ORDER BY id",
+    "max_order_id": "SELECT max(id) FROM orders",
+    "user_orders": (
+        f"SELECT {_ORDER_COLUMNS} FROM orders o WHERE o.user_id = $1 "
+        "ORDER BY o.id DESC LIMIT $2"
+    ),
+    "user_orders_after": (
+        f"SELECT {_ORDER_COLUMNS} FROM orders o WHERE o.user_id = $1 AND o.id < $3 "
+        "ORDER BY o.id DESC LIMIT $2"
+    ),
+    "order_document": ORDER_DOCUMENT_SQL.format(condition="o.id = $1"),
+    "order_document_batch": ORDER_DOCUMENT_SQL.format(
+        condition="o.id = ANY($1::int[])"
+    ),
+    "stored_document": STORED_DOCUMENT_SQL.format(condition="order_id = $1"),
+    "stored_document_batch": STORED_DOCUMENT_SQL.format(
+        condition="order_id = ANY($1::int[])"
+    ),
+}
+
+
+_pool: asyncpg.Pool | None = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_pool() -> asyncpg.Pool:
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(
+                    ASYNCPG_DSN,
+                    min_size=ASYNCPG_POOL_MIN_SIZE,
+                    max_size=ASYNCPG_POOL_MAX_SIZE,
+                    server_settings=SERVER_SETTINGS,
+                )
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+@asynccontextmanager
+async def acquire() -> AsyncIterator[asyncpg.Connection]:
+    pool = await get_pool()
+    with checkout_timer():
+        conn = await pool.acquire(timeout=DB_POOL_TIMEOUT)
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+def _pool_state() -> PoolState:
+    if _pool is None:
+        return PoolState(in_use=0, idle=0, overflow=0, capacity=0)
+    size = _pool.get_size()
+    idle = _pool.get_idle_size()
+    return PoolState(
+        in_use=size - idle,
+        idle=idle,
+        overflow=max(size - ASYNCPG_POOL_MIN_SIZE, 0),
+        capacity=ASYNCPG_POOL_MAX_SIZE,
+    )
+
+
+async def _ping_pool() -> None:
+    async with _pool.acquire() as conn:
+        await conn.fetchval("SELECT 1")
+
+
+async def _expire_pool() -> None:
+    if _pool is not None:
+        await _pool.expire_connections()
+
+
+if DB_BACKEND == "asyncpg":
+    register_pool(
+        "asyncpg",
+        MonitoredPool(state=_pool_state, ping=_ping_pool, invalidate=_expire_pool),
+    )
+
+
+async def fetch_order_join_rows(
+    conn: asyncpg.Connection, order_id: int
+) -> OrderRows | None:
+    if get_catalog() is not None:
+        rows = await conn.fetch(STATEMENTS["catalog_order_join"], order_id)
+        if not rows:
+            return None
+        filled = fill_products(rows, ITEM_START)
+        if filled is not None:
+            return filled[0], filled, ITEM_START
+    rows = await conn.fetch(STATEMENTS["order_join"], order_id)
+    if not rows:
+        return None
+    return rows[0], rows, ITEM_START
+
+
+async def fetch_order_split_rows(
+    conn: asyncpg.Connection, order_id: int
+) -> OrderRows | None:
+    header = await conn.fetchrow(STATEMENTS["order_header"], order_id)
+    if header is None:
+        return None
+    item_rows = None
+    if get_catalog() is not None:
+        rows = await conn.fetch(STATEMENTS["catalog_order_items"], order_id)
+        item_rows = fill_products(rows, 0)
+    if item_rows is None:
+        item_rows = await conn.fetch(STATEMENTS["order_items"], order_id)
+    if not item_rows:
+        return None
+    return header, item_rows, 0
+
+
+async def fetch_order_lite_row(
+    conn: asyncpg.Connection, order_id: int
+) -> asyncpg.Record | None:
+    return await conn.fetchrow(STATEMENTS["order_lite"], order_id)
+
+
+async def fetch_order_rows_by_ids(
+    conn: asyncpg.Connection, order_ids: Sequence[int]
+) -> dict[int, OrderRows]:
+    if get_catalog() is not None:
+        rows = await conn.fetch(STATEMENTS["catalog_order_join_batch"], list(order_ids))
+        filled = fill_products(rows, ITEM_START)
+        if filled is not None:
+            return group_order_rows(filled)
+    rows = await conn.fetch(STATEMENTS["order_join_batch"], list(order_ids))
+    return group_order_rows(rows)
+
+
+async def fetch_order_lite_rows_by_ids(
+    conn: asyncpg.Connection, order_ids: Sequence[int]
+) -> dict[int, asyncpg.Record]:
+    rows = await conn.fetch(STATEMENTS["order_lite_batch"], list(order_ids))
+    return {row[0]: row for row in rows}
+
+
+async def fetch_user_order_rows(
+    conn: asyncpg.Connection, user_id: int, before_id: int | None, limit: int
+) -> list[asyncpg.Record]:
+    if before_id is None:
+        return await conn.fetch(STATEMENTS["user_orders"], user_id, limit)
+    return await conn.fetch(STATEMENTS["user_orders_after"], user_id, limit, before_id)
+
+
+async def stream_order_rows(
+    conn: asyncpg.Connection, from_id: int, to_id: int, batch_size: int
+) -> AsyncIterator[list[asyncpg.Record]]:
+    # Cursors only live inside a transaction; each fetch is one round trip.
+    async with conn.transaction(readonly=True):
+        cursor = await conn.cursor(STATEMENTS["order_export"], from_id, to_id)
+        while rows := await cursor.fetch(batch_size):
+            yield rows
+
+
+async def stream_order_ids(
+    conn: asyncpg.Connection, after_id: int, batch_size: int
+) -> AsyncIterator[list[int]]:
+    async with conn.transaction(readonly=True):
+        cursor = await conn.cursor(STATEMENTS["order_ids_after"], after_id)
+        while rows := await cursor.fetch(batch_size):
+            yield [row[0] for row in rows]
+
+
+async def fetch_max_order_id(conn: asyncpg.Connection) -> int:
+    return await conn.fetchval(STATEMENTS["max_order_id"]) or 0
+
+
+async def fetch_order_join(
+    conn: asyncpg.Connection, order_id: int
+) -> OrderResponse | None:
+    order_rows = await fetch_order_join_rows(conn, order_id)
+    return build_order_response(*order_rows) if order_rows else None
+
+
+async def fetch_order_split(
+    conn: asyncpg.Connection, order_id: int
+) -> OrderResponse | None:
+    order_rows = await fetch_order_split_rows(conn, order_id)
+    return build_order_response(*order_rows) if order_rows else None
+
+
+async def fetch_order_lite(
+    conn: asyncpg.Connection, order_id: int
+) -> OrderSchema | None:
+    row = await fetch_order_lite_row(conn, order_id)
+    return order_schema(row) if row is not None else None
+
+
+async def fetch_order_document(conn: asyncpg.Connection, order_id: int) -> bytes | None:
+    document = await conn.fetchval(STATEMENTS["order_document"], order_id, column=1)
+    if document is None:
+        return None
+    return document.encode()
+
+
+async def fetch_orders_by_ids(
+    conn: asyncpg.Connection, order_ids: Sequence[int]
+) -> dict[int, OrderResponse]:
+    return build_order_responses(await fetch_order_rows_by_ids(conn, order_ids))
+
+
+async def fetch_orders_lite_by_ids(
+    conn: asyncpg.Connection, order_ids: Sequence[int]
+) -> dict[int, OrderSchema]:
+    rows = await fetch_order_lite_rows_by_ids(conn, order_ids)
+    return {order_id: order_schema(row) for order_id, row in rows.items()}
+
+
+async def fetch_user_orders(
+    conn: asyncpg.Connection, user_id: int, before_id: int | None, limit: int
+) -> list[OrderSchema]:
+    rows = await fetch_user_order_rows(conn, user_id, before_id, limit)
+    return [order_schema(row) for row in rows]
+
+
+async def fetch_order_documents(
+    conn: asyncpg.Connection, order_ids: Sequence[int]
+) -> dict[int, bytes]:
+    rows = await conn.fetch(STATEMENTS["order_document_batch"], list(order_ids))
+    return {row[0]: row[1].encode() for row in rows}
+
+
+async def fetch_stored_document(conn: asyncpg.Connection, order_id: int) -> bytes | None:
+    document = await conn.fetchval(STATEMENTS["stored_document"], order_id, column=1)
+    if document is None:
+        # Not built yet (e.g. before the backfill): assemble it like the json strategy.
+        return await fetch_order_document(conn, order_id)
+    return document.encode()
+
+
+async def fetch_stored_documents(
+    conn: asyncpg.Connection, order_ids: Sequence[int]
+) -> dict[int, bytes]:
+    rows = await conn.fetch(STATEMENTS["stored_document_batch"], list(order_ids))
+    found = {row[0]: row[1].encode() for row in rows}
+    missing = [order_id for order_id in order_ids if order_id not in found]
+    if missing:
+        found.update(await fetch_order_documents(conn, missing))
+    return found
@@ -0,0 +1,431 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Iterable, Sequence
+
+from sqlalchemy import Integer, any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog import get_catalog
+from db import Address, Order, OrderItem, Product, User
+from schemas import (
+    AddressSchema,
+    OrderItemSchema,
+    OrderResponse,
+    OrderSchema,
+    UserSchema,
+)
+
+# Read-only data access that selects plain columns and maps them straight into the
+# response schemas, without creating ORM objects or touching the identity map.
+
+orders = Order.__table__
+users = User.__table__
+addresses = Address.__table__
+order_items = OrderItem.__table__
+products = Product.__table__
+
+ORDER_FIELDS = tuple(OrderSchema.model_fields)
+USER_FIELDS = tuple(UserSchema.model_fields)
+ADDRESS_FIELDS = tuple(AddressSchema.model_fields)
+ITEM_FIELDS = tuple(OrderItemSchema.model_fields)
+
+ORDER_COLUMNS = [orders.c[name] for name in ORDER_FIELDS]
+USER_COLUMNS = [users.c[name] for name in USER_FIELDS]
+ADDRESS_COLUMNS = [addresses.c[name] for name in ADDRESS_FIELDS]
+ITEM_COLUMNS = [
+    order_items.c.id.label("order_item_id"),
+    products.c.id.label("product_id"),
+    products.c.name,
+    products.c.sku,
+    products.c.price,
+    order_items.c.quantity,
+    order_items.c.unit_price,
+]
+# Item columns without the products join; fill_products() adds name, sku and price.
+CATALOG_ITEM_COLUMNS = [
+    order_items.c.id.label("order_item_id"),
+    order_items.c.product_id,
+    order_items.c.quantity,
+    order_items.c.unit_price,
+]
+
+
+def _json_timestamp(column: str) -> str:
+    # datetime.isoformat() in UTC: the fraction only when there are microseconds.
+    utc = f"{column} AT TIME ZONE 'UTC'"
+    return (
+        f"""'"' || to_char({utc}, 'YYYY-MM-DD"T"HH24:MI:SS') """
+        f"""|| coalesce(nullif(to_char({utc}, '.US'), '.000000'), '') || '+00:00"'"""
+    )
+
+
+def _json_money(column: str) -> str:
+    # repr(float(value)): whole amounts keep their ".0", like the Python encoders.
+    return (
+        f"CASE WHEN {column} = trunc({column}) THEN trunc({column})::text || '.0' "
+        f"ELSE {column}::float8::text END"
+    )
+
+
+def _json_text(column: str) -> str:
+    return f"coalesce(to_json({column})::text, 'null')"
+
+
+def _json_object(fields: dict[str, str]) -> str:
+    members = " || ',' || ".join(
+        f"""'"{key}":' || {value}""" for key, value in fields.items()
+    )
+    # Doubled braces: ORDER_DOCUMENT_SQL is a str.format template.
+    return f"'{{{{' || {members} || '}}}}'"
+
+
+_ORDER_JSON = _json_object({
+    "id": "o.id",
+    "user_id": "o.user_id",
+    "address_id": "o.address_id",
+    "quantity": "o.quantity",
+    "status": _json_text("o.status"),
+    "total": _json_money("o.total"),
+    "created_at": _json_timestamp("o.created_at"),
+})
+_USER_JSON = _json_object({
+    "id": "u.id",
+    "email": _json_text("u.email"),
+    "full_name": _json_text("u.full_name"),
+    "created_at": _json_timestamp("u.created_at"),
+})
+_ADDRESS_JSON = _json_object({
+    "id": "a.id",
+    "user_id": "a.user_id",
+    "line1": _json_text("a.line1"),
+    "line2": _json_text("a.line2"),
+    "city": _json_text("a.city"),
+    "state": _json_text("a.state"),
+    "postal_code": _json_text("a.postal_code"),
+    "created_at": _json_timestamp("a.created_at"),
+})
+_ITEM_JSON = _json_object({
+    "order_item_id": "oi.id",
+    "product_id": "p.id",
+    "name": _json_text("p.name"),
+    "sku": _json_text("p.sku"),
+    "price": _json_money("p.price"),
+    "quantity": "oi.quantity",
+    "unit_price": _json_money("oi.unit_price"),
+})
+_DOCUMENT_JSON = _json_object({
+    "order": _ORDER_JSON,
+    "user": _USER_JSON,
+    "address": _ADDRESS_JSON,
+    "products": "items.products",
+})
+
+# Postgres assembles the full response document itself; one row per order. The text
+# is compact and formatted like the Python encoders (isoformat() timestamps, float
+# money), so every fetch strategy caches the same bytes for an order.
+ORDER_DOCUMENT_SQL = f"""
+SELECT o.id, {_DOCUMENT_JSON} AS document
+FROM orders o
+JOIN users u ON u.id = o.user_id
+JOIN addresses a ON a.id = o.address_id
+CROSS JOIN LATERAL (
+    SELECT '[' || string_agg({_ITEM_JSON}, ',' ORDER BY oi.id) || ']' AS products
+    FROM order_items oi
+    JOIN products p ON p.id = oi.product_id
+    WHERE oi.order_id = o.id
+) items
+WHERE {{condition}} AND items.products IS NOT NULL
+"""
+
+# Documents pre-built by the order_documents triggers; one primary-key lookup.
+STORED_DOCUMENT_SQL = "SELECT order_id, document FROM order_documents WHERE {condition}"
+
+USER_START = len(ORDER_FIELDS)
+ADDRESS_START = USER_START + len(USER_FIELDS)
+ITEM_START = ADDRESS_START + len(ADDRESS_FIELDS)
+
+_order_id = bindparam("order_id", type_=Integer)
+_order_ids = bindparam("order_ids", type_=ARRAY(Integer))
+_user_id = bindparam("user_id", type_=Integer)
+_before_id = bindparam("before_id", type_=Integer)
+_limit = bindparam("limit", type_=Integer)
+_from_id = bindparam("from_id", type_=Integer)
+_to_id = bindparam("to_id", type_=Integer)
+_after_id = bindparam("after_id", type_=Integer)
+
+_header_from = orders.join(users, orders.c.user_id == users.c.id).join(
+    addresses, orders.c.address_id == addresses.c.id
+)
+_items_from = _header_from.join(order_items, order_items.c.order_id == orders.c.id)
+_full_from = _items_from.join(products, order_items.c.product_id == products.c.id)
+
+# Statements are built once so every request reuses the same compiled SQL.
+_join_stmt = (
+    select(*ORDER_COLUMNS, *USER_COLUMNS, *ADDRESS_COLUMNS, *ITEM_COLUMNS)
+    .select_from(_full_from)
+    .where(orders.c.id == _order_id)
+)
+_batch_join_stmt = (
+    select(*ORDER_COLUMNS, *USER_COLUMNS, *ADDRESS_COLUMNS, *ITEM_COLUMNS)
+    .select_from(_full_from)
+    .where(orders.c.id == any_(_order_ids))
+    .order_by(orders.c.id, order_items.c.id)
+)
+_export_stmt = (
+    select(*ORDER_COLUMNS, *USER_COLUMNS, *ADDRESS_COLUMNS, *ITEM_COLUMNS)
+    .select_from(_full_from)
+    .where(orders.c.id.between(_from_id, _to_id))
+    .order_by(orders.c.id, order_items.c.id)
+)
+_order_ids_stmt = (
+    select(orders.c.id).where(orders.c.id > _after_id).order_by(orders.c.id)
+)
+_max_order_id_stmt = select(func.max(orders.c.id))
+_header_stmt = (
+    select(*ORDER_COLUMNS, *USER_COLUMNS, *ADDRESS_COLUMNS)
+    .select_from(_header_from)
+    .where(orders.c.id == _order_id)
+)
+_items_stmt = (
+    select(*ITEM_COLUMNS)
+    .select_from(
+        order_items.join(products, order_items.c.product_id == products.c.id)
+    )
+    .where(order_items.c.order_id == _order_id)
+    .order_by(order_items.c.id)
+)
+_catalog_join_stmt = (
+    select(*ORDER_COLUMNS, *USER_COLUMNS, *ADDRESS_COLUMNS, *CATALOG_ITEM_COLUMNS)
+    .select_from(_items_from)
+    .where(orders.c.id == _order_id)
+)
+_catalog_batch_join_stmt = (
+    select(*ORDER_COLUMNS, *USER_COLUMNS, *ADDRESS_COLUMNS, *CATALOG_ITEM_COLUMNS)
+    .select_from(_items_from)
+    .where(orders.c.id == any_(_order_ids))
+    .order_by(orders.c.id, order_items.c.id)
+)
+_catalog_items_stmt = (
+    select(*CATALOG_ITEM_COLUMNS)
+    .where(order_items.c.order_id == _order_id)
+    .order_by(order_items.c.id)
+)
+_lite_stmt = select(*ORDER_COLUMNS).where(orders.c.id == _order_id)
+_batch_lite_stmt = select(*ORDER_COLUMNS).where(orders.c.id == any_(_order_ids))
+# Keyset pages of a user's orders, newest (highest id) first; see ix_orders_user_id_id.
+_user_orders_stmt = (
+    select(*ORDER_COLUMNS)
+    .where(orders.c.user_id == _user_id)
+    .order_by(orders.c.id.desc())
+    .limit(_limit)
+)
+_user_orders_after_stmt = _user_orders_stmt.where(orders.c.id < _before_id)
+
+
+# A full order as raw rows: (header row, item rows, index of the first item column).
+OrderRows = tuple[Sequence, Sequence[Sequence], int]
+
+
+def order_schema(row: Sequence) -> OrderSchema:
+    return OrderSchema(**dict(zip(ORDER_FIELDS, row[:USER_START])))
+
+
+def item_schema(row: Sequence, start: int) -> OrderItemSchema:
+    return OrderItemSchema(**dict(zip(ITEM_FIELDS, row[start:])))
+
+
+def build_order_response(
+    header: Sequence, item_rows: Sequence[Sequence], item_start: int
+) -> OrderResponse:
+    return OrderResponse(
+        order=order_schema(header),
+        user=UserSchema(**dict(zip(USER_FIELDS, header[USER_START:ADDRESS_START]))),
+        address=AddressSchema(
+            **dict(zip(ADDRESS_FIELDS, header[ADDRESS_START:ITEM_START]))
+        ),
+        products=[item_schema(row, item_start) for row in item_rows],
+    )
+
+
+def group_order_rows(rows: Iterable[Sequence]) -> dict[int, OrderRows]:
+    """Group joined rows sorted by order id into one entry per order."""
+    found: dict[int, OrderRows] = {}
+    group: list[Sequence] = []
+    for row in rows:
+        if group and group[0][0] != row[0]:
+            found[group[0][0]] = (group[0], group, ITEM_START)
+            group = []
+        group.append(row)
+    if group:
+        found[group[0][0]] = (group[0], group, ITEM_START)
+    return found
+
+
+def fill_products(rows: Iterable[Sequence], start: int) -> list[tuple] | None:
+    """Expand CATALOG_ITEM_COLUMNS rows (from index start) to the ITEM_COLUMNS shape.
+
+    Returns None if a product is missing from the shared catalog, i.e. it was added
+    after the last refresh; callers then fall back to joining products.
+    """
+    product = get_catalog().product
+    filled = []
+    for row in rows:
+        fields = product(row[start + 1])
+        if fields is None:
+            return None
+        filled.append((*row[:start + 2], *fields, *row[start + 2:]))
+    return filled
+
+
+def build_order_responses(grouped: dict[int, OrderRows]) -> dict[int, OrderResponse]:
+    return {
+        order_id: build_order_response(*order_rows)
+        for order_id, order_rows in grouped.items()
+    }
+
+
+async def fetch_order_join_rows(
+    session: AsyncSession, order_id: int
+) -> OrderRows | None:
+    conn = await session.connection()
+    if get_catalog() is not None:
+        rows = (await conn.execute(_catalog_join_stmt, {"order_id": order_id})).all()
+        if not rows:
+            return None
+        filled = fill_products(rows, ITEM_START)
+        if filled is not None:
+            return filled[0], filled, ITEM_START
+    rows = (await conn.execute(_join_stmt, {"order_id": order_id})).all()
+    if not rows:
+        return None
+    return rows[0], rows, ITEM_START
+
+
+async def fetch_order_split_rows(
+    session: AsyncSession, order_id: int
+) -> OrderRows | None:
+    conn = await session.connection()
+    header = (await conn.execute(_header_stmt, {"order_id": order_id})).first()
+    if header is None:
+        return None
+    item_rows = None
+    if get_catalog() is not None:
+        rows = (await conn.execute(_catalog_items_stmt, {"order_id": order_id})).all()
+        item_rows = fill_products(rows, 0)
+    if item_rows is None:
+        item_rows = (await conn.execute(_items_stmt, {"order_id": order_id})).all()
+    if not item_rows:
+        return None
+    return header, item_rows, 0
+
+
+async def fetch_order_lite_row(session: AsyncSession, order_id: int) -> Sequence | None:
+    conn = await session.connection()
+    return (await conn.execute(_lite_stmt, {"order_id": order_id})).first()
+
+
+async def fetch_order_rows_by_ids(
+    session: AsyncSession, order_ids: Sequence[int]
+) -> dict[int, OrderRows]:
+    conn = await session.connection()
+    params = {"order_ids": list(order_ids)}
+    if get_catalog() is not None:
+        rows = await conn.execute(_catalog_batch_join_stmt, params)
+        filled = fill_products(rows, ITEM_START)
+        if filled is not None:
+            return group_order_rows(filled)
+    result = await conn.execute(_batch_join_stmt, params)
+    return group_order_rows(result)
+
+
+async def fetch_order_lite_rows_by_ids(
+    session: AsyncSession, order_ids: Sequence[int]
+) -> dict[int, Sequence]:
+    conn = await session.connection()
+    result = await conn.execute(_batch_lite_stmt, {"order_ids": list(order_ids)})
+    return {row[0]: row for row in result}
+
+
+async def fetch_user_order_rows(
+    session: AsyncSession, user_id: int, before_id: int | None, limit: int
+) -> Sequence[Sequence]:
+    conn = await session.connection()
+    params = {"user_id": user_id, "limit": limit}
+    if before_id is None:
+        return (await conn.execute(_user_orders_stmt, params)).all()
+    params["before_id"] = before_id
+    return (await conn.execute(_user_orders_after_stmt, params)).all()
+
+
+async def stream_order_rows(
+    session: AsyncSession, from_id: int, to_id: int, batch_size: int
+) -> AsyncIterator[Sequence[Sequence]]:
+    """Joined rows of an id range, sorted like _batch_join_stmt, in server-side batches."""
+    conn = await session.connection()
+    result = await conn.stream(
+        _export_stmt,
+        {"from_id": from_id, "to_id": to_id},
+        execution_options={"yield_per": batch_size},
+    )
+    async for rows in result.partitions():
+        yield rows
+
+
+async def stream_order_ids(
+    session: AsyncSession, after_id: int, batch_size: int
+) -> AsyncIterator[list[int]]:
+    """Order ids above after_id, ascending, in server-side batches."""
+    conn = await session.connection()
+    result = await conn.stream(
+        _order_ids_stmt,
+        {"after_id": after_id},
+        execution_options={"yield_per": batch_size},
+    )
+    async for rows in result.partitions():
+        yield [row[0] for row in rows]
+
+
+async def fetch_max_order_id(session: AsyncSession) -> int:
+    return await session.scalar(_max_order_id_stmt) or 0
+
+
+async def fetch_order_join(
+    session: AsyncSession, order_id: int
+) -> OrderResponse | None:
+    order_rows = await fetch_order_join_rows(session, order_id)
+    return build_order_response(*order_rows) if order_rows else None
+
+
+async def fetch_order_split(
+    session: AsyncSession, order_id: int
+) -> OrderResponse | None:
+    order_rows = await fetch_order_split_rows(session, order_id)
+    return build_order_response(*order_rows) if order_rows else None
+
+
+async def fetch_order_lite(
+    session: AsyncSession, order_id: int
+) -> OrderSchema | None:
+    row = await fetch_order_lite_row(session, order_id)
+    return order_schema(row) if row is not None else None
+
+
+async def fetch_orders_by_ids(
+    session: AsyncSession, order_ids: Sequence[int]
+) -> dict[int, OrderResponse]:
+    return build_order_responses(await fetch_order_rows_by_ids(session, order_ids))
+
+
+async def fetch_orders_lite_by_ids(
+    session: AsyncSession, order_ids: Sequence[int]
+) -> dict[int, OrderSchema]:
+    rows = await fetch_order_lite_rows_by_ids(session, order_ids)
+    return {order_id: order_schema(row) for order_id, row in rows.items()}
+
+
+async def fetch_user_orders(
+    session: AsyncSession, user_id: int, before_id: int | None, limit: int
+) -> list[OrderSchema]:
+    rows = await fetch_user_order_rows(session, user_id, before_id, limit)
+    return [order_schema(row) for row in rows]
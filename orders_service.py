@@ -1,9 +1,48 @@
 from __future__ import annotations
 
-from sqlalchemy import select
+import base64
+import os
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from contextlib import AbstractAsyncContextManager, aclosing, asynccontextmanager
+from functools import partial
+
+from sqlalchemy import Integer, any_, bindparam, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import Address, Order, OrderItem, Product, User
+import orders_asyncpg
+import orders_core
+from cache import (
+    SingleFlight,
+    StaleWhileRevalidate,
+    acquire_fill_lock,
+    acquire_fill_locks,
+    adopt_refreshed_entries,
+    get_cached_entry,
+    get_many_cached_entries,
+    get_user_orders_page,
+    local_cache_stats,
+    order_cache_key,
+    release_fill_lock,
+    release_fill_locks,
+    set_cached_json,
+    set_many_cached_json,
+    set_user_orders_page,
+    shared_cache_stats,
+    wait_for_cached_bytes,
+)
+from catalog import PRODUCT_CATALOG
+from db import DB_BACKEND, Address, AsyncSessionLocal, Order, OrderItem, Product, User
+from existence import (
+    EXISTENCE_FILTER_BATCH_ROWS,
+    order_may_exist,
+    record_false_positive,
+    start_existence_filter,
+)
+from loader import BatchLoader
+from metrics import phase, register_collector
+from orders_core import ITEM_START, ORDER_DOCUMENT_SQL, STORED_DOCUMENT_SQL, OrderRows
+from pool import checkout_timer
 from schemas import (
     AddressSchema,
     OrderItemSchema,
@@ -11,28 +50,50 @@ from schemas import (
     OrderSchema,
     UserSchema,
 )
+from serialization import SERIALIZER, get_serializer
 
+ORDER_BATCH_MAX_IDS = int(os.getenv("ORDER_BATCH_MAX_IDS", "500"))
+ORDER_FETCH_STRATEGY = os.getenv("ORDER_FETCH_STRATEGY", "join")
+ORDER_READ_MODE = os.getenv("ORDER_READ_MODE", "orm")
+USER_ORDERS_DEFAULT_LIMIT = int(os.getenv("USER_ORDERS_DEFAULT_LIMIT", "20"))
+USER_ORDERS_MAX_LIMIT = int(os.getenv("USER_ORDERS_MAX_LIMIT", "100"))
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "2000"))
+ORDER_LOADER = os.getenv("ORDER_LOADER", "0") == "1"
+ORDER_LOADER_MAX_BATCH = int(os.getenv("ORDER_LOADER_MAX_BATCH", "100"))
+ORDER_LOADER_WAIT_MS = float(os.getenv("ORDER_LOADER_WAIT_MS", "0"))
+# Ids are int4 columns: a larger value from a request is rejected here with a 400
+# instead of failing to encode in the driver.
+MAX_ID = 2**31 - 1
 
-async def fetch_order_by_id(
-    session: AsyncSession, order_id: int
-) -> OrderResponse | None:
-    stmt = (
+_order_document_stmt = text(ORDER_DOCUMENT_SQL.format(condition="o.id = :order_id"))
+_order_documents_stmt = text(
+    ORDER_DOCUMENT_SQL.format(condition="o.id = ANY(:order_ids)")
+).bindparams(bindparam("order_ids", type_=ARRAY(Integer)))
+_stored_document_stmt = text(STORED_DOCUMENT_SQL.format(condition="order_id = :order_id"))
+_stored_documents_stmt = text(
+    STORED_DOCUMENT_SQL.format(condition="order_id = ANY(:order_ids)")
+).bindparams(bindparam("order_ids", type_=ARRAY(Integer)))
+
+# Strategies that return a whole document built by Postgres instead of rows.
+DOCUMENT_STRATEGIES = ("json", "document")
+
+
+def _full_order_select():
+    return (
         select(Order, User, Address, OrderItem, Product)
         .join(User, Order.user_id == User.id)
         .join(Address, Order.address_id == Address.id)
         .join(OrderItem, OrderItem.order_id == Order.id)
         .join(Product, OrderItem.product_id == Product.id)
-        .where(Order.id == order_id)
     )
 
-    result = await session.execute(stmt)
-    rows = result.all()
-    if not rows:
-        return None
 
-    order, user, address, _, _ = rows[0]
+def _ids_param():
+    return bindparam("order_ids", type_=ARRAY(Integer))
 
-    order_data = OrderSchema(
+
+def _order_schema(order: Order) -> OrderSchema:
+    return OrderSchema(
         id=order.id,
         user_id=order.user_id,
         address_id=order.address_id,
@@ -42,6 +103,12 @@ async def fetch_order_by_id(
         created_at=order.created_at,
     )
 
+
+def _build_order_response(rows: Sequence) -> OrderResponse:
+    order, user, address, _, _ = rows[0]
+
+    order_data = _order_schema(order)
+
     user_data = UserSchema(
         id=user.id,
         email=user.email,
@@ -82,21 +149,754 @@ async def fetch_order_by_id(
     )
 
 
-async def fetch_order_lite(
+def _build_split_order_response(header, item_rows: Sequence) -> OrderResponse:
+    return _build_order_response(
+        [(*header, item, product) for item, product in item_rows]
+    )
+
+
+async def _fetch_order_join(
+    session: AsyncSession, order_id: int
+) -> OrderResponse | None:
+    stmt = _full_order_select().where(Order.id == order_id)
+
+    result = await session.execute(stmt)
+    rows = result.all()
+    if not rows:
+        return None
+
+    return _build_order_response(rows)
+
+
+async def _fetch_order_split(
     session: AsyncSession, order_id: int
-) -> OrderSchema | None:
+) -> OrderResponse | None:
+    header_stmt = (
+        select(Order, User, Address)
+        .join(User, Order.user_id == User.id)
+        .join(Address, Order.address_id == Address.id)
+        .where(Order.id == order_id)
+    )
+    header = (await session.execute(header_stmt)).first()
+    if header is None:
+        return None
+
+    items_stmt = (
+        select(OrderItem, Product)
+        .join(Product, OrderItem.product_id == Product.id)
+        .where(OrderItem.order_id == order_id)
+        .order_by(OrderItem.id)
+    )
+    item_rows = (await session.execute(items_stmt)).all()
+    if not item_rows:
+        return None
+
+    return _build_split_order_response(header, item_rows)
+
+
+_ORDER_FETCHERS: dict[tuple[str, str], Callable[..., Awaitable[OrderResponse | None]]] = {
+    ("orm", "join"): _fetch_order_join,
+    ("orm", "split"): _fetch_order_split,
+    ("core", "join"): orders_core.fetch_order_join,
+    ("core", "split"): orders_core.fetch_order_split,
+    ("asyncpg", "join"): orders_asyncpg.fetch_order_join,
+    ("asyncpg", "split"): orders_asyncpg.fetch_order_split,
+}
+
+if DB_BACKEND not in ("sqlalchemy", "asyncpg"):
+    raise ValueError(f"Unknown DB_BACKEND: {DB_BACKEND!r}")
+if ORDER_FETCH_STRATEGY not in ("join", "split", *DOCUMENT_STRATEGIES):
+    raise ValueError(f"Unknown ORDER_FETCH_STRATEGY: {ORDER_FETCH_STRATEGY!r}")
+if ORDER_READ_MODE not in ("orm", "core"):
+    raise ValueError(f"Unknown ORDER_READ_MODE: {ORDER_READ_MODE!r}")
+
+# The asyncpg backend always reads raw rows, so ORDER_READ_MODE only applies to SQLAlchemy.
+DATA_LAYER = "asyncpg" if DB_BACKEND == "asyncpg" else ORDER_READ_MODE
+
+# Alternative serializers encode raw rows; the ORM path only has Pydantic models.
+if DATA_LAYER == "orm" and SERIALIZER != "pydantic":
+    raise ValueError(
+        f"SERIALIZER={SERIALIZER} needs ORDER_READ_MODE=core or DB_BACKEND=asyncpg"
+    )
+# The catalog fills raw item rows; the ORM path loads Product objects instead.
+if DATA_LAYER == "orm" and PRODUCT_CATALOG:
+    raise ValueError("PRODUCT_CATALOG=1 needs ORDER_READ_MODE=core or DB_BACKEND=asyncpg")
+
+_ORDER_ROW_FETCHERS: dict[tuple[str, str], Callable[..., Awaitable[OrderRows | None]]] = {
+    ("core", "join"): orders_core.fetch_order_join_rows,
+    ("core", "split"): orders_core.fetch_order_split_rows,
+    ("asyncpg", "join"): orders_asyncpg.fetch_order_join_rows,
+    ("asyncpg", "split"): orders_asyncpg.fetch_order_split_rows,
+}
+
+
+@asynccontextmanager
+async def _checked_out_session() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as session:
+        # Check the connection out up front so the pool wait is timed on its own.
+        with checkout_timer():
+            await session.connection()
+        yield session
+
+
+def open_session() -> AbstractAsyncContextManager:
+    """Session for the configured backend: an AsyncSession or a pooled asyncpg connection."""
+    if DB_BACKEND == "asyncpg":
+        return orders_asyncpg.acquire()
+    return _checked_out_session()
+
+
+async def fetch_order_by_id(session, order_id: int) -> OrderResponse | None:
+    if ORDER_FETCH_STRATEGY in DOCUMENT_STRATEGIES:
+        document = await fetch_order_document(session, order_id)
+        if document is None:
+            return None
+        return OrderResponse.model_validate_json(document)
+    fetch = _ORDER_FETCHERS[DATA_LAYER, ORDER_FETCH_STRATEGY]
+    return await fetch(session, order_id)
+
+
+async def _fetch_order_document(session: AsyncSession, order_id: int) -> bytes | None:
+    result = await session.execute(_order_document_stmt, {"order_id": order_id})
+    row = result.first()
+    if row is None:
+        return None
+    return row.document.encode()
+
+
+async def _fetch_stored_document(session: AsyncSession, order_id: int) -> bytes | None:
+    result = await session.execute(_stored_document_stmt, {"order_id": order_id})
+    row = result.first()
+    if row is None:
+        # Not built yet (e.g. before the backfill): assemble it like the json strategy.
+        return await _fetch_order_document(session, order_id)
+    return row.document.encode()
+
+
+async def fetch_order_document(session, order_id: int) -> bytes | None:
+    if ORDER_FETCH_STRATEGY == "document":
+        if DB_BACKEND == "asyncpg":
+            return await orders_asyncpg.fetch_stored_document(session, order_id)
+        return await _fetch_stored_document(session, order_id)
+    if DB_BACKEND == "asyncpg":
+        return await orders_asyncpg.fetch_order_document(session, order_id)
+    return await _fetch_order_document(session, order_id)
+
+
+async def _fetch_payload_with(
+    fetch: Callable[..., Awaitable[OrderResponse | None]],
+    session,
+    order_id: int,
+) -> bytes | None:
+    data = await fetch(session, order_id)
+    if data is None:
+        return None
+    with phase("serialize"):
+        return data.model_dump_json().encode()
+
+
+async def _encode_rows_with(
+    fetch: Callable[..., Awaitable[OrderRows | None]],
+    session,
+    order_id: int,
+) -> bytes | None:
+    order_rows = await fetch(session, order_id)
+    if order_rows is None:
+        return None
+    with phase("serialize"):
+        return get_serializer().encode_order(*order_rows)
+
+
+async def fetch_order_payload(session, order_id: int) -> bytes | None:
+    if ORDER_FETCH_STRATEGY in DOCUMENT_STRATEGIES:
+        return await fetch_order_document(session, order_id)
+    if DATA_LAYER == "orm":
+        return await _fetch_payload_with(fetch_order_by_id, session, order_id)
+    fetch = _ORDER_ROW_FETCHERS[DATA_LAYER, ORDER_FETCH_STRATEGY]
+    return await _encode_rows_with(fetch, session, order_id)
+
+
+async def fetch_order_lite_payload(session, order_id: int) -> bytes | None:
+    if DATA_LAYER == "orm":
+        data = await fetch_order_lite(session, order_id)
+        if data is None:
+            return None
+        with phase("serialize"):
+            return data.model_dump_json().encode()
+    if DATA_LAYER == "asyncpg":
+        row = await orders_asyncpg.fetch_order_lite_row(session, order_id)
+    else:
+        row = await orders_core.fetch_order_lite_row(session, order_id)
+    if row is None:
+        return None
+    with phase("serialize"):
+        return get_serializer().encode_order_lite(row)
+
+
+async def fetch_order_payloads_by_ids(
+    session, order_ids: Sequence[int], lite: bool
+) -> dict[int, bytes]:
+    if lite:
+        if DATA_LAYER == "orm":
+            found = await fetch_orders_lite_by_ids(session, order_ids)
+            with phase("serialize"):
+                return {
+                    key: data.model_dump_json().encode() for key, data in found.items()
+                }
+        layer = orders_asyncpg if DATA_LAYER == "asyncpg" else orders_core
+        rows = await layer.fetch_order_lite_rows_by_ids(session, order_ids)
+        encode_lite = get_serializer().encode_order_lite
+        with phase("serialize"):
+            return {key: encode_lite(row) for key, row in rows.items()}
+
+    if ORDER_FETCH_STRATEGY in DOCUMENT_STRATEGIES:
+        return await fetch_order_documents(session, order_ids)
+    if DATA_LAYER == "orm":
+        found = await fetch_orders_by_ids(session, order_ids)
+        with phase("serialize"):
+            return {key: data.model_dump_json().encode() for key, data in found.items()}
+    layer = orders_asyncpg if DATA_LAYER == "asyncpg" else orders_core
+    grouped = await layer.fetch_order_rows_by_ids(session, order_ids)
+    encode = get_serializer().encode_order
+    with phase("serialize"):
+        return {key: encode(*order_rows) for key, order_rows in grouped.items()}
+
+
+# Every backend/strategy combination, keyed for scripts/bench_fetch_strategies.py.
+PayloadFetcher = Callable[..., Awaitable[bytes | None]]
+
+FETCH_STRATEGIES: dict[
+    str, tuple[Callable[[], AbstractAsyncContextManager], PayloadFetcher]
+] = {
+    "join": (AsyncSessionLocal, partial(_fetch_payload_with, _fetch_order_join)),
+    "split": (AsyncSessionLocal, partial(_fetch_payload_with, _fetch_order_split)),
+    "json": (AsyncSessionLocal, _fetch_order_document),
+    "document": (AsyncSessionLocal, _fetch_stored_document),
+    "core-join": (
+        AsyncSessionLocal,
+        partial(_encode_rows_with, orders_core.fetch_order_join_rows),
+    ),
+    "core-split": (
+        AsyncSessionLocal,
+        partial(_encode_rows_with, orders_core.fetch_order_split_rows),
+    ),
+    "asyncpg-join": (
+        orders_asyncpg.acquire,
+        partial(_encode_rows_with, orders_asyncpg.fetch_order_join_rows),
+    ),
+    "asyncpg-split": (
+        orders_asyncpg.acquire,
+        partial(_encode_rows_with, orders_asyncpg.fetch_order_split_rows),
+    ),
+    "asyncpg-json": (orders_asyncpg.acquire, orders_asyncpg.fetch_order_document),
+    "asyncpg-document": (orders_asyncpg.acquire, orders_asyncpg.fetch_stored_document),
+}
+
+
+async def fetch_order_lite(session, order_id: int) -> OrderSchema | None:
+    if DATA_LAYER == "asyncpg":
+        return await orders_asyncpg.fetch_order_lite(session, order_id)
+    if DATA_LAYER == "core":
+        return await orders_core.fetch_order_lite(session, order_id)
     stmt = select(Order).where(Order.id == order_id)
     result = await session.execute(stmt)
     order = result.scalar_one_or_none()
     if order is None:
         return None
 
-    return OrderSchema(
-        id=order.id,
-        user_id=order.user_id,
-        address_id=order.address_id,
-        quantity=order.quantity,
-        status=order.status,
-        total=order.total,
-        created_at=order.created_at,
+    return _order_schema(order)
+
+
+async def _fetch_order_documents(
+    session: AsyncSession, order_ids: Sequence[int]
+) -> dict[int, bytes]:
+    result = await session.execute(_order_documents_stmt, {"order_ids": list(order_ids)})
+    return {row.id: row.document.encode() for row in result}
+
+
+async def _fetch_stored_documents(
+    session: AsyncSession, order_ids: Sequence[int]
+) -> dict[int, bytes]:
+    result = await session.execute(_stored_documents_stmt, {"order_ids": list(order_ids)})
+    found = {row.order_id: row.document.encode() for row in result}
+    missing = [order_id for order_id in order_ids if order_id not in found]
+    if missing:
+        found.update(await _fetch_order_documents(session, missing))
+    return found
+
+
+async def fetch_order_documents(
+    session, order_ids: Sequence[int]
+) -> dict[int, bytes]:
+    if ORDER_FETCH_STRATEGY == "document":
+        if DB_BACKEND == "asyncpg":
+            return await orders_asyncpg.fetch_stored_documents(session, order_ids)
+        return await _fetch_stored_documents(session, order_ids)
+    if DB_BACKEND == "asyncpg":
+        return await orders_asyncpg.fetch_order_documents(session, order_ids)
+    return await _fetch_order_documents(session, order_ids)
+
+
+async def fetch_orders_by_ids(
+    session, order_ids: Sequence[int]
+) -> dict[int, OrderResponse]:
+    if DATA_LAYER == "asyncpg":
+        return await orders_asyncpg.fetch_orders_by_ids(session, order_ids)
+    if DATA_LAYER == "core":
+        return await orders_core.fetch_orders_by_ids(session, order_ids)
+    stmt = (
+        _full_order_select()
+        .where(Order.id == any_(_ids_param()))
+        .order_by(Order.id, OrderItem.id)
+    )
+    result = await session.execute(stmt, {"order_ids": list(order_ids)})
+
+    orders: dict[int, OrderResponse] = {}
+    group: list = []
+    for row in result.all():
+        if group and group[0][0].id != row[0].id:
+            orders[group[0][0].id] = _build_order_response(group)
+            group = []
+        group.append(row)
+    if group:
+        orders[group[0][0].id] = _build_order_response(group)
+    return orders
+
+
+async def fetch_orders_lite_by_ids(
+    session, order_ids: Sequence[int]
+) -> dict[int, OrderSchema]:
+    if DATA_LAYER == "asyncpg":
+        return await orders_asyncpg.fetch_orders_lite_by_ids(session, order_ids)
+    if DATA_LAYER == "core":
+        return await orders_core.fetch_orders_lite_by_ids(session, order_ids)
+    stmt = select(Order).where(Order.id == any_(_ids_param()))
+    result = await session.execute(stmt, {"order_ids": list(order_ids)})
+    return {order.id: _order_schema(order) for order in result.scalars()}
+
+
+async def fetch_user_orders(
+    session, user_id: int, before_id: int | None, limit: int
+) -> list[OrderSchema]:
+    if DATA_LAYER == "asyncpg":
+        return await orders_asyncpg.fetch_user_orders(session, user_id, before_id, limit)
+    if DATA_LAYER == "core":
+        return await orders_core.fetch_user_orders(session, user_id, before_id, limit)
+    stmt = (
+        select(Order)
+        .where(Order.user_id == user_id)
+        .order_by(Order.id.desc())
+        .limit(limit)
+    )
+    if before_id is not None:
+        stmt = stmt.where(Order.id < before_id)
+    result = await session.execute(stmt)
+    return [_order_schema(order) for order in result.scalars()]
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(b"o:%d" % last_id).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.b64decode(
+            cursor + "=" * (-len(cursor) % 4), altchars=b"-_", validate=True
+        )
+        prefix, _, last_id = raw.partition(b":")
+        before_id = int(last_id)
+        # Anything outside the id range did not come from encode_cursor.
+        if prefix != b"o" or not 0 < before_id <= MAX_ID:
+            raise ValueError
+        return before_id
+    except ValueError:
+        raise ValueError("invalid cursor") from None
+
+
+def parse_page_params(
+    user_id: int, cursor: str | None, limit: str | int | None
+) -> tuple[int | None, int]:
+    """Validate the user id and the cursor and limit query parameters; returns
+    (before_id, limit)."""
+    if not 0 < user_id <= MAX_ID:
+        raise ValueError(f"user_id must be between 1 and {MAX_ID}")
+    if limit is None or limit == "":
+        page_size = USER_ORDERS_DEFAULT_LIMIT
+    else:
+        try:
+            page_size = int(limit)
+        except ValueError:
+            raise ValueError("limit must be an integer") from None
+        if not 1 <= page_size <= USER_ORDERS_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {USER_ORDERS_MAX_LIMIT}")
+    return (decode_cursor(cursor) if cursor else None), page_size
+
+
+def _user_orders_page(items: list[bytes], next_id: int | None) -> bytes:
+    next_cursor = b"null"
+    if next_id is not None:
+        next_cursor = b'"%s"' % encode_cursor(next_id).encode()
+    return b'{"orders":[' + b",".join(items) + b'],"next_cursor":' + next_cursor + b"}"
+
+
+async def fetch_user_orders_payload(
+    session, user_id: int, before_id: int | None, limit: int
+) -> bytes:
+    # One extra row tells whether another page follows.
+    if DATA_LAYER == "orm":
+        found = await fetch_user_orders(session, user_id, before_id, limit + 1)
+        page_ids = [order.id for order in found[:limit]]
+        with phase("serialize"):
+            items = [order.model_dump_json().encode() for order in found[:limit]]
+    else:
+        layer = orders_asyncpg if DATA_LAYER == "asyncpg" else orders_core
+        found = await layer.fetch_user_order_rows(session, user_id, before_id, limit + 1)
+        page_ids = [row[0] for row in found[:limit]]
+        encode_lite = get_serializer().encode_order_lite
+        with phase("serialize"):
+            items = [encode_lite(row) for row in found[:limit]]
+    next_id = page_ids[-1] if len(found) > limit else None
+    return _user_orders_page(items, next_id)
+
+
+async def load_user_orders_payload(
+    user_id: int, before_id: int | None, limit: int
+) -> bytes:
+    """One page of a user's orders, newest first; only first pages are cached."""
+    version = None
+    if before_id is None:
+        with phase("cache"):
+            cached, version = await get_user_orders_page(user_id, limit)
+        if cached is not None:
+            return cached
+
+    with phase("db"):
+        async with open_session() as session:
+            payload = await fetch_user_orders_payload(session, user_id, before_id, limit)
+
+    if version is not None:
+        with phase("cache"):
+            await set_user_orders_page(user_id, limit, payload, version)
+    return payload
+
+
+_inflight = SingleFlight()
+_revalidation = StaleWhileRevalidate()
+
+
+async def _load_order_payloads(lite: bool, order_ids: list[int]) -> dict[int, bytes]:
+    async with open_session() as session:
+        if len(order_ids) > 1:
+            return await fetch_order_payloads_by_ids(session, order_ids, lite)
+        # A batch of one is cheaper through the single-order statements.
+        (order_id,) = order_ids
+        if lite:
+            payload = await fetch_order_lite_payload(session, order_id)
+        else:
+            payload = await fetch_order_payload(session, order_id)
+        return {} if payload is None else {order_id: payload}
+
+
+# With ORDER_LOADER, cache misses of concurrent requests share one session and one
+# WHERE id = ANY(...) query per payload kind instead of a checkout and query each.
+_payload_loaders = {
+    lite: BatchLoader(
+        partial(_load_order_payloads, lite),
+        ORDER_LOADER_MAX_BATCH,
+        ORDER_LOADER_WAIT_MS / 1000,
+    )
+    for lite in (False, True)
+}
+
+
+async def load_order_payload(order_id: int, lite: bool) -> bytes | None:
+    if not order_may_exist(order_id):
+        return None
+    cache_key = order_cache_key(order_id, lite)
+    with phase("cache"):
+        cached, stale = await get_cached_entry(cache_key)
+    _revalidation.record(cached, stale)
+    if cached is not None:
+        if stale:
+            _revalidation.revalidate(
+                [cache_key], partial(_refresh_order_payloads, {cache_key: order_id}, lite)
+            )
+        return cached
+    payload = await _inflight.do(
+        cache_key, lambda: _fill_order_payload(cache_key, order_id, lite)
+    )
+    if payload is None:
+        record_false_positive()
+    return payload
+
+
+async def _fill_order_payload(
+    cache_key: str, order_id: int, lite: bool
+) -> bytes | None:
+    with phase("cache"):
+        token = await acquire_fill_lock(cache_key)
+        if token is None:
+            cached = await wait_for_cached_bytes(cache_key)
+            if cached is not None:
+                return cached
+
+    try:
+        with phase("db"):
+            if ORDER_LOADER:
+                payload = await _payload_loaders[lite].load(order_id)
+            else:
+                async with open_session() as session:
+                    if lite:
+                        payload = await fetch_order_lite_payload(session, order_id)
+                    else:
+                        payload = await fetch_order_payload(session, order_id)
+
+        if payload is None:
+            return None
+
+        with phase("cache"):
+            await set_cached_json(cache_key, payload)
+        return payload
+    finally:
+        if token is not None:
+            with phase("cache"):
+                await release_fill_lock(cache_key, token)
+
+
+async def _refresh_order_payloads(
+    order_ids: dict[str, int], lite: bool, keys: list[str]
+) -> int:
+    """Rewrite stale entries from Postgres (run in the background); returns the count."""
+    # Another worker may have refreshed them already and its copies are in Redis.
+    keys = await adopt_refreshed_entries(keys)
+    tokens = await acquire_fill_locks(keys)
+    locked = list(tokens)
+    if not locked:
+        return 0
+    try:
+        async with open_session() as session:
+            fetched = await fetch_order_payloads_by_ids(
+                session, [order_ids[key] for key in locked], lite
+            )
+        # Orders that are gone stay cached until the hard TTL, like before.
+        fresh = {
+            key: fetched[order_ids[key]] for key in locked if order_ids[key] in fetched
+        }
+        await set_many_cached_json(fresh)
+        return len(fresh)
+    finally:
+        await release_fill_locks(tokens)
+
+
+def _render_revalidation(dumps: list[dict]) -> list[str]:
+    totals = dict.fromkeys(_revalidation.stats(), 0)
+    for dump in dumps:
+        for key, value in dump.items():
+            totals[key] += value
+    lines = [
+        "# HELP order_cache_lookups_total Order cache lookups by outcome, all workers.",
+        "# TYPE order_cache_lookups_total counter",
+    ]
+    for result, key in (("hit", "hits"), ("stale", "stale_hits"), ("miss", "misses")):
+        lines.append(f'order_cache_lookups_total{{result="{result}"}} {totals[key]}')
+    lines.append(
+        "# HELP order_cache_refreshes_total Background refreshes of stale entries."
     )
+    lines.append("# TYPE order_cache_refreshes_total counter")
+    for result, key in (
+        ("refreshed", "refreshed"),
+        ("skipped", "refresh_skipped"),
+        ("failed", "refresh_failed"),
+    ):
+        lines.append(f'order_cache_refreshes_total{{result="{result}"}} {totals[key]}')
+    lines.append("# HELP order_cache_refreshing Stale keys with a refresh in flight.")
+    lines.append("# TYPE order_cache_refreshing gauge")
+    lines.append(f"order_cache_refreshing {totals['refreshing']}")
+    return lines
+
+
+register_collector(
+    "revalidation",
+    _revalidation.stats,
+    _render_revalidation,
+    lambda stats: {**stats, "refreshing": 0},
+)
+
+
+def _dump_cache_tiers() -> dict:
+    return {
+        "local": int(local_cache_stats() is not None),
+        "shared": int(shared_cache_stats() is not None),
+    }
+
+
+def _render_cache_tiers(dumps: list[dict]) -> list[str]:
+    # Tools that reset the cache (scripts.scenarios) check this: they cannot reach the
+    # workers' in-process tiers.
+    lines = [
+        "# HELP order_cache_tier_workers Workers with an in-process cache tier enabled.",
+        "# TYPE order_cache_tier_workers gauge",
+    ]
+    for tier in ("local", "shared"):
+        workers = sum(dump[tier] for dump in dumps)
+        lines.append(f'order_cache_tier_workers{{tier="{tier}"}} {workers}')
+    return lines
+
+
+register_collector("cache_tiers", _dump_cache_tiers, _render_cache_tiers)
+
+
+def _dump_loaders() -> dict:
+    return {
+        "lite" if lite else "full": loader.stats()
+        for lite, loader in _payload_loaders.items()
+    }
+
+
+def _render_loaders(dumps: list[dict]) -> list[str]:
+    totals: dict[str, dict[str, int]] = {}
+    for dump in dumps:
+        for kind, stats in dump.items():
+            summed = totals.setdefault(kind, dict.fromkeys(stats, 0))
+            for key, value in stats.items():
+                summed[key] += value
+    lines = []
+    for key, help_text in (
+        ("batches", "Batched order queries run by the loader."),
+        ("keys", "Order ids fetched through the loader."),
+    ):
+        lines.append(f"# HELP order_loader_{key}_total {help_text}")
+        lines.append(f"# TYPE order_loader_{key}_total counter")
+        for kind, stats in sorted(totals.items()):
+            lines.append(f'order_loader_{key}_total{{kind="{kind}"}} {stats[key]}')
+    return lines
+
+
+if ORDER_LOADER:
+    register_collector("loader", _dump_loaders, _render_loaders, lambda dump: dump)
+
+
+def parse_order_ids(raw: str | None) -> list[int]:
+    if not raw:
+        raise ValueError("ids query parameter is required")
+    try:
+        order_ids = [int(part) for part in raw.split(",") if part.strip()]
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of integers") from None
+    if not order_ids:
+        raise ValueError("ids query parameter is required")
+    if len(order_ids) > ORDER_BATCH_MAX_IDS:
+        raise ValueError(f"at most {ORDER_BATCH_MAX_IDS} ids per request")
+    if not all(0 < order_id <= MAX_ID for order_id in order_ids):
+        raise ValueError(f"ids must be between 1 and {MAX_ID}")
+    return order_ids
+
+
+def _not_found_marker(order_id: int) -> bytes:
+    return b'{"id":%d,"detail":"No orders found"}' % order_id
+
+
+async def load_order_batch_payload(order_ids: Sequence[int], lite: bool) -> bytes:
+    unique_ids = [
+        order_id for order_id in dict.fromkeys(order_ids) if order_may_exist(order_id)
+    ]
+    cache_keys = [order_cache_key(order_id, lite) for order_id in unique_ids]
+    with phase("cache"):
+        cached = await get_many_cached_entries(cache_keys)
+
+    payloads: dict[int, bytes] = {}
+    missing: list[int] = []
+    stale_ids: dict[str, int] = {}
+    for order_id, cache_key, (value, stale) in zip(unique_ids, cache_keys, cached):
+        _revalidation.record(value, stale)
+        if value is None:
+            missing.append(order_id)
+        else:
+            payloads[order_id] = value
+            if stale:
+                stale_ids[cache_key] = order_id
+    if stale_ids:
+        _revalidation.revalidate(
+            list(stale_ids), partial(_refresh_order_payloads, stale_ids, lite)
+        )
+
+    if missing:
+        with phase("db"):
+            async with open_session() as session:
+                fetched = await fetch_order_payloads_by_ids(session, missing, lite)
+        record_false_positive(len(missing) - len(fetched))
+
+        fresh: dict[str, bytes] = {}
+        for order_id, payload in fetched.items():
+            payloads[order_id] = payload
+            fresh[order_cache_key(order_id, lite)] = payload
+        with phase("cache"):
+            await set_many_cached_json(fresh)
+
+    parts = [
+        payloads.get(order_id) or _not_found_marker(order_id)
+        for order_id in order_ids
+    ]
+    return b"[" + b",".join(parts) + b"]"
+
+
+async def _max_order_id() -> int:
+    layer = orders_asyncpg if DB_BACKEND == "asyncpg" else orders_core
+    async with open_session() as session:
+        return await layer.fetch_max_order_id(session)
+
+
+async def _order_ids_after(after_id: int) -> AsyncIterator[list[int]]:
+    layer = orders_asyncpg if DB_BACKEND == "asyncpg" else orders_core
+    async with open_session() as session, aclosing(
+        layer.stream_order_ids(session, after_id, EXISTENCE_FILTER_BATCH_ROWS)
+    ) as batches:
+        async for batch in batches:
+            yield batch
+
+
+async def start_order_existence_filter() -> None:
+    """App startup hook: start building the EXISTENCE_FILTER order id filter."""
+    start_existence_filter(_max_order_id, _order_ids_after)
+
+
+def parse_export_range(from_id: str | None, to_id: str | None) -> tuple[int, int]:
+    if not from_id or not to_id:
+        raise ValueError("from_id and to_id query parameters are required")
+    try:
+        start, end = int(from_id), int(to_id)
+    except ValueError:
+        raise ValueError("from_id and to_id must be integers") from None
+    # Checked here: once the export streams, the 200 status has already been sent.
+    if not (0 < start <= MAX_ID and 0 < end <= MAX_ID):
+        raise ValueError(f"from_id and to_id must be between 1 and {MAX_ID}")
+    if start > end:
+        raise ValueError("from_id must not be greater than to_id")
+    return start, end
+
+
+async def stream_order_export(from_id: int, to_id: int) -> AsyncIterator[bytes]:
+    """Full orders in [from_id, to_id] as NDJSON, one chunk per fetched row batch.
+
+    Rows come from a server-side cursor and the next batch is only fetched when the
+    response asks for the next chunk, so memory stays at one batch and a slow client
+    slows the query down instead of filling buffers. Raw rows are used in every read
+    mode: ORM objects would pile up in the session's identity map.
+    """
+    layer = orders_asyncpg if DB_BACKEND == "asyncpg" else orders_core
+    encode = get_serializer().encode_order
+    group: list[Sequence] = []
+    async with open_session() as session, aclosing(
+        layer.stream_order_rows(session, from_id, to_id, EXPORT_BATCH_ROWS)
+    ) as batches:
+        async for rows in batches:
+            lines = []
+            for row in rows:
+                if group and group[0][0] != row[0]:
+                    lines.append(encode(group[0], group, ITEM_START))
+                    group = []
+                group.append(row)
+            if lines:
+                yield b"\n".join(lines) + b"\n"
+    if group:
+        yield encode(group[0], group, ITEM_START) + b"\n"
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from metrics import BUCKETS, phase, register_collector
+
+# Connection pool sizing, background liveness checks and pool telemetry shared by the
+# SQLAlchemy engine and the asyncpg pool. Every worker process gets an equal share of
+# DB_CONNECTION_BUDGET, so WORKERS x (pool size + overflow) never exceeds the budget.
+# The server's --workers is not visible to a worker, so WORKERS must match it; unset, it
+# assumes the benchmark's 10 workers rather than giving one worker the whole budget.
+# Instead of pinging on every checkout (pool_pre_ping), a background task pings an idle
+# connection every DB_HEALTH_CHECK_INTERVAL seconds and recycles the whole pool when
+# the ping fails, which is what a database restart or failover looks like.
+
+WORKERS = max(int(os.getenv("WORKERS", "10")), 1)
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "90"))
+DB_POOL_OVERFLOW_FRACTION = float(os.getenv("DB_POOL_OVERFLOW_FRACTION", "0.25"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0") == "1"
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_HEALTH_CHECK_INTERVAL", "5"))
+DB_HEALTH_CHECK_TIMEOUT = float(os.getenv("DB_HEALTH_CHECK_TIMEOUT", "2"))
+
+
+def worker_pool_size(
+    budget: int, workers: int, overflow_fraction: float
+) -> tuple[int, int]:
+    """Split the global budget evenly: (pool size, max overflow) for one worker."""
+    per_worker = max(budget // workers, 1)
+    overflow = int(per_worker * overflow_fraction)
+    return max(per_worker - overflow, 1), overflow
+
+
+_size, _overflow = worker_pool_size(
+    DB_CONNECTION_BUDGET, WORKERS, DB_POOL_OVERFLOW_FRACTION
+)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(_size)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(_overflow)))
+
+
+@dataclass
+class PoolState:
+    in_use: int
+    idle: int
+    overflow: int
+    capacity: int
+
+
+@dataclass
+class MonitoredPool:
+    state: Callable[[], PoolState]
+    # Pings one idle connection; only called when state().idle > 0.
+    ping: Callable[[], Awaitable[None]]
+    # Drops every pooled connection so the next checkouts reconnect.
+    invalidate: Callable[[], Awaitable[None]]
+
+
+class PoolTelemetry:
+    def __init__(self) -> None:
+        self.wait_counts = [0] * (len(BUCKETS) + 1)
+        self.wait_sum = 0.0
+        self.timeouts = 0
+        self.checks_ok = 0
+        self.checks_failed = 0
+
+    def observe_wait(self, seconds: float) -> None:
+        self.wait_counts[bisect_left(BUCKETS, seconds)] += 1
+        self.wait_sum += seconds
+
+
+telemetry = PoolTelemetry()
+_pools: dict[str, MonitoredPool] = {}
+_health_task: asyncio.Task | None = None
+
+
+def register_pool(name: str, pool: MonitoredPool) -> None:
+    _pools[name] = pool
+
+
+@contextmanager
+def checkout_timer() -> Iterator[None]:
+    """Time a pool checkout; shows up as the "pool" Server-Timing phase."""
+    global _health_task
+    if _health_task is None and DB_HEALTH_CHECK_INTERVAL > 0:
+        _health_task = asyncio.get_running_loop().create_task(_check_health())
+    started = time.perf_counter()
+    try:
+        with phase("pool"):
+            yield
+    except (PoolTimeoutError, TimeoutError):
+        telemetry.timeouts += 1
+        raise
+    telemetry.observe_wait(time.perf_counter() - started)
+
+
+async def _check_health() -> None:
+    while True:
+        await asyncio.sleep(DB_HEALTH_CHECK_INTERVAL)
+        for pool in _pools.values():
+            if pool.state().idle == 0:
+                continue
+            try:
+                async with asyncio.timeout(DB_HEALTH_CHECK_TIMEOUT):
+                    await pool.ping()
+            except Exception:
+                # Whatever broke this connection (restart, failover, network) most
+                # likely broke its siblings too.
+                telemetry.checks_failed += 1
+                await pool.invalidate()
+            else:
+                telemetry.checks_ok += 1
+
+
+def _dump() -> dict:
+    return {
+        "wait": [telemetry.wait_counts, telemetry.wait_sum],
+        "timeouts": telemetry.timeouts,
+        "health": [telemetry.checks_ok, telemetry.checks_failed],
+        "pools": {name: vars(pool.state()) for name, pool in _pools.items()},
+    }
+
+
+def _render(dumps: list[dict]) -> list[str]:
+    wait_counts = [0] * (len(BUCKETS) + 1)
+    wait_sum = 0.0
+    timeouts = checks_ok = checks_failed = 0
+    gauges: dict[str, dict[str, int]] = {}
+    for dump in dumps:
+        counts, total = dump["wait"]
+        wait_counts = [a + b for a, b in zip(wait_counts, counts)]
+        wait_sum += total
+        timeouts += dump["timeouts"]
+        checks_ok += dump["health"][0]
+        checks_failed += dump["health"][1]
+        for name, state in dump["pools"].items():
+            summed = gauges.setdefault(name, dict.fromkeys(state, 0))
+            for key, value in state.items():
+                summed[key] += value
+
+    name = "db_pool_checkout_wait_seconds"
+    lines = [
+        f"# HELP {name} Time to check out a database connection.",
+        f"# TYPE {name} histogram",
+    ]
+    cumulative = 0
+    for bound, count in zip((*BUCKETS, "+Inf"), wait_counts):
+        cumulative += count
+        le = bound if isinstance(bound, str) else repr(bound)
+        lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+    lines.append(f"{name}_sum {wait_sum:.6f}")
+    lines.append(f"{name}_count {cumulative}")
+
+    lines.append("# HELP db_pool_connections Pooled connections by state, all workers.")
+    lines.append("# TYPE db_pool_connections gauge")
+    for pool, state in sorted(gauges.items()):
+        for key in ("in_use", "idle"):
+            lines.append(f'db_pool_connections{{pool="{pool}",state="{key}"}} {state[key]}')
+    for key, help_text in (
+        ("overflow", "Connections above the pool size, all workers."),
+        ("capacity", "Maximum connections, all workers."),
+    ):
+        lines.append(f"# HELP db_pool_{key} {help_text}")
+        lines.append(f"# TYPE db_pool_{key} gauge")
+        for pool, state in sorted(gauges.items()):
+            lines.append(f'db_pool_{key}{{pool="{pool}"}} {state[key]}')
+    lines.append("# HELP db_pool_checkout_timeouts_total Checkouts that hit DB_POOL_TIMEOUT.")
+    lines.append("# TYPE db_pool_checkout_timeouts_total counter")
+    lines.append(f"db_pool_checkout_timeouts_total {timeouts}")
+    lines.append("# HELP db_pool_health_checks_total Background liveness checks.")
+    lines.append("# TYPE db_pool_health_checks_total counter")
+    lines.append(f'db_pool_health_checks_total{{result="ok"}} {checks_ok}')
+    lines.append(f'db_pool_health_checks_total{{result="failed"}} {checks_failed}')
+    return lines
+
+
+register_collector("pool", _dump, _render, lambda dump: {**dump, "pools": {}})
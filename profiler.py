@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from cache import APP_NAME, DEPLOYMENT_ID
+
+# Wall-clock sampling profiler for app workers. A daemon thread reads every thread's
+# stack via sys._current_frames() at a fixed interval for a bounded window, then writes
+# collapsed stacks (flamegraph.pl / speedscope input) and a speedscope JSON profile.
+# A window is started by PROFILE_ON_START, by SIGUSR2 or by POST /admin/profile, which
+# signals every worker of the deployment. The endpoint is unauthenticated, so it only
+# exists with PROFILE_ADMIN=1.
+
+SERVER = os.getenv("SERVER", "unknown")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "reports"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DURATION = float(os.getenv("PROFILE_DURATION", "30"))
+PROFILE_ON_START = float(os.getenv("PROFILE_ON_START", "0"))
+PROFILE_START_DELAY = float(os.getenv("PROFILE_START_DELAY", "0"))
+PROFILE_ADMIN = os.getenv("PROFILE_ADMIN", "0") == "1"
+PROFILE_MAX_SECONDS = 300.0
+
+_WORKERS_DIR = (
+    Path(tempfile.gettempdir())
+    / "perf_test_profiler"
+    / DEPLOYMENT_ID.replace(":", "_").replace("/", "_")
+)
+
+_lock = threading.Lock()
+_active: Sampler | None = None
+
+
+def _frame_name(code) -> str:
+    filename = code.co_filename
+    for marker in ("site-packages/", "lib/python"):
+        index = filename.rfind(marker)
+        if index >= 0:
+            filename = filename[index + len(marker) :]
+            break
+    else:
+        filename = os.path.relpath(filename) if filename.startswith("/") else filename
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class Sampler(threading.Thread):
+    def __init__(self, seconds: float, interval: float) -> None:
+        super().__init__(name="profiler", daemon=True)
+        self.seconds = seconds
+        self.interval = interval
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.samples = 0
+        self.names: dict[object, str] = {}
+
+    def sample(self) -> None:
+        threads = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self.ident:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                name = self.names.get(code)
+                if name is None:
+                    name = self.names[code] = _frame_name(code)
+                stack.append(name)
+                frame = frame.f_back
+            stack.append(f"thread {threads.get(ident, ident)}")
+            self.stacks[tuple(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self) -> None:
+        global _active
+        started = time.perf_counter()
+        deadline = started + self.seconds
+        next_sample = started
+        try:
+            while time.perf_counter() < deadline:
+                self.sample()
+                next_sample += self.interval
+                time.sleep(max(next_sample - time.perf_counter(), 0.0))
+            self.write(time.perf_counter() - started)
+        finally:
+            with _lock:
+                _active = None
+
+    def write(self, elapsed: float) -> None:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        base = PROFILE_DIR / f"profile-{APP_NAME}-{SERVER}-{os.getpid()}-{stamp}"
+        collapsed = "".join(
+            f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common()
+        )
+        base.with_suffix(".collapsed").write_text(collapsed)
+        base.with_suffix(".speedscope.json").write_text(
+            json.dumps(self.speedscope(base.name, elapsed))
+        )
+
+    def speedscope(self, name: str, elapsed: float) -> dict:
+        frames: dict[str, int] = {}
+        samples = []
+        weights = []
+        interval_ms = self.interval * 1000
+        for stack, count in self.stacks.items():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(count * interval_ms)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "perf_test profiler",
+            "shared": {"frames": [{"name": frame} for frame in frames]},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": f"{APP_NAME}/{SERVER} pid {os.getpid()}",
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": round(elapsed * 1000, 3),
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+def start_profiling(seconds: float = PROFILE_DURATION, delay: float = 0.0) -> bool:
+    """Start a sampling window in this process; False if one is already running."""
+    global _active
+    seconds = min(seconds, PROFILE_MAX_SECONDS)
+    with _lock:
+        if _active is not None:
+            return False
+        _active = Sampler(seconds, PROFILE_INTERVAL_MS / 1000)
+    if delay > 0:
+        timer = threading.Timer(delay, _active.start)
+        timer.daemon = True
+        timer.start()
+    else:
+        _active.start()
+    return True
+
+
+def _parent_pid(pid: int) -> int | None:
+    try:
+        with open(f"/proc/{pid}/stat") as stat:
+            return int(stat.read().rsplit(")", 1)[1].split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def profile_all_workers(seconds: float) -> int:
+    """Start a window in every registered worker of this deployment via SIGUSR2."""
+    _WORKERS_DIR.mkdir(parents=True, exist_ok=True)
+    request = _WORKERS_DIR / "request"
+    partial = request.with_suffix(".tmp")
+    partial.write_text(f"{seconds:g}")
+    os.replace(partial, request)
+    signalled = 0
+    own_pid = os.getpid()
+    supervisor = os.getppid()
+    for path in _WORKERS_DIR.glob("[0-9]*"):
+        pid = int(path.name)
+        if pid == own_pid:
+            continue
+        if _parent_pid(pid) != supervisor:
+            # Left by a worker that was killed before its atexit hook ran; the pid may
+            # now belong to an unrelated process, which SIGUSR2 would terminate.
+            path.unlink(missing_ok=True)
+            continue
+        try:
+            os.kill(pid, signal.SIGUSR2)
+        except ProcessLookupError:
+            path.unlink(missing_ok=True)
+            continue
+        signalled += 1
+    return signalled
+
+
+def request_profile(seconds: float) -> dict:
+    """Admin endpoint entry: profile this worker directly and signal the others."""
+    seconds = min(seconds, PROFILE_MAX_SECONDS)
+    started = start_profiling(seconds)
+    workers = profile_all_workers(seconds)
+    return {"seconds": seconds, "workers": workers, "started_here": started}
+
+
+def _requested_seconds() -> float:
+    try:
+        return float((_WORKERS_DIR / "request").read_text())
+    except (OSError, ValueError):
+        return PROFILE_DURATION
+
+
+def _handle_signal() -> None:
+    start_profiling(_requested_seconds())
+
+
+def install_profiler() -> None:
+    """Register this worker for SIGUSR2 and honour PROFILE_ON_START."""
+    try:
+        # Run by the event loop, not inside the signal handler: start_profiling takes
+        # _lock, which the interrupted code may be holding.
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR2, _handle_signal)
+    except (RuntimeError, ValueError, NotImplementedError):
+        # Not the main thread; only PROFILE_ON_START and the endpoint's own worker work.
+        pass
+    else:
+        _WORKERS_DIR.mkdir(parents=True, exist_ok=True)
+        (_WORKERS_DIR / str(os.getpid())).touch()
+    if PROFILE_ON_START > 0:
+        start_profiling(PROFILE_ON_START, PROFILE_START_DELAY)
+
+
+def uninstall_profiler() -> None:
+    """Unregister this worker at application shutdown."""
+    # Not atexit: uvicorn re-raises the SIGTERM it stopped on once the server is down, so
+    # a worker never runs its atexit hooks.
+    (_WORKERS_DIR / str(os.getpid())).unlink(missing_ok=True)
@@ -65,3 +65,8 @@ class OrderResponse(ModelBase):
     user: UserSchema
     address: AddressSchema
     products: list[OrderItemSchema]
+
+
+class UserOrdersPage(ModelBase):
+    orders: list[OrderSchema]
+    next_cursor: str | None
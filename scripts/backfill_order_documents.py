@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import asyncpg
+
+from db import ASYNCPG_DSN, SERVER_SETTINGS
+from orders_core import ORDER_DOCUMENT_SQL
+
+# Bulk-builds order_documents by id range over several connections. The triggers keep
+# documents current afterwards. By default existing documents are left alone:
+# whatever a trigger wrote is at least as new as this scan's snapshot. --rebuild
+# overwrites every document, e.g. after the document format changed.
+
+BACKFILL_CHUNK_SIZE = 10_000
+
+BACKFILL_SQL = (
+    "INSERT INTO order_documents (order_id, document) SELECT id, document FROM ("
+    + ORDER_DOCUMENT_SQL.format(condition="o.id BETWEEN $1 AND $2")
+    + ") built ON CONFLICT (order_id) DO {action}"
+)
+REBUILD_ACTION = (
+    "UPDATE SET document = EXCLUDED.document, updated_at = now() "
+    "WHERE order_documents.document IS DISTINCT FROM EXCLUDED.document"
+)
+
+
+async def backfill(
+    workers: int, chunk_size: int = BACKFILL_CHUNK_SIZE, rebuild: bool = False
+) -> int:
+    """Build missing (or, with rebuild, all) documents; returns the rows written."""
+    conn = await asyncpg.connect(ASYNCPG_DSN)
+    try:
+        low, high = await conn.fetchrow("SELECT min(id), max(id) FROM orders")
+    finally:
+        await conn.close()
+    if low is None:
+        return 0
+
+    sql = BACKFILL_SQL.format(action=REBUILD_ACTION if rebuild else "NOTHING")
+    ranges: asyncio.Queue[tuple[int, int]] = asyncio.Queue()
+    for start in range(low, high + 1, chunk_size):
+        ranges.put_nowait((start, min(start + chunk_size - 1, high)))
+
+    async def run_worker() -> int:
+        # Documents are stored in UTC, like the refresh_order_documents() trigger path.
+        conn = await asyncpg.connect(ASYNCPG_DSN, server_settings=SERVER_SETTINGS)
+        written = 0
+        try:
+            while not ranges.empty():
+                start, end = ranges.get_nowait()
+                status = await conn.execute(sql, start, end)
+                written += int(status.rsplit(" ", 1)[1])
+        finally:
+            await conn.close()
+        return written
+
+    counts = await asyncio.gather(*(run_worker() for _ in range(workers)))
+    return sum(counts)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the order_documents read model.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE)
+    parser.add_argument(
+        "--rebuild", action="store_true", help="overwrite existing documents too"
+    )
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    written = await backfill(args.workers, args.chunk_size, args.rebuild)
+    elapsed = time.perf_counter() - started
+    print(f"order_documents: {written:,} rows in {elapsed:.2f}s "
+          f"({written / elapsed if elapsed else 0:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
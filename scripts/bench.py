@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+# Benchmark driver: runs the Makefile matrix under k6, parses k6 text summaries into
+# JSON, aggregates repetitions with confidence intervals and compares against a
+# stored baseline.
+
+REPORTS_DIR = Path("reports")
+README = Path("README.md")
+TARGETS = (
+    "fastapi-granian",
+    "fastapi-uvicorn",
+    "litestar-granian",
+    "litestar-uvicorn",
+    "sanic-granian",
+    "sanic-uvicorn",
+    "gin-go",
+)
+# Report files keep their historical names.
+REPORT_NAMES = {"gin-go": "gin"}
+BASE_URL = os.getenv("BENCH_BASE_URL", "http://localhost:8000")
+READY_PATH = "/orders/10000/lite"
+RESULTS_START = "<!-- results:start -->"
+RESULTS_END = "<!-- results:end -->"
+
+# Two-sided 95% Student t critical values by degrees of freedom.
+T_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+    8: 2.306, 9: 2.262, 10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 30: 2.042,
+}
+
+_DURATION_PART = re.compile(r"([\d.]+)(ms|µs|us|ns|h|m|s)")
+_DURATION_UNITS_MS = {
+    "h": 3_600_000.0,
+    "m": 60_000.0,
+    "s": 1_000.0,
+    "ms": 1.0,
+    "µs": 0.001,
+    "us": 0.001,
+    "ns": 0.000001,
+}
+_METRIC_LINE = re.compile(r"^\s*([\w{}():\s]+?)\.{2,}:\s*(.*)$")
+
+
+def report_name(target: str) -> str:
+    return REPORT_NAMES.get(target, target)
+
+
+def parse_duration_ms(value: str) -> float:
+    """Convert a k6 duration such as "1.42ms", "776.34µs" or "1m2.5s" to ms."""
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        raise ValueError(f"Not a k6 duration: {value!r}")
+    return sum(float(number) * _DURATION_UNITS_MS[unit] for number, unit in parts)
+
+
+def _trend(values: str) -> dict[str, float]:
+    stats = {}
+    for field in values.split():
+        name, _, value = field.partition("=")
+        stats[name.replace("(", "").replace(")", "")] = parse_duration_ms(value)
+    return stats
+
+
+def parse_k6_summary(text: str) -> dict:
+    """Extract the end-of-test metrics from k6's text summary."""
+    metrics: dict = {}
+    for line in text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match is None:
+            continue
+        name, values = match.group(1).strip(), match.group(2)
+        if name == "http_req_duration":
+            metrics["http_req_duration_ms"] = _trend(values)
+        elif name == "iteration_duration":
+            metrics["iteration_duration_ms"] = _trend(values)
+        elif name == "http_reqs":
+            count, rate = values.split()[:2]
+            metrics["http_reqs"] = int(count)
+            metrics["rps"] = float(rate.removesuffix("/s"))
+        elif name == "http_req_failed":
+            metrics["failed_rate"] = float(values.split()[0].removesuffix("%")) / 100
+        elif name == "iterations":
+            metrics["iterations"] = int(values.split()[0])
+    if "http_req_duration_ms" not in metrics or "rps" not in metrics:
+        raise ValueError("k6 summary not found")
+    return metrics
+
+
+def parse_report(path: Path) -> dict:
+    app, _, run = path.stem.rpartition("-")
+    result = {"app": app, "run": int(run), "file": str(path)}
+    result.update(parse_k6_summary(path.read_text(encoding="utf-8", errors="replace")))
+    return result
+
+
+def parse_reports(reports_dir: Path, paths: list[Path] | None = None) -> list[dict]:
+    """Parse the given k6 reports, or every report in reports_dir."""
+    results = []
+    if paths is None:
+        paths = sorted(reports_dir.glob("*-[0-9]*.txt"))
+    for path in paths:
+        try:
+            result = parse_report(path)
+        except ValueError as exc:
+            print(f"skipping {path}: {exc}", file=sys.stderr)
+            continue
+        path.with_suffix(".json").write_text(json.dumps(result, indent=2) + "\n")
+        results.append(result)
+    return results
+
+
+def _interval(values: list[float]) -> dict[str, float]:
+    mean = statistics.fmean(values)
+    stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+    df = len(values) - 1
+    if df == 0:
+        half_width = math.nan
+    else:
+        # Between table rows, the smaller df has the larger t, so the interval is
+        # never narrower than the exact one.
+        t = T_95[max(d for d in T_95 if d <= df)]
+        half_width = t * stdev / math.sqrt(len(values))
+    return {"mean": mean, "stdev": stdev, "ci95": half_width}
+
+
+def summarize(results: list[dict]) -> dict[str, dict]:
+    by_app: dict[str, list[dict]] = {}
+    for result in results:
+        by_app.setdefault(result["app"], []).append(result)
+    return {
+        app: {
+            "runs": len(runs),
+            "avg_ms": _interval([r["http_req_duration_ms"]["avg"] for r in runs]),
+            "p95_ms": _interval([r["http_req_duration_ms"]["p95"] for r in runs]),
+            "rps": _interval([r["rps"] for r in runs]),
+            "failed_rate": max(r.get("failed_rate", 0.0) for r in runs),
+        }
+        for app, runs in sorted(by_app.items())
+    }
+
+
+def _cell(stats: dict[str, float], digits: int) -> str:
+    text = f"{stats['mean']:.{digits}f}"
+    if not math.isnan(stats["ci95"]):
+        text += f" ± {stats['ci95']:.{digits}f}"
+    return text
+
+
+def results_table(summary: dict[str, dict]) -> str:
+    header = (
+        "| App | Runs | Avg latency (ms) | P95 latency (ms) | Avg RPS | RPS stdev |\n"
+        "| --- | ---: | ---: | ---: | ---: | ---: |\n"
+    )
+
+    def rows(apps: list[str]) -> str:
+        return "".join(
+            f"| {app} | {summary[app]['runs']} "
+            f"| {_cell(summary[app]['avg_ms'], 3)} "
+            f"| {_cell(summary[app]['p95_ms'], 3)} "
+            f"| {_cell(summary[app]['rps'], 0)} "
+            f"| {summary[app]['rps']['stdev']:.0f} |\n"
+            for app in apps
+        )
+
+    python_apps = [app for app in summary if app not in REPORT_NAMES.values()]
+    other_apps = [app for app in summary if app in REPORT_NAMES.values()]
+    table = header + rows(python_apps)
+    if other_apps:
+        table += "\n### Go (Gin)\n\n" + header + rows(other_apps)
+    return table
+
+
+def update_readme(table: str) -> None:
+    text = README.read_text()
+    start = text.index(RESULTS_START) + len(RESULTS_START)
+    end = text.index(RESULTS_END)
+    README.write_text(text[:start] + "\n" + table + text[end:])
+
+
+def compare(
+    current: dict[str, dict], baseline: dict[str, dict], threshold: float
+) -> list[str]:
+    """Return one line per metric that got worse by more than threshold percent."""
+    regressions = []
+    # Higher is worse for latency, lower is worse for throughput.
+    checks = (("avg_ms", 1), ("p95_ms", 1), ("rps", -1))
+    print("| App | Metric | Baseline | Current | Change |")
+    print("| --- | --- | ---: | ---: | ---: |")
+    for app, stats in current.items():
+        if app not in baseline:
+            continue
+        for metric, direction in checks:
+            before = baseline[app][metric]["mean"]
+            after = stats[metric]["mean"]
+            change = (after - before) / before * 100 if before else 0.0
+            flag = " **REGRESSION**" if change * direction > threshold else ""
+            print(f"| {app} | {metric} | {before:.3f} | {after:.3f} | {change:+.1f}%{flag} |")
+            if flag:
+                regressions.append(f"{app} {metric} {change:+.1f}%")
+    return regressions
+
+
+def wait_ready(timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(BASE_URL + READY_PATH, timeout=2) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{BASE_URL} not ready after {timeout:.0f}s")
+
+
+def stop(server: subprocess.Popen) -> None:
+    # make spawns the server in the same session, so signal the whole group.
+    if server.poll() is not None:
+        return
+    os.killpg(server.pid, signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(server.pid, signal.SIGKILL)
+        server.wait()
+
+
+def run_target(target: str, args: argparse.Namespace) -> list[Path]:
+    """Run the target's k6 repetitions; returns the report paths written."""
+    name = report_name(target)
+    # Reports of an earlier invocation with more --runs would otherwise be summarized
+    # with this one.
+    for stale in args.reports.glob(f"{name}-[0-9]*.*"):
+        if stale.suffix in (".txt", ".json") and stale.stem.rpartition("-")[2].isdigit():
+            stale.unlink()
+    paths = []
+    log = (args.reports / f"{name}-server.log").open("w")
+    server = subprocess.Popen(
+        ["make", target], stdout=log, stderr=subprocess.STDOUT, start_new_session=True
+    )
+    try:
+        wait_ready(args.ready_timeout)
+        if args.warmup:
+            subprocess.run(
+                ["k6", "run", "--quiet", "--duration", args.warmup, args.script],
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+        for run in range(1, args.runs + 1):
+            path = args.reports / f"{name}-{run}.txt"
+            print(f"{target}: run {run}/{args.runs} -> {path}")
+            with path.open("w") as report:
+                subprocess.run(
+                    ["k6", "run", args.script],
+                    check=True,
+                    stdout=report,
+                    stderr=subprocess.STDOUT,
+                )
+            paths.append(path)
+            time.sleep(args.cooldown)
+    finally:
+        stop(server)
+        log.close()
+    return paths
+
+
+def load_summary(path: Path) -> dict[str, dict]:
+    return json.loads(path.read_text())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run and summarize k6 benchmarks.")
+    parser.add_argument("--reports", type=Path, default=REPORTS_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the target matrix, then summarize")
+    run.add_argument("--targets", nargs="+", default=list(TARGETS), choices=TARGETS)
+    run.add_argument("--runs", type=int, default=3)
+    run.add_argument("--warmup", default="10s", help="k6 warmup duration; empty to skip")
+    run.add_argument("--cooldown", type=float, default=5.0)
+    run.add_argument("--ready-timeout", type=float, default=60.0)
+    run.add_argument("--script", default="script.js")
+    run.add_argument("--update-readme", action="store_true")
+
+    summary = commands.add_parser("summary", help="parse reports and print the table")
+    summary.add_argument("--update-readme", action="store_true")
+
+    compare_cmd = commands.add_parser("compare", help="flag regressions vs a baseline")
+    compare_cmd.add_argument("baseline", type=Path)
+    compare_cmd.add_argument("--current", type=Path)
+    compare_cmd.add_argument("--threshold", type=float, default=5.0, help="percent")
+
+    args = parser.parse_args()
+    args.reports.mkdir(exist_ok=True)
+    summary_path = args.reports / "summary.json"
+
+    if args.command == "compare":
+        current = (
+            load_summary(args.current)
+            if args.current
+            else summarize(parse_reports(args.reports))
+        )
+        regressions = compare(current, load_summary(args.baseline), args.threshold)
+        if regressions:
+            print("\nRegressions: " + ", ".join(regressions))
+            sys.exit(1)
+        return
+
+    paths = None
+    if args.command == "run":
+        # Only this invocation's runs, not reports left by earlier ones.
+        paths = [path for target in args.targets for path in run_target(target, args)]
+
+    results = summarize(parse_reports(args.reports, paths))
+    summary_path.write_text(json.dumps(results, indent=2) + "\n")
+    table = results_table(results)
+    print(table)
+    if args.update_readme:
+        update_readme(table)
+
+
+if __name__ == "__main__":
+    main()
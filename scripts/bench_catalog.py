@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import time
+import tracemalloc
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from catalog import CATALOG_DIR, ProductCatalog, write_catalog
+from scripts.dataset import price_for_index
+
+# Size and lookup cost of the shared product catalog for synthetic product tables
+# shaped like scripts/dataset.py, next to a per-worker dict of (name, sku, price)
+# tuples, which is what an in-process cache would hold in every worker.
+
+
+def product(index: int) -> tuple[int, str, str, int]:
+    return index + 1, f"Product {index}", f"SKU{index:06d}", int(price_for_index(index) * 100)
+
+
+async def products(count: int) -> AsyncIterator[tuple[int, str, str, int]]:
+    for index in range(count):
+        yield product(index)
+
+
+def heap_size(count: int) -> int:
+    return sum(len(name) + len(sku) for _, name, sku, _ in map(product, range(count)))
+
+
+def lookup_ns(lookup, ids: list[int]) -> float:
+    started = time.perf_counter_ns()
+    for product_id in ids:
+        lookup(product_id)
+    return (time.perf_counter_ns() - started) / len(ids)
+
+
+def dict_bytes(count: int) -> tuple[int, dict]:
+    tracemalloc.start()
+    table = {}
+    for index in range(count):
+        product_id, name, sku, cents = product(index)
+        table[product_id] = (name, sku, price_for_index(index))
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, table
+
+
+async def bench_size(count: int, lookups: int, dict_max: int) -> dict:
+    path = Path(CATALOG_DIR) / f"perf_test_products-bench-{os.getpid()}.bin"
+    try:
+        started = time.perf_counter()
+        await write_catalog(path, 1, count, heap_size(count), products(count))
+        build = time.perf_counter() - started
+        catalog = ProductCatalog(path)
+        rng = random.Random(1)
+        ids = [rng.randint(1, count) for _ in range(lookups)]
+        result = {
+            "products": count,
+            "build_s": build,
+            "catalog_mb": catalog.size / 1_000_000,
+            "bytes_per_product": catalog.size / count,
+            "catalog_ns": lookup_ns(catalog.product, ids),
+            "dict_mb": None,
+            "dict_ns": None,
+        }
+        if count <= dict_max:
+            size, table = dict_bytes(count)
+            result["dict_mb"] = size / 1_000_000
+            result["dict_ns"] = lookup_ns(table.get, ids)
+        return result
+    finally:
+        path.unlink(missing_ok=True)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the shared product catalog.")
+    parser.add_argument("--products", nargs="+", type=int, default=[100_000, 10_000_000])
+    parser.add_argument("--lookups", type=int, default=1_000_000)
+    parser.add_argument(
+        "--dict-max", type=int, default=1_000_000,
+        help="largest table also measured as an in-process dict",
+    )
+    args = parser.parse_args()
+
+    print(
+        "| Products | Build (s) | Catalog (MB, shared) | Bytes/product | Lookup (ns) "
+        "| Dict per worker (MB) | Dict lookup (ns) |"
+    )
+    print("| ---: | ---: | ---: | ---: | ---: | ---: | ---: |")
+    for count in args.products:
+        result = await bench_size(count, args.lookups, args.dict_max)
+        dict_mb = "-" if result["dict_mb"] is None else f"{result['dict_mb']:.1f}"
+        dict_ns = "-" if result["dict_ns"] is None else f"{result['dict_ns']:.0f}"
+        print(
+            f"| {result['products']:,} | {result['build_s']:.1f} | {result['catalog_mb']:.1f} "
+            f"| {result['bytes_per_product']:.1f} | {result['catalog_ns']:.0f} "
+            f"| {dict_mb} | {dict_ns} |"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
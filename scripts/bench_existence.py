@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+import asyncpg
+
+import orders_asyncpg
+from db import ASYNCPG_DSN
+from existence import EXISTENCE_FILTER_BATCH_ROWS, BloomFilter, new_filter
+
+# Memory, build time, lookup cost and measured false-positive rate of the existence
+# filters, against a plain set of ids. Ids are 1..--orders with --missing-rate of them
+# left out (deleted or never committed), or the ids of the orders table (--from-db).
+# False positives are measured on ids that are not in the table: the gaps plus
+# --probes ids above the largest one (which the app already rejects by its high-water
+# mark, but a Bloom filter on its own would not).
+
+
+def synthetic_ids(count: int, missing_rate: float, seed: int) -> tuple[list[int], list[int]]:
+    rng = random.Random(seed)
+    present, gaps = [], []
+    for order_id in range(1, count + 1):
+        (gaps if rng.random() < missing_rate else present).append(order_id)
+    return present, gaps
+
+
+async def database_ids() -> tuple[list[int], list[int]]:
+    conn = await asyncpg.connect(ASYNCPG_DSN)
+    try:
+        present: list[int] = []
+        async for batch in orders_asyncpg.stream_order_ids(
+            conn, 0, EXISTENCE_FILTER_BATCH_ROWS
+        ):
+            present.extend(batch)
+    finally:
+        await conn.close()
+    known = set(present)
+    gaps = [order_id for order_id in range(1, present[-1] + 1) if order_id not in known]
+    return present, gaps
+
+
+def build(kind: str, present: list[int], fp_rate: float):
+    if kind == "set":
+        return set(present)
+    if fp_rate:
+        target = BloomFilter(len(present), fp_rate)
+    else:
+        target = new_filter(kind, present[-1])
+    for order_id in present:
+        target.add(order_id)
+    return target
+
+
+def lookup_ns(target, ids: list[int]) -> float:
+    started = time.perf_counter_ns()
+    for order_id in ids:
+        order_id in target
+    return (time.perf_counter_ns() - started) / len(ids)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the order existence filters.")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--missing-rate", type=float, default=0.02)
+    parser.add_argument("--probes", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--from-db", action="store_true")
+    parser.add_argument(
+        "--bloom-fp-rates", type=float, nargs="+", default=[0.01, 0.001],
+        help="Bloom filters to size exactly for the id count",
+    )
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.from_db:
+        present, gaps = asyncio.run(database_ids())
+    else:
+        present, gaps = synthetic_ids(args.orders, args.missing_rate, args.seed)
+    print(
+        f"{len(present):,} ids, {len(gaps):,} gaps, loaded in "
+        f"{time.perf_counter() - started:.2f}s"
+    )
+    rng = random.Random(args.seed)
+    top = present[-1]
+    absent = gaps + [rng.randint(top + 1, 2 * top) for _ in range(args.probes)]
+    hits = rng.sample(present, min(args.probes, len(present)))
+
+    print(
+        "| Filter | Memory (MB) | Bytes/id | Build (s) | Present (ns) | Absent (ns) "
+        "| False positives |"
+    )
+    print("| --- | ---: | ---: | ---: | ---: | ---: | ---: |")
+    variants = [("set", 0.0), ("bitmap", 0.0), ("bloom", 0.0)]
+    variants += [("bloom", rate) for rate in args.bloom_fp_rates]
+    for kind, fp_rate in variants:
+        started = time.perf_counter()
+        target = build(kind, present, fp_rate)
+        elapsed = time.perf_counter() - started
+        del target
+        tracemalloc.start()
+        target = build(kind, present, fp_rate)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert all(order_id in target for order_id in hits), kind
+        false_positives = sum(1 for order_id in absent if order_id in target)
+        if kind == "bloom":
+            label = f"bloom {fp_rate:g}" if fp_rate else "bloom (app sizing)"
+        else:
+            label = kind
+        print(
+            f"| {label} | {memory / 1e6:.2f} | {memory / len(present):.2f} "
+            f"| {elapsed:.2f} | {lookup_ns(target, hits):.0f} "
+            f"| {lookup_ns(target, absent):.0f} "
+            f"| {100 * false_positives / len(absent):.3f}% |"
+        )
+
+
+if __name__ == "__main__":
+    main()
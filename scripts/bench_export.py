@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# Throughput and memory of the NDJSON order export, either in-process (the generator
+# the apps stream from) or over HTTP against a running server. Peak RSS is sampled
+# from /proc for this process or for the server process tree; a flat peak across
+# range sizes shows that the export does not buffer the range.
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def process_tree(pid: int) -> list[int]:
+    pids = [pid]
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            children = (task / "children").read_text().split()
+        except OSError:
+            continue
+        for child in children:
+            pids.extend(process_tree(int(child)))
+    return pids
+
+
+def rss_bytes(pids: list[int]) -> int:
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm") as statm:
+                total += int(statm.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+class RssSampler:
+    def __init__(self, root_pid: int, interval: float) -> None:
+        self.root_pid = root_pid
+        self.interval = interval
+        self.baseline = rss_bytes(process_tree(root_pid))
+        self.peak = self.baseline
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def sample(self) -> None:
+        self.peak = max(self.peak, rss_bytes(process_tree(self.root_pid)))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self.sample()
+        if self._task is not None:
+            self._task.cancel()
+
+
+async def consume_direct(from_id: int, to_id: int, delay: float) -> tuple[int, int]:
+    from orders_service import stream_order_export
+
+    size = lines = 0
+    async for chunk in stream_order_export(from_id, to_id):
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+        if delay:
+            await asyncio.sleep(delay)
+    return size, lines
+
+
+async def consume_http(
+    url: str, from_id: int, to_id: int, delay: float
+) -> tuple[int, int]:
+    parts = urlsplit(url)
+    host, port = parts.hostname or "localhost", parts.port or 80
+    reader, writer = await asyncio.open_connection(host, port)
+    path = f"{parts.path.rstrip('/')}/orders/export?from_id={from_id}&to_id={to_id}"
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode()
+    )
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    if status != 200:
+        raise SystemExit(f"export returned {status}: {(await reader.read()).decode()}")
+    chunked = b"transfer-encoding: chunked" in head.lower()
+    size = lines = 0
+    try:
+        while True:
+            if chunked:
+                length = int((await reader.readline()).split(b";")[0], 16)
+                if length == 0:
+                    break
+                data = await reader.readexactly(length + 2)
+                data = data[:-2]
+            else:
+                data = await reader.read(65536)
+                if not data:
+                    break
+            size += len(data)
+            lines += data.count(b"\n")
+            if delay:
+                await asyncio.sleep(delay)
+    finally:
+        writer.close()
+    return size, lines
+
+
+async def consume(args: argparse.Namespace, to_id: int, delay: float) -> tuple[int, int]:
+    if args.url:
+        return await consume_http(args.url, args.from_id, to_id, delay)
+    return await consume_direct(args.from_id, to_id, delay)
+
+
+async def bench_range(args: argparse.Namespace, count: int) -> dict:
+    sampler = RssSampler(args.server_pid or os.getpid(), args.sample_ms / 1000)
+    sampler.start()
+    started = time.perf_counter()
+    size, lines = await consume(args, args.from_id + count - 1, args.read_delay_ms / 1000)
+    elapsed = time.perf_counter() - started
+    await sampler.stop()
+    return {
+        "range": count,
+        "orders": lines,
+        "mb": size / 1_000_000,
+        "seconds": elapsed,
+        "mb_per_s": size / 1_000_000 / elapsed,
+        "peak_rss_mb": sampler.peak / 1_000_000,
+        "rss_growth_mb": (sampler.peak - sampler.baseline) / 1_000_000,
+    }
+
+
+async def close_connections() -> None:
+    import orders_asyncpg
+    from db import engine
+
+    await engine.dispose()
+    await orders_asyncpg.close_pool()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the NDJSON order export.")
+    parser.add_argument("--from-id", type=int, default=1)
+    parser.add_argument(
+        "--ranges", nargs="+", type=int, default=[1_000, 10_000, 100_000],
+        help="number of order ids per export",
+    )
+    parser.add_argument("--url", help="export from a running server, e.g. http://localhost:8000")
+    parser.add_argument(
+        "--server-pid", type=int,
+        help="with --url: supervisor pid whose process tree RSS is sampled",
+    )
+    parser.add_argument(
+        "--read-delay-ms", type=float, default=0,
+        help="pause after every chunk to emulate a slow client",
+    )
+    parser.add_argument("--sample-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    # One-order export first, so imports and connection pools are not measured.
+    await consume(args, args.from_id, 0)
+    print("| Range | Orders | MB | Seconds | MB/s | Peak RSS (MB) | RSS growth (MB) |")
+    print("| ---: | ---: | ---: | ---: | ---: | ---: | ---: |")
+    for count in args.ranges:
+        result = await bench_range(args, count)
+        print(
+            f"| {result['range']:,} | {result['orders']:,} | {result['mb']:.1f} "
+            f"| {result['seconds']:.2f} | {result['mb_per_s']:.1f} "
+            f"| {result['peak_rss_mb']:.1f} | {result['rss_growth_mb']:.1f} |"
+        )
+    if not args.url:
+        await close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import orders_asyncpg
+from catalog import refresh_catalog
+from db import engine
+from orders_service import FETCH_STRATEGIES
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def bench_strategy(name: str, order_ids: range, warmup: int) -> dict:
+    open_session, fetch = FETCH_STRATEGIES[name]
+    timings: list[float] = []
+    payloads: dict[int, bytes | None] = {}
+
+    async with open_session() as session:
+        for order_id in order_ids[:warmup]:
+            await fetch(session, order_id)
+        for order_id in order_ids:
+            started = time.perf_counter()
+            payload = await fetch(session, order_id)
+            timings.append((time.perf_counter() - started) * 1000)
+            payloads[order_id] = payload
+
+    return {
+        "strategy": name,
+        "requests": len(timings),
+        "avg_ms": statistics.fmean(timings),
+        "p50_ms": percentile(timings, 50),
+        "p95_ms": percentile(timings, 95),
+        "payload_kb": sum(len(p) for p in payloads.values() if p) / len(timings) / 1024,
+        "payloads": payloads,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare full-order fetch strategies against the seeded database."
+    )
+    parser.add_argument("--start-id", type=int, default=10_000)
+    parser.add_argument("--count", type=int, default=2_000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument(
+        "--strategies", nargs="+", default=list(FETCH_STRATEGIES), choices=list(FETCH_STRATEGIES)
+    )
+    parser.add_argument(
+        "--catalog",
+        action="store_true",
+        help="fill product fields from the shared product catalog (core/asyncpg rows)",
+    )
+    args = parser.parse_args()
+
+    if args.catalog:
+        await refresh_catalog()
+    order_ids = range(args.start_id, args.start_id + args.count)
+    print("| Strategy | Requests | Avg (ms) | P50 (ms) | P95 (ms) | Payload (KB) |")
+    print("| --- | ---: | ---: | ---: | ---: | ---: |")
+    reference = None
+    for name in args.strategies:
+        result = await bench_strategy(name, order_ids, args.warmup)
+        # Whichever strategy fills the cache, clients must get the same bytes.
+        if reference is None:
+            reference = result["payloads"]
+        else:
+            for order_id, payload in result["payloads"].items():
+                if payload != reference[order_id]:
+                    raise SystemExit(
+                        f"{name} payload for order {order_id} differs from "
+                        f"{args.strategies[0]}"
+                    )
+        print(
+            f"| {result['strategy']} | {result['requests']} | {result['avg_ms']:.3f} "
+            f"| {result['p50_ms']:.3f} | {result['p95_ms']:.3f} | {result['payload_kb']:.2f} |"
+        )
+
+    await engine.dispose()
+    await orders_asyncpg.close_pool()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
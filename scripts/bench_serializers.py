@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from serialization import SERIALIZERS
+
+ITEMS_PER_ORDER = 20
+
+
+def sample_rows(items: int) -> tuple[tuple, list[tuple], tuple]:
+    created_at = datetime(2026, 1, 27, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    header = (
+        10_000, 1, 1, items, "pending", Decimal("1234.50"), created_at,
+        1, "user0@example.com", "User 0", created_at,
+        1, 1, "100 Main St", None, "Testville", "CA", "90000", created_at,
+    )
+    item_rows = [
+        (
+            200_000 + i,
+            i + 1,
+            f"Product {i}",
+            f"SKU{i:06d}",
+            Decimal("12.34"),
+            1,
+            Decimal("12.34"),
+        )
+        for i in range(items)
+    ]
+    return header, item_rows, header[:7]
+
+
+def per_call_us(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmark encode/decode cost per order response for each serializer."
+    )
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--items", type=int, default=ITEMS_PER_ORDER)
+    args = parser.parse_args()
+
+    header, item_rows, lite_row = sample_rows(args.items)
+    reference = None
+
+    print(
+        "| Serializer | Full encode (µs) | Full decode (µs) | Lite encode (µs) "
+        "| Lite decode (µs) | Full size (B) |"
+    )
+    print("| --- | ---: | ---: | ---: | ---: | ---: |")
+    for name, factory in SERIALIZERS.items():
+        try:
+            serializer = factory()
+        except RuntimeError as exc:
+            print(f"| {name} | skipped: {exc} | | | | |")
+            continue
+
+        full = serializer.encode_order(header, item_rows, 0)
+        lite = serializer.encode_order_lite(lite_row)
+        document = json.loads(full)
+        if reference is None:
+            reference = document
+        elif document != reference:
+            raise SystemExit(f"{name} output differs from {next(iter(SERIALIZERS))}")
+
+        print(
+            f"| {name} "
+            f"| {per_call_us(lambda: serializer.encode_order(header, item_rows, 0), args.iterations):.2f} "
+            f"| {per_call_us(lambda: serializer.decode_order(full), args.iterations):.2f} "
+            f"| {per_call_us(lambda: serializer.encode_order_lite(lite_row), args.iterations):.2f} "
+            f"| {per_call_us(lambda: serializer.decode_order_lite(lite), args.iterations):.2f} "
+            f"| {len(full)} |"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from multiprocessing import Process, Queue
+from pathlib import Path
+
+from cache import (
+    REDIS_URL,
+    SHARED_CACHE_DIR,
+    SHARED_CACHE_SLOT_BYTES,
+    SHARED_CACHE_STRIPES,
+    SHARED_CACHE_WAYS,
+    LocalCache,
+)
+from redis.asyncio import Redis
+from shared_cache import SharedCache
+
+# Hit latency and throughput of the three cache tiers for the same hot keys: Redis, the
+# per-worker LRU (cache.LocalCache) and the cross-worker segment (shared_cache). Every
+# process stands in for one app worker. Per-worker caches are warmed in each process;
+# the shared segment is warmed once.
+
+KEY_PREFIX = "bench:shared_cache"
+
+
+def key_for(index: int) -> str:
+    return f"{KEY_PREFIX}:{index}"
+
+
+def payload_for(index: int, size: int) -> bytes:
+    return (b"%d:" % index).ljust(size, b"x")
+
+
+def open_segment(path: Path, max_bytes: int) -> SharedCache:
+    return SharedCache(
+        path,
+        max_bytes,
+        SHARED_CACHE_SLOT_BYTES,
+        SHARED_CACHE_WAYS,
+        SHARED_CACHE_STRIPES,
+        0,
+    )
+
+
+async def run_tier(tier: str, args: argparse.Namespace, seconds: float) -> dict:
+    rng = random.Random(os.getpid())
+    keys = [key_for(index) for index in range(args.keys)]
+    redis = Redis.from_url(REDIS_URL, decode_responses=False)
+    warm_fills = 0
+    if tier == "local":
+        local = LocalCache(args.keys * (args.payload_bytes + 64), 0)
+        # Each worker warms its own copy from Redis.
+        for key in keys:
+            local.set(key, await redis.get(key))
+            warm_fills += 1
+        get = local.get
+    elif tier == "shared":
+        get = open_segment(args.segment, args.shared_bytes).get
+
+    latencies: list[int] = []
+    count = misses = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        key = keys[rng.randrange(args.keys)]
+        started = time.perf_counter_ns()
+        if tier == "redis":
+            value = await redis.get(key)
+        else:
+            value = get(key)
+        latencies.append(time.perf_counter_ns() - started)
+        if value is None:
+            misses += 1
+        count += 1
+    await redis.aclose()
+    return {
+        "ops": count,
+        "misses": misses,
+        "latencies": latencies,
+        "warm_fills": warm_fills,
+    }
+
+
+def child(tier: str, args: argparse.Namespace, seconds: float, results: Queue) -> None:
+    results.put(asyncio.run(run_tier(tier, args, seconds)))
+
+
+def percentile(values: list[int], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+async def prepare(args: argparse.Namespace) -> None:
+    redis = Redis.from_url(REDIS_URL, decode_responses=False)
+    async with redis.pipeline(transaction=False) as pipe:
+        for index in range(args.keys):
+            pipe.set(key_for(index), payload_for(index, args.payload_bytes))
+        await pipe.execute()
+    await redis.aclose()
+    segment = open_segment(args.segment, args.shared_bytes)
+    for index in range(args.keys):
+        segment.set(key_for(index), payload_for(index, args.payload_bytes))
+
+
+async def cleanup(args: argparse.Namespace) -> None:
+    redis = Redis.from_url(REDIS_URL, decode_responses=False)
+    await redis.delete(*(key_for(index) for index in range(args.keys)))
+    await redis.aclose()
+    args.segment.unlink(missing_ok=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the cache tiers.")
+    parser.add_argument("--keys", type=int, default=5_000)
+    parser.add_argument("--payload-bytes", type=int, default=2_900)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument(
+        "--shared-bytes", type=int, default=64 * 1024 * 1024,
+        help="segment budget; keys that overflow their set are evicted and miss",
+    )
+    parser.add_argument("--tiers", nargs="+", default=["redis", "local", "shared"])
+    args = parser.parse_args()
+    args.segment = SHARED_CACHE_DIR / f"perf_test_cache-bench-{os.getpid()}.bin"
+
+    asyncio.run(prepare(args))
+    print(
+        "| Tier | Processes | Gets/s (total) | Hit % | P50 (µs) | P99 (µs) "
+        "| Warm-up fills | Memory (MB) |"
+    )
+    print("| --- | ---: | ---: | ---: | ---: | ---: | ---: | ---: |")
+    try:
+        for tier in args.tiers:
+            results: Queue = Queue()
+            children = [
+                Process(target=child, args=(tier, args, args.seconds, results))
+                for _ in range(args.processes)
+            ]
+            for process in children:
+                process.start()
+            collected = [results.get() for _ in children]
+            for process in children:
+                process.join()
+            latencies = [value for result in collected for value in result["latencies"]]
+            if tier == "local":
+                memory = args.processes * args.keys * args.payload_bytes
+            elif tier == "shared":
+                memory = args.keys * SHARED_CACHE_SLOT_BYTES
+            else:
+                memory = args.keys * args.payload_bytes
+            ops = sum(result["ops"] for result in collected)
+            misses = sum(result["misses"] for result in collected)
+            fills = sum(result["warm_fills"] for result in collected)
+            if tier == "shared":
+                fills = args.keys
+            print(
+                f"| {tier} | {args.processes} "
+                f"| {ops / args.seconds:,.0f} | {100 * (ops - misses) / ops:.2f} "
+                f"| {percentile(latencies, 50) / 1000:.2f} "
+                f"| {percentile(latencies, 99) / 1000:.2f} "
+                f"| {fills:,} | {memory / 1_000_000:.1f} |"
+            )
+    finally:
+        asyncio.run(cleanup(args))
+
+
+if __name__ == "__main__":
+    main()
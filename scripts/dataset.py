@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import math
+import random
+from bisect import bisect_left
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from itertools import accumulate
+
+# Deterministic, streaming benchmark dataset. Every row is derived from its index and
+# the seed, so any id range can be generated on its own with constant memory and two
+# runs with the same profile and seed produce the same database.
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+ORDER_SPAN = timedelta(days=730)
+SIGNUP_SPAN = timedelta(days=365)
+BLOCK_SIZE = 1_024
+GOLDEN_RATIO_FRACTION = 0.6180339887
+
+STATUSES = ("delivered", "shipped", "processing", "pending", "cancelled", "refunded")
+STATUS_WEIGHTS = (0.62, 0.14, 0.08, 0.10, 0.05, 0.01)
+ITEM_QUANTITIES = (1, 2, 3, 5)
+ITEM_QUANTITY_WEIGHTS = (0.80, 0.13, 0.05, 0.02)
+
+
+@dataclass(frozen=True)
+class Profile:
+    name: str
+    users: int
+    products: int
+    orders: int
+    min_items: int = 1
+    max_items: int = 50
+    # Power-law exponents; 0 means uniform.
+    item_skew: float = 1.3
+    user_skew: float = 1.1
+    product_skew: float = 0.9
+    # Layout of the original fixed seed instead of the skewed one: each user owns one
+    # block of consecutive orders, and each order holds the next max_items products
+    # with quantity 1 and status "pending".
+    sequential: bool = False
+
+
+PROFILES = {
+    "baseline": Profile(
+        "baseline", 100, 100_000, 1_000_000, 20, 20, 0.0, 0.0, 0.0, sequential=True
+    ),
+    "small": Profile("small", 1_000, 10_000, 100_000),
+    "1m": Profile("1m", 50_000, 100_000, 1_000_000),
+    "10m": Profile("10m", 500_000, 500_000, 10_000_000),
+    "100m": Profile("100m", 5_000_000, 1_000_000, 100_000_000),
+}
+
+
+def price_for_index(index: int) -> Decimal:
+    cents = 100 + (index % 10_000)
+    return Decimal(cents) / Decimal(100)
+
+
+def power_law_rank(rng: random.Random, n: int, skew: float) -> int:
+    """Draw a rank in [0, n) from a continuous power law (inverse CDF, no tables)."""
+    u = rng.random()
+    if skew == 0:
+        return int(u * n)
+    if skew == 1:
+        rank = n**u
+    else:
+        exponent = 1 - skew
+        rank = ((n**exponent - 1) * u + 1) ** (1 / exponent)
+    return min(int(rank) - 1, n - 1)
+
+
+def scramble_multiplier(n: int) -> int:
+    """Multiplier coprime with n, so rank * multiplier % n is a bijection on [0, n)."""
+    multiplier = max(int(n * GOLDEN_RATIO_FRACTION), 1)
+    while math.gcd(multiplier, n) != 1:
+        multiplier += 1
+    return multiplier
+
+
+def scrambled_id(rank: int, n: int, multiplier: int) -> int:
+    # Spread popular ranks across the id space instead of clustering them at id 1.
+    return rank * multiplier % n + 1
+
+
+def _cum_weights(weights: tuple[float, ...]) -> list[float]:
+    return list(accumulate(weights))
+
+
+class OrderGenerator:
+    """Generates orders with their items for any contiguous range of order indexes."""
+
+    def __init__(self, profile: Profile, seed: int) -> None:
+        self.profile = profile
+        self.seed = seed
+        sizes = range(profile.min_items, profile.max_items + 1)
+        self._item_counts = list(sizes)
+        self._item_count_weights = _cum_weights(
+            tuple(1 / (rank + 1) ** profile.item_skew for rank in range(len(sizes)))
+        )
+        self._status_weights = _cum_weights(STATUS_WEIGHTS)
+        self._quantity_weights = _cum_weights(ITEM_QUANTITY_WEIGHTS)
+        self._seconds_per_order = ORDER_SPAN.total_seconds() / profile.orders
+        self._user_multiplier = scramble_multiplier(profile.users)
+        self._product_multiplier = scramble_multiplier(profile.products)
+
+    def _block_rng(self, block: int) -> random.Random:
+        # String seeds are hashed with SHA-512, independent of PYTHONHASHSEED.
+        return random.Random(f"{self.seed}:orders:{block}")
+
+    def _pick(self, rng: random.Random, values: list | tuple, cum_weights: list[float]):
+        return values[bisect_left(cum_weights, rng.random() * cum_weights[-1])]
+
+    def _order(self, rng: random.Random, order_index: int) -> tuple[tuple, list[tuple]]:
+        profile = self.profile
+        if profile.sequential:
+            return self._sequential_order(order_index)
+        user_rank = power_law_rank(rng, profile.users, profile.user_skew)
+        user_id = scrambled_id(user_rank, profile.users, self._user_multiplier)
+        count = self._pick(rng, self._item_counts, self._item_count_weights)
+        count = min(count, profile.products)
+
+        product_ids: list[int] = []
+        while len(product_ids) < count:
+            rank = power_law_rank(rng, profile.products, profile.product_skew)
+            product_id = scrambled_id(rank, profile.products, self._product_multiplier)
+            if product_id not in product_ids:
+                product_ids.append(product_id)
+
+        order_id = order_index + 1
+        quantity = 0
+        total = Decimal("0")
+        items = []
+        for product_id in product_ids:
+            item_quantity = self._pick(rng, ITEM_QUANTITIES, self._quantity_weights)
+            unit_price = price_for_index(product_id - 1)
+            quantity += item_quantity
+            total += unit_price * item_quantity
+            items.append((order_id, product_id, item_quantity, unit_price))
+
+        status = self._pick(rng, STATUSES, self._status_weights)
+        created_at = EPOCH + timedelta(seconds=order_index * self._seconds_per_order)
+        order = (order_id, user_id, user_id, quantity, status, total, created_at)
+        return order, items
+
+    def _sequential_order(self, order_index: int) -> tuple[tuple, list[tuple]]:
+        profile = self.profile
+        orders_per_user = max(profile.orders // profile.users, 1)
+        user_id = min(order_index // orders_per_user, profile.users - 1) + 1
+        count = profile.max_items
+        base = order_index * count
+
+        order_id = order_index + 1
+        total = Decimal("0")
+        items = []
+        for j in range(count):
+            product_index = (base + j) % profile.products
+            unit_price = price_for_index(product_index)
+            total += unit_price
+            items.append((order_id, product_index + 1, 1, unit_price))
+
+        created_at = EPOCH + timedelta(seconds=order_index * self._seconds_per_order)
+        order = (order_id, user_id, user_id, count, "pending", total, created_at)
+        return order, items
+
+    def orders(self, start: int, end: int) -> Iterator[tuple[tuple, list[tuple]]]:
+        """Yield (order row, item rows) for order indexes in [start, end)."""
+        end = min(end, self.profile.orders)
+        for block in range(start // BLOCK_SIZE, math.ceil(end / BLOCK_SIZE)):
+            rng = self._block_rng(block)
+            block_start = block * BLOCK_SIZE
+            for order_index in range(block_start, min(block_start + BLOCK_SIZE, end)):
+                order = self._order(rng, order_index)
+                if order_index >= start:
+                    yield order
+
+
+def user_rows(profile: Profile) -> Iterator[tuple]:
+    step = SIGNUP_SPAN / profile.users
+    for i in range(profile.users):
+        yield i + 1, f"user{i}@example.com", f"User {i}", EPOCH - SIGNUP_SPAN + step * i
+
+
+def address_rows(profile: Profile) -> Iterator[tuple]:
+    # One address per user, sharing the user's id.
+    step = SIGNUP_SPAN / profile.users
+    for i in range(profile.users):
+        created_at = EPOCH - SIGNUP_SPAN + step * i
+        postal_code = f"{90000 + i % 10_000:05d}"
+        line1 = f"{100 + i} Main St"
+        yield i + 1, i + 1, line1, None, "Testville", "CA", postal_code, created_at
+
+
+def product_rows(profile: Profile) -> Iterator[tuple]:
+    created_at = EPOCH - SIGNUP_SPAN
+    for i in range(profile.products):
+        yield i + 1, f"Product {i}", f"SKU{i:06d}", price_for_index(i), created_at
@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# Open/closed-model HTTP load generator for the order endpoints. Each process drives
+# its share of keep-alive connections with a minimal HTTP/1.1 client and records
+# latencies into log-linear histograms that are merged by the parent.
+
+PERCENTILES = (50.0, 75.0, 90.0, 95.0, 99.0, 99.9, 99.99, 100.0)
+# Buckets are exact below 2**SUB_BUCKET_BITS and keep ~3 significant digits above.
+SUB_BUCKET_BITS = 11
+SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+
+class LatencyHistogram:
+    """Sparse HDR-style histogram of integer microsecond values."""
+
+    def __init__(self, counts: dict[int, int] | None = None) -> None:
+        self.counts: dict[int, int] = dict(counts or {})
+        self.total = sum(self.counts.values())
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        if value < 2 * SUB_BUCKET_HALF:
+            return max(value, 0)
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        return shift * SUB_BUCKET_HALF + (value >> shift)
+
+    @staticmethod
+    def bucket_value(index: int) -> int:
+        """Highest value that falls into the bucket."""
+        if index < 2 * SUB_BUCKET_HALF:
+            return index
+        shift = index // SUB_BUCKET_HALF - 1
+        return ((index - shift * SUB_BUCKET_HALF) << shift) + (1 << shift) - 1
+
+    def record(self, value: int, count: int = 1) -> None:
+        index = self.bucket(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+
+    def merge(self, other: LatencyHistogram) -> None:
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+
+    def corrected(self, expected_interval: int) -> LatencyHistogram:
+        """Back-fill the samples a stalled closed-loop client never sent.
+
+        Same idea as HdrHistogram's copyCorrectedForCoordinatedOmission: a response
+        that took N expected intervals also stands for the requests that would have
+        been issued during the stall, with latencies shrinking by one interval each.
+        """
+        result = LatencyHistogram()
+        for index, count in self.counts.items():
+            value = self.bucket_value(index)
+            result.record(value, count)
+            if expected_interval <= 0:
+                continue
+            missing = value - expected_interval
+            while missing >= expected_interval:
+                result.record(missing, count)
+                missing -= expected_interval
+        return result
+
+    def percentile(self, percentile: float) -> int:
+        if not self.total:
+            return 0
+        target = max(math.ceil(percentile / 100 * self.total), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return self.bucket_value(index)
+        return self.bucket_value(max(self.counts))
+
+    def mean(self) -> float:
+        if not self.total:
+            return 0.0
+        weighted = sum(self.bucket_value(i) * c for i, c in self.counts.items())
+        return weighted / self.total
+
+    def summary(self) -> dict[str, float]:
+        result: dict[str, float] = {"count": self.total, "mean_us": round(self.mean(), 1)}
+        for percentile in PERCENTILES:
+            result[f"p{percentile:g}_us"] = self.percentile(percentile)
+        return result
+
+    def percentile_distribution(self) -> str:
+        """Text output in the layout of HdrHistogram's .hgrm files."""
+        lines = [
+            f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}",
+            "",
+        ]
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            fraction = seen / self.total
+            inverse = "inf" if fraction >= 1 else f"{1 / (1 - fraction):.2f}"
+            lines.append(
+                f"{self.bucket_value(index) / 1000:>12.3f} {fraction:>14.12f} "
+                f"{seen:>10} {inverse:>14}"
+            )
+        lines.append(f"#[Mean = {self.mean() / 1000:.3f}, Total count = {self.total}]")
+        return "\n".join(lines) + "\n"
+
+
+@dataclass
+class LoadConfig:
+    host: str
+    port: int
+    mode: str
+    rate: float
+    connections: int
+    processes: int
+    duration: float
+    warmup: float
+    start_id: int
+    end_id: int
+    lite_ratio: float
+    seed: int
+    start_at: float = 0.0
+
+
+class RequestMix:
+    """Chooses the next request path."""
+
+    def __init__(self, config: LoadConfig, worker: int) -> None:
+        self.rng = random.Random(f"{config.seed}:{worker}")
+        self.start_id = config.start_id
+        self.end_id = config.end_id
+        self.lite_ratio = config.lite_ratio
+
+    def next_order_id(self) -> int:
+        return self.rng.randint(self.start_id, self.end_id)
+
+    def next_path(self) -> str:
+        order_id = self.next_order_id()
+        if self.rng.random() < self.lite_ratio:
+            return f"/orders/{order_id}/lite"
+        return f"/orders/{order_id}"
+
+
+# Builds the per-process request chooser; must be picklable (e.g. a class or partial).
+MixFactory = Callable[[LoadConfig, int], RequestMix]
+
+
+class HttpConnection:
+    """Keep-alive HTTP/1.1 GET client that reads exactly one response per request."""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def get(self, path: str) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode())
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status_line, _, header_block = head.decode("latin-1").partition("\r\n")
+        headers = {}
+        for line in header_block.split("\r\n"):
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if "content-length" in headers:
+            await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return int(status_line.split()[1])
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.reader = None
+
+
+class WorkerStats:
+    def __init__(self) -> None:
+        self.service = LatencyHistogram()
+        self.response = LatencyHistogram()
+        self.statuses: dict[int, int] = {}
+        self.errors = 0
+
+    def record(self, status: int, sent: float, intended: float, done: float) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.service.record(int((done - sent) * 1_000_000))
+        self.response.record(int((done - intended) * 1_000_000))
+
+
+async def _drive(config: LoadConfig, worker: int, mix_factory: MixFactory) -> dict:
+    mix = mix_factory(config, worker)
+    stats = WorkerStats()
+    connections = max(config.connections // config.processes, 1)
+    # Workers share a wall-clock start so their schedules interleave.
+    start = time.perf_counter() + max(config.start_at - time.time(), 0.0)
+    record_from = start + config.warmup
+    stop_at = record_from + config.duration
+    interval = config.processes / config.rate if config.rate > 0 else 0.0
+    next_slot = 0
+
+    async def run_connection() -> None:
+        nonlocal next_slot
+        conn = HttpConnection(config.host, config.port)
+        try:
+            while True:
+                if config.mode == "open":
+                    # Latency is measured from the scheduled send time, so queueing
+                    # behind a slow response is not omitted.
+                    intended = start + (next_slot + worker / config.processes) * interval
+                    next_slot += 1
+                    delay = intended - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                else:
+                    intended = time.perf_counter()
+                if intended >= stop_at:
+                    return
+                sent = time.perf_counter()
+                try:
+                    status = await conn.get(mix.next_path())
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    stats.errors += 1
+                    await conn.close()
+                    continue
+                if intended >= record_from:
+                    stats.record(status, sent, intended, time.perf_counter())
+        finally:
+            await conn.close()
+
+    await asyncio.sleep(max(start - time.perf_counter(), 0.0))
+    await asyncio.gather(*(run_connection() for _ in range(connections)))
+    return {
+        "service": stats.service.counts,
+        "response": stats.response.counts,
+        "statuses": stats.statuses,
+        "errors": stats.errors,
+    }
+
+
+def run_worker(config: LoadConfig, worker: int, mix_factory: MixFactory) -> dict:
+    return asyncio.run(_drive(config, worker, mix_factory))
+
+
+def run_load(
+    config: LoadConfig,
+    expected_interval_us: int | None = None,
+    mix_factory: MixFactory = RequestMix,
+) -> dict:
+    config.start_at = time.time() + 1.0
+    count = config.processes
+    with ProcessPoolExecutor(max_workers=count) as pool:
+        results = list(
+            pool.map(run_worker, [config] * count, range(count), [mix_factory] * count)
+        )
+
+    service = LatencyHistogram()
+    response = LatencyHistogram()
+    statuses: dict[int, int] = {}
+    errors = 0
+    for result in results:
+        service.merge(LatencyHistogram(result["service"]))
+        response.merge(LatencyHistogram(result["response"]))
+        for status, count in result["statuses"].items():
+            statuses[status] = statuses.get(status, 0) + count
+        errors += result["errors"]
+
+    if config.mode == "closed":
+        # A closed loop cannot see its own omissions; back-fill them using the
+        # expected time between requests on one connection (default: median latency).
+        interval = expected_interval_us or service.percentile(50)
+        response = service.corrected(interval)
+    else:
+        interval = None
+
+    return {
+        "config": asdict(config),
+        "expected_interval_us": interval,
+        "requests": service.total,
+        "errors": errors,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "throughput_rps": round(service.total / config.duration, 1),
+        "service_time": service.summary(),
+        "response_time": response.summary(),
+        "histogram": response,
+    }
+
+
+def write_report(report: dict, reports_dir: Path, label: str) -> Path:
+    reports_dir.mkdir(exist_ok=True)
+    histogram: LatencyHistogram = report.pop("histogram")
+    (reports_dir / f"loadgen-{label}.hgrm").write_text(histogram.percentile_distribution())
+    path = reports_dir / f"loadgen-{label}.json"
+    path.write_text(json.dumps(report, indent=2) + "\n")
+    return path
+
+
+def print_summary(report: dict) -> None:
+    print(
+        f"{report['requests']:,} requests, {report['errors']} errors, "
+        f"{report['throughput_rps']:,.0f} req/s, statuses {report['statuses']}"
+    )
+    print(f"{'percentile':>10} {'service ms':>12} {'response ms':>12}")
+    for percentile in PERCENTILES:
+        key = f"p{percentile:g}_us"
+        print(
+            f"{percentile:>10g} {report['service_time'][key] / 1000:>12.3f} "
+            f"{report['response_time'][key] / 1000:>12.3f}"
+        )
+
+
+def add_load_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--mode", choices=("open", "closed"), default="open")
+    parser.add_argument(
+        "--rate", type=float, default=5_000, help="open mode: total requests/s"
+    )
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument(
+        "--expected-interval-ms",
+        type=float,
+        help="closed mode: interval used for coordinated-omission correction",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reports", type=Path, default=Path("reports"))
+
+
+def load_config(args: argparse.Namespace, **overrides) -> LoadConfig:
+    url = urlsplit(args.base_url)
+    values = dict(
+        host=url.hostname or "localhost",
+        port=url.port or 80,
+        mode=args.mode,
+        rate=args.rate,
+        connections=args.connections,
+        processes=max(min(args.processes, args.connections), 1),
+        duration=args.duration,
+        warmup=args.warmup,
+        start_id=getattr(args, "start_id", 10_000),
+        end_id=getattr(args, "end_id", 12_000),
+        lite_ratio=getattr(args, "lite_ratio", 0.5),
+        seed=args.seed,
+    )
+    values.update(overrides)
+    return LoadConfig(**values)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HTTP load generator for /orders.")
+    add_load_arguments(parser)
+    parser.add_argument("--start-id", type=int, default=10_000)
+    parser.add_argument("--end-id", type=int, default=12_000)
+    parser.add_argument("--lite-ratio", type=float, default=0.5)
+    parser.add_argument("--label", default="run")
+    args = parser.parse_args()
+
+    expected = int(args.expected_interval_ms * 1000) if args.expected_interval_ms else None
+    report = run_load(load_config(args), expected)
+    print_summary(report)
+    path = write_report(report, args.reports, args.label)
+    print(f"report: {path}")
+
+
+if __name__ == "__main__":
+    main()
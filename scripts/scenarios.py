@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import urllib.error
+import urllib.request
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+
+from scripts.dataset import power_law_rank, scramble_multiplier
+from scripts.loadgen import (
+    LoadConfig,
+    RequestMix,
+    add_load_arguments,
+    load_config,
+    print_summary,
+    run_load,
+    write_report,
+)
+
+# Named workloads that pin the cache-hit ratio, key skew, lite/full mix and 404 rate.
+# Ids 1..hot_size form the hot set, which is pre-warmed into Redis; every miss takes
+# the next id from a scrambled cursor over the remaining ids and is never repeated,
+# so it really reaches the database.
+
+ZIPF_SKEW = 1.0
+# "hotset": this share of hot traffic goes to this share of the hot ids.
+HOTSET_TRAFFIC = 0.9
+HOTSET_FRACTION = 0.1
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    hit_ratio: float
+    distribution: str = "uniform"
+    lite_ratio: float = 0.5
+    not_found_ratio: float = 0.0
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("hit-100", 1.0),
+        Scenario("hit-95-zipf", 0.95, "zipf"),
+        Scenario("hit-50-hotset", 0.5, "hotset"),
+        Scenario("hit-0", 0.0),
+        Scenario("lite-90", 0.95, "zipf", lite_ratio=0.9),
+        Scenario("full-only", 0.95, "zipf", lite_ratio=0.0),
+        Scenario("not-found-10", 0.95, not_found_ratio=0.1),
+    )
+}
+
+
+@dataclass(frozen=True)
+class KeySpace:
+    hot_size: int
+    max_id: int
+
+    @property
+    def cold_size(self) -> int:
+        return self.max_id - self.hot_size
+
+
+class ScenarioMix(RequestMix):
+    def __init__(
+        self, scenario: Scenario, keys: KeySpace, config: LoadConfig, worker: int
+    ) -> None:
+        super().__init__(config, worker)
+        self.scenario = scenario
+        self.keys = keys
+        self.lite_ratio = scenario.lite_ratio
+        # Workers take interleaved cursor positions, so no two share a cold id.
+        self.worker = worker
+        self.stride = config.processes
+        self.cold_cursor = 0
+        self.cold_multiplier = scramble_multiplier(keys.cold_size)
+
+    def hot_id(self) -> int:
+        size = self.keys.hot_size
+        distribution = self.scenario.distribution
+        if distribution == "zipf":
+            return power_law_rank(self.rng, size, ZIPF_SKEW) + 1
+        if distribution == "hotset" and self.rng.random() < HOTSET_TRAFFIC:
+            return self.rng.randrange(max(int(size * HOTSET_FRACTION), 1)) + 1
+        return self.rng.randrange(size) + 1
+
+    def cold_id(self) -> int:
+        position = self.cold_cursor * self.stride + self.worker
+        self.cold_cursor += 1
+        offset = position * self.cold_multiplier % self.keys.cold_size
+        return self.keys.hot_size + 1 + offset
+
+    def next_order_id(self) -> int:
+        if self.rng.random() < self.scenario.not_found_ratio:
+            return self.keys.max_id + 1 + self.rng.randrange(self.keys.max_id)
+        if self.rng.random() < self.scenario.hit_ratio:
+            return self.hot_id()
+        return self.cold_id()
+
+
+_TIER_LINE = re.compile(r'^order_cache_tier_workers\{tier="(\w+)"\} (\d+)$', re.M)
+
+
+def check_server_tiers(base_url: str) -> None:
+    """Refuse to run when the server has cache tiers this tool cannot purge."""
+    # Imported late so APP_NAME (and with it the cache prefix) is already set.
+    from cache import shared_cache_stats
+
+    try:
+        with urllib.request.urlopen(base_url + "/metrics", timeout=5) as response:
+            text = response.read().decode()
+    except (urllib.error.URLError, ConnectionError, TimeoutError) as exc:
+        print(f"warning: cannot check the server's cache tiers ({exc})")
+        return
+    tiers = {tier: int(workers) for tier, workers in _TIER_LINE.findall(text)}
+    blocking = []
+    if tiers.get("local"):
+        blocking.append("LOCAL_CACHE_MAX_BYTES")
+    # The segment is a file on this host: purging clears it if this process maps it too.
+    if tiers.get("shared") and shared_cache_stats() is None:
+        blocking.append("SHARED_CACHE_MAX_BYTES")
+    if blocking:
+        raise SystemExit(
+            f"the server runs with {' and '.join(blocking)}: its workers' cache tiers "
+            "survive the purge, so hit ratios would be wrong; restart it without them"
+        )
+
+
+async def prepare_cache(scenario: Scenario, keys: KeySpace) -> None:
+    """Empty the workers' cache generation, then pre-warm the hot set."""
+    # Imported late so APP_NAME (and with it the cache prefix) is already set.
+    from cache import purge_current_generation
+    from orders_service import ORDER_BATCH_MAX_IDS, load_order_batch_payload
+
+    removed = await purge_current_generation()
+    variants = []
+    if scenario.lite_ratio > 0:
+        variants.append(True)
+    if scenario.lite_ratio < 1:
+        variants.append(False)
+    if scenario.hit_ratio > 0:
+        for lite in variants:
+            for start in range(1, keys.hot_size + 1, ORDER_BATCH_MAX_IDS):
+                end = min(start + ORDER_BATCH_MAX_IDS, keys.hot_size + 1)
+                await load_order_batch_payload(list(range(start, end)), lite)
+    warmed = keys.hot_size * len(variants) if scenario.hit_ratio > 0 else 0
+    print(f"{scenario.name}: purged {removed} keys, warmed {warmed}")
+
+
+async def redis_hits() -> tuple[int, int] | None:
+    from redis.exceptions import RedisError
+
+    from cache import get_redis
+
+    try:
+        stats = await get_redis().info("stats")
+    except RedisError:
+        # Best effort: some Redis-compatible servers do not implement INFO.
+        return None
+    return stats["keyspace_hits"], stats["keyspace_misses"]
+
+
+def hit_ratio(
+    before: tuple[int, int] | None, after: tuple[int, int] | None
+) -> float | None:
+    if before is None or after is None:
+        return None
+    hits = after[0] - before[0]
+    lookups = hits + after[1] - before[1]
+    return round(hits / lookups, 4) if lookups else None
+
+
+async def close_connections() -> None:
+    import orders_asyncpg
+    from cache import get_redis, get_redis_bytes
+    from db import engine
+
+    await engine.dispose()
+    await orders_asyncpg.close_pool()
+    await get_redis().aclose()
+    await get_redis_bytes().aclose()
+
+
+def cold_requests(scenario: Scenario, config: LoadConfig) -> float:
+    if config.mode != "open":
+        return 0.0
+    total = config.rate * (config.duration + config.warmup)
+    return total * (1 - scenario.not_found_ratio) * (1 - scenario.hit_ratio)
+
+
+async def run_scenarios(args: argparse.Namespace) -> list[dict]:
+    keys = KeySpace(args.hot_size, args.max_id)
+    config = load_config(args)
+    check_server_tiers(args.base_url)
+    results = []
+    for name in args.scenarios:
+        scenario = SCENARIOS[name]
+        if cold_requests(scenario, config) > keys.cold_size:
+            print(f"{name}: warning, cold ids will repeat and turn into hits")
+        await prepare_cache(scenario, keys)
+        before = await redis_hits()
+        mix = partial(ScenarioMix, scenario, keys)
+        # Blocks this loop on purpose: nothing else runs here during the load.
+        report = run_load(config, None, mix)
+        after = await redis_hits()
+        report["scenario"] = asdict(scenario)
+        report["key_space"] = asdict(keys)
+        # Includes fill-lock and generation lookups, so treat it as approximate.
+        report["redis_hit_ratio"] = hit_ratio(before, after)
+        print_summary(report)
+        write_report(report, args.reports, f"{args.label}-{name}")
+        results.append(report)
+    await close_connections()
+    return results
+
+
+def scenario_table(results: list[dict]) -> str:
+    lines = [
+        "| Scenario | Req/s | Errors | p50 ms | p99 ms | p99.9 ms | p99.99 ms | Redis hit |",
+        "| --- | ---: | ---: | ---: | ---: | ---: | ---: | ---: |",
+    ]
+    for report in results:
+        latency = report["response_time"]
+        ratio = report["redis_hit_ratio"]
+        lines.append(
+            f"| {report['scenario']['name']} | {report['throughput_rps']:,.0f} "
+            f"| {report['errors']} "
+            + "".join(
+                f"| {latency[key] / 1000:.3f} "
+                for key in ("p50_us", "p99_us", "p99.9_us", "p99.99_us")
+            )
+            + f"| {'-' if ratio is None else f'{ratio:.1%}'} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run named cache/key-skew workloads.")
+    add_load_arguments(parser)
+    parser.add_argument(
+        "--app", required=True, help="APP_NAME of the running server (cache prefix)"
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS)
+    )
+    parser.add_argument("--hot-size", type=int, default=20_000)
+    parser.add_argument("--max-id", type=int, default=1_000_000)
+    parser.add_argument("--label", help="report label, defaults to --app")
+    args = parser.parse_args()
+    args.label = args.label or args.app
+    os.environ["APP_NAME"] = args.app
+
+    results = asyncio.run(run_scenarios(args))
+    table = scenario_table(results)
+    print(table)
+    summary = {report["scenario"]["name"]: report for report in results}
+    path = Path(args.reports) / f"scenarios-{args.label}.json"
+    path.write_text(json.dumps(summary, indent=2) + "\n")
+    (path.with_suffix(".md")).write_text(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,150 +1,280 @@
 from __future__ import annotations
 
+import argparse
 import asyncio
-from decimal import Decimal
+import os
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 
-from sqlalchemy import insert, select
+import asyncpg
+from sqlalchemy import insert
 
-from db import Base, engine
+from db import ASYNCPG_DSN, Base, engine
+from scripts.backfill_order_documents import backfill
+from scripts.dataset import (
+    PROFILES,
+    OrderGenerator,
+    Profile,
+    address_rows,
+    product_rows,
+    user_rows,
+)
 
-NUM_USERS = 100
-NUM_PRODUCTS = 100_000
-NUM_ORDERS = 1_000_000
-ITEMS_PER_ORDER = 20
-ORDERS_BATCH_SIZE = 1_000
-PRODUCTS_BATCH_SIZE = 5_000
+INSERT_BATCH_SIZE = 1_000
+COPY_CHUNK_SIZE = 50_000
 
+INDEXED_TABLES = ("orders", "order_items")
 
-def price_for_index(index: int) -> Decimal:
-    cents = 100 + (index % 10_000)
-    return Decimal(cents) / Decimal(100)
+COLUMNS = {
+    "users": ("id", "email", "full_name", "created_at"),
+    "addresses": (
+        "id", "user_id", "line1", "line2", "city", "state", "postal_code", "created_at"
+    ),
+    "products": ("id", "name", "sku", "price", "created_at"),
+    "orders": (
+        "id", "user_id", "address_id", "quantity", "status", "total", "created_at"
+    ),
+    # Item ids come from the sequence; COPY order keeps them ascending within an order.
+    "order_items": ("order_id", "product_id", "quantity", "unit_price"),
+}
+REFERENCE_ROWS = {
+    "users": user_rows,
+    "addresses": address_rows,
+    "products": product_rows,
+}
 
 
-async def main() -> None:
-    users_table = Base.metadata.tables["users"]
-    addresses_table = Base.metadata.tables["addresses"]
-    products_table = Base.metadata.tables["products"]
-    orders_table = Base.metadata.tables["orders"]
-    order_items_table = Base.metadata.tables["order_items"]
+def batched(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def order_records(generator: OrderGenerator, start: int, end: int) -> Iterator[tuple]:
+    for order, _ in generator.orders(start, end):
+        yield order
+
 
-    user_ids: list[int] = []
-    address_ids: list[int] = []
-    product_ids: list[int] = []
-    product_prices: list[Decimal] = []
+def order_item_records(
+    generator: OrderGenerator, start: int, end: int
+) -> Iterator[tuple]:
+    for _, items in generator.orders(start, end):
+        yield from items
+
+
+async def seed_with_inserts(profile: Profile, seed: int) -> None:
+    tables = {name: Base.metadata.tables[name] for name in COLUMNS}
+
+    def as_dicts(table: str, rows: list[tuple]) -> list[dict]:
+        return [dict(zip(COLUMNS[table], row)) for row in rows]
 
     async with engine.begin() as conn:
-        users_batch = []
-        for i in range(NUM_USERS):
-            users_batch.append(
-                {
-                    "email": f"user{i}@example.com",
-                    "full_name": f"User {i}",
-                }
-            )
-        await conn.execute(insert(users_table), users_batch)
-        user_ids = list(
-            await conn.scalars(select(users_table.c.id).order_by(users_table.c.id))
-        )
+        for table, rows in REFERENCE_ROWS.items():
+            started = time.perf_counter()
+            count = 0
+            for batch in batched(rows(profile), INSERT_BATCH_SIZE):
+                await conn.execute(insert(tables[table]), as_dicts(table, batch))
+                count += len(batch)
+            report(table, count, time.perf_counter() - started)
 
-        addresses_batch = []
-        for i, user_id in enumerate(user_ids):
-            addresses_batch.append(
-                {
-                    "user_id": user_id,
-                    "line1": f"{100 + i} Main St",
-                    "line2": None,
-                    "city": "Testville",
-                    "state": "CA",
-                    "postal_code": f"{90000 + i:05d}",
-                }
-            )
-        await conn.execute(insert(addresses_table), addresses_batch)
-        address_ids = list(
-            await conn.scalars(
-                select(addresses_table.c.id).order_by(addresses_table.c.id)
+        started = time.perf_counter()
+        counts = {"orders": 0, "order_items": 0}
+        generator = OrderGenerator(profile, seed)
+        for batch in batched(generator.orders(0, profile.orders), INSERT_BATCH_SIZE):
+            orders = [order for order, _ in batch]
+            items = [item for _, order_items in batch for item in order_items]
+            await conn.execute(insert(tables["orders"]), as_dicts("orders", orders))
+            await conn.execute(
+                insert(tables["order_items"]), as_dicts("order_items", items)
             )
-        )
+            counts["orders"] += len(orders)
+            counts["order_items"] += len(items)
+        elapsed = time.perf_counter() - started
+        for table, count in counts.items():
+            report(table, count, elapsed)
 
-        for offset in range(0, NUM_PRODUCTS, PRODUCTS_BATCH_SIZE):
-            batch = []
-            batch_end = min(offset + PRODUCTS_BATCH_SIZE, NUM_PRODUCTS)
-            for i in range(offset, batch_end):
-                price = price_for_index(i)
-                product_prices.append(price)
-                batch.append(
-                    {
-                        "name": f"Product {i}",
-                        "sku": f"SKU{i:06d}",
-                        "price": price,
-                    }
-                )
-            await conn.execute(insert(products_table), batch)
-        product_ids = list(
-            await conn.scalars(select(products_table.c.id).order_by(products_table.c.id))
+
+async def copy_rows(table: str, records: Iterable[tuple]) -> int:
+    conn = await asyncpg.connect(ASYNCPG_DSN)
+    try:
+        result = await conn.copy_records_to_table(
+            table, records=records, columns=COLUMNS[table]
         )
+    finally:
+        await conn.close()
+    # The command tag is "COPY <rows>".
+    return int(result.split()[-1])
 
-        orders_per_user = NUM_ORDERS // NUM_USERS
-        order_index = 0
-        orders_batch = []
-        items_batch = []
-
-        for user_idx, user_id in enumerate(user_ids):
-            address_id = address_ids[user_idx]
-            for _ in range(orders_per_user):
-                item_total = Decimal("0")
-                base = (order_index * ITEMS_PER_ORDER) % NUM_PRODUCTS
-                for j in range(ITEMS_PER_ORDER):
-                    product_idx = (base + j) % NUM_PRODUCTS
-                    unit_price = product_prices[product_idx]
-                    item_total += unit_price
-                    items_batch.append(
-                        {
-                            "order_id": None,
-                            "product_id": product_ids[product_idx],
-                            "quantity": 1,
-                            "unit_price": unit_price,
-                        }
-                    )
 
-                orders_batch.append(
-                    {
-                        "user_id": user_id,
-                        "address_id": address_id,
-                        "quantity": ITEMS_PER_ORDER,
-                        "status": "pending",
-                        "total": item_total,
-                    }
-                )
+def copy_order_range(
+    table: str, profile: Profile, seed: int, start: int, end: int
+) -> int:
+    generator = OrderGenerator(profile, seed)
+    records = order_records if table == "orders" else order_item_records
+    return asyncio.run(copy_rows(table, records(generator, start, end)))
+
 
-                order_index += 1
+def report(table: str, rows: int, elapsed: float) -> None:
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"{table:<15} {rows:>12,} rows {elapsed:>9.2f}s {rate:>14,.0f} rows/s")
 
-                if len(orders_batch) >= ORDERS_BATCH_SIZE:
-                    result = await conn.execute(
-                        insert(orders_table).returning(orders_table.c.id),
-                        orders_batch,
+
+async def drop_secondary_indexes(conn: asyncpg.Connection) -> list[str]:
+    indexes = await conn.fetch(
+        """
+        SELECT i.indexname, i.indexdef
+        FROM pg_indexes i
+        JOIN pg_class c ON c.relname = i.indexname
+        JOIN pg_index x ON x.indexrelid = c.oid
+        WHERE i.schemaname = 'public'
+          AND i.tablename = ANY($1::text[])
+          AND NOT x.indisprimary
+          AND NOT x.indisunique
+        """,
+        list(INDEXED_TABLES),
+    )
+    for index in indexes:
+        await conn.execute(f'DROP INDEX "{index["indexname"]}"')
+    return [index["indexdef"] for index in indexes]
+
+
+async def rebuild_indexes(definitions: list[str]) -> None:
+    async def build(definition: str) -> None:
+        conn = await asyncpg.connect(ASYNCPG_DSN)
+        try:
+            await conn.execute(definition)
+        finally:
+            await conn.close()
+
+    await asyncio.gather(*(build(definition) for definition in definitions))
+
+
+async def seed_with_copy(
+    profile: Profile, seed: int, workers: int, chunk_size: int, drop_indexes: bool
+) -> None:
+    conn = await asyncpg.connect(ASYNCPG_DSN)
+    try:
+        if await conn.fetchval("SELECT EXISTS (SELECT 1 FROM orders)"):
+            raise SystemExit("COPY mode expects empty tables; reset the database first")
+        index_definitions = await drop_secondary_indexes(conn) if drop_indexes else []
+    finally:
+        await conn.close()
+
+    try:
+        for table, rows in REFERENCE_ROWS.items():
+            started = time.perf_counter()
+            count = await copy_rows(table, rows(profile))
+            report(table, count, time.perf_counter() - started)
+
+        ranges = [
+            (start, min(start + chunk_size, profile.orders))
+            for start in range(0, profile.orders, chunk_size)
+        ]
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Orders finish before any items are copied so foreign keys always resolve.
+            for table in ("orders", "order_items"):
+                started = time.perf_counter()
+                counts = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(
+                            pool, copy_order_range, table, profile, seed, start, end
+                        )
+                        for start, end in ranges
                     )
-                    order_ids_batch = list(result.scalars())
-                    for idx, order_id in enumerate(order_ids_batch):
-                        base_idx = idx * ITEMS_PER_ORDER
-                        for item_idx in range(base_idx, base_idx + ITEMS_PER_ORDER):
-                            items_batch[item_idx]["order_id"] = order_id
-
-                    await conn.execute(insert(order_items_table), items_batch)
-                    orders_batch.clear()
-                    items_batch.clear()
-
-        if orders_batch:
-            result = await conn.execute(
-                insert(orders_table).returning(orders_table.c.id),
-                orders_batch,
+                )
+                report(table, sum(counts), time.perf_counter() - started)
+    finally:
+        # Also after a failed or interrupted load: the tables must not be left without
+        # their indexes.
+        if index_definitions:
+            started = time.perf_counter()
+            await rebuild_indexes(index_definitions)
+            elapsed = time.perf_counter() - started
+            print(f"{'indexes':<15} {len(index_definitions):>12} built {elapsed:>8.2f}s")
+
+
+async def set_document_triggers(enabled: bool) -> bool:
+    """Toggle the order_documents triggers; False if the read model is not installed."""
+    conn = await asyncpg.connect(ASYNCPG_DSN)
+    try:
+        triggers = await conn.fetch(
+            "SELECT tgrelid::regclass::text, tgname FROM pg_trigger "
+            "WHERE tgname LIKE 'order\\_documents\\_%' AND NOT tgisinternal"
+        )
+        action = "ENABLE" if enabled else "DISABLE"
+        for table, name in triggers:
+            await conn.execute(f"ALTER TABLE {table} {action} TRIGGER {name}")
+    finally:
+        await conn.close()
+    return bool(triggers)
+
+
+async def finalize() -> None:
+    conn = await asyncpg.connect(ASYNCPG_DSN)
+    try:
+        # Explicit ids bypass the sequences, so move them past the loaded rows.
+        for table in COLUMNS:
+            await conn.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"(SELECT max(id) FROM {table}))"
             )
-            order_ids_batch = list(result.scalars())
-            for idx, order_id in enumerate(order_ids_batch):
-                base_idx = idx * ITEMS_PER_ORDER
-                for item_idx in range(base_idx, base_idx + ITEMS_PER_ORDER):
-                    items_batch[item_idx]["order_id"] = order_id
+        # VACUUM also sets the visibility map, so index-only scans skip the heap.
+        await conn.execute("VACUUM (ANALYZE)")
+    finally:
+        await conn.close()
 
-            await conn.execute(insert(order_items_table), items_batch)
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed the benchmark database.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="baseline")
+    parser.add_argument(
+        "--seed", type=int, default=1, help="same profile and seed give the same data"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=("insert", "copy"),
+        default="insert",
+        help="insert: batched SQLAlchemy inserts; copy: parallel binary COPY",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--chunk-size", type=int, default=COPY_CHUNK_SIZE)
+    parser.add_argument(
+        "--rebuild-indexes",
+        action="store_true",
+        help="drop secondary indexes on orders/order_items during COPY, rebuild after",
+    )
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    print(
+        f"profile {profile.name}: {profile.users:,} users, "
+        f"{profile.products:,} products, {profile.orders:,} orders, seed {args.seed}"
+    )
+    # Per-statement document refreshes would dominate a bulk load; build them once after.
+    documents = await set_document_triggers(False)
+    try:
+        if args.mode == "copy":
+            await seed_with_copy(
+                profile, args.seed, args.workers, args.chunk_size, args.rebuild_indexes
+            )
+        else:
+            await seed_with_inserts(profile, args.seed)
+    finally:
+        if documents:
+            await set_document_triggers(True)
+    if documents:
+        started = time.perf_counter()
+        count = await backfill(args.workers)
+        report("order_documents", count, time.perf_counter() - started)
+    await finalize()
+    await engine.dispose()
 
 
 if __name__ == "__main__":
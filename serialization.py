@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import os
+from collections.abc import Sequence
+from typing import Any
+
+from orders_core import (
+    ADDRESS_START,
+    USER_START,
+    build_order_response,
+    order_schema,
+)
+from schemas import OrderResponse, OrderSchema
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Encoders turn raw order rows (see orders_core.OrderRows) into the response JSON.
+# Every engine produces the same document shape as the Pydantic schemas: timestamps
+# as isoformat strings and money as JSON numbers.
+
+SERIALIZER = os.getenv("SERIALIZER", "pydantic")
+
+
+class PydanticSerializer:
+    name = "pydantic"
+
+    def encode_order(
+        self, header: Sequence, item_rows: Sequence[Sequence], item_start: int
+    ) -> bytes:
+        return build_order_response(header, item_rows, item_start).model_dump_json().encode()
+
+    def encode_order_lite(self, row: Sequence) -> bytes:
+        return order_schema(row).model_dump_json().encode()
+
+    def decode_order(self, payload: bytes) -> Any:
+        return OrderResponse.model_validate_json(payload)
+
+    def decode_order_lite(self, payload: bytes) -> Any:
+        return OrderSchema.model_validate_json(payload)
+
+
+def _order_dict(row: Sequence) -> dict[str, Any]:
+    return {
+        "id": row[0],
+        "user_id": row[1],
+        "address_id": row[2],
+        "quantity": row[3],
+        "status": row[4],
+        "total": float(row[5]),
+        "created_at": row[6].isoformat(),
+    }
+
+
+def _user_dict(row: Sequence) -> dict[str, Any]:
+    return {
+        "id": row[USER_START],
+        "email": row[USER_START + 1],
+        "full_name": row[USER_START + 2],
+        "created_at": row[USER_START + 3].isoformat(),
+    }
+
+
+def _address_dict(row: Sequence) -> dict[str, Any]:
+    return {
+        "id": row[ADDRESS_START],
+        "user_id": row[ADDRESS_START + 1],
+        "line1": row[ADDRESS_START + 2],
+        "line2": row[ADDRESS_START + 3],
+        "city": row[ADDRESS_START + 4],
+        "state": row[ADDRESS_START + 5],
+        "postal_code": row[ADDRESS_START + 6],
+        "created_at": row[ADDRESS_START + 7].isoformat(),
+    }
+
+
+def _item_dict(row: Sequence, start: int) -> dict[str, Any]:
+    return {
+        "order_item_id": row[start],
+        "product_id": row[start + 1],
+        "name": row[start + 2],
+        "sku": row[start + 3],
+        "price": float(row[start + 4]),
+        "quantity": row[start + 5],
+        "unit_price": float(row[start + 6]),
+    }
+
+
+class OrjsonSerializer:
+    name = "orjson"
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise RuntimeError("SERIALIZER=orjson requires the orjson package")
+        self._dumps = orjson.dumps
+        self._loads = orjson.loads
+
+    def encode_order(
+        self, header: Sequence, item_rows: Sequence[Sequence], item_start: int
+    ) -> bytes:
+        return self._dumps(
+            {
+                "order": _order_dict(header),
+                "user": _user_dict(header),
+                "address": _address_dict(header),
+                "products": [_item_dict(row, item_start) for row in item_rows],
+            }
+        )
+
+    def encode_order_lite(self, row: Sequence) -> bytes:
+        return self._dumps(_order_dict(row))
+
+    def decode_order(self, payload: bytes) -> Any:
+        return self._loads(payload)
+
+    def decode_order_lite(self, payload: bytes) -> Any:
+        return self._loads(payload)
+
+
+if msgspec is not None:
+    # Timestamps and money are pre-converted, so msgspec emits neither "Z" suffixes
+    # nor Decimal strings and the output matches the Pydantic format.
+
+    class OrderStruct(msgspec.Struct):
+        id: int
+        user_id: int
+        address_id: int
+        quantity: int
+        status: str
+        total: float
+        created_at: str
+
+    class UserStruct(msgspec.Struct):
+        id: int
+        email: str
+        full_name: str
+        created_at: str
+
+    class AddressStruct(msgspec.Struct):
+        id: int
+        user_id: int
+        line1: str
+        line2: str | None
+        city: str
+        state: str
+        postal_code: str
+        created_at: str
+
+    class OrderItemStruct(msgspec.Struct):
+        order_item_id: int
+        product_id: int
+        name: str
+        sku: str
+        price: float
+        quantity: int
+        unit_price: float
+
+    class OrderResponseStruct(msgspec.Struct):
+        order: OrderStruct
+        user: UserStruct
+        address: AddressStruct
+        products: list[OrderItemStruct]
+
+
+def _order_struct(row: Sequence) -> OrderStruct:
+    return OrderStruct(
+        row[0], row[1], row[2], row[3], row[4], float(row[5]), row[6].isoformat()
+    )
+
+
+class MsgspecSerializer:
+    name = "msgspec"
+
+    def __init__(self) -> None:
+        if msgspec is None:
+            raise RuntimeError("SERIALIZER=msgspec requires the msgspec package")
+        self._encode = msgspec.json.Encoder().encode
+        self._decode_response = msgspec.json.Decoder(OrderResponseStruct).decode
+        self._decode_order = msgspec.json.Decoder(OrderStruct).decode
+
+    def encode_order(
+        self, header: Sequence, item_rows: Sequence[Sequence], item_start: int
+    ) -> bytes:
+        u = USER_START
+        a = ADDRESS_START
+        i = item_start
+        return self._encode(
+            OrderResponseStruct(
+                _order_struct(header),
+                UserStruct(header[u], header[u + 1], header[u + 2], header[u + 3].isoformat()),
+                AddressStruct(
+                    header[a],
+                    header[a + 1],
+                    header[a + 2],
+                    header[a + 3],
+                    header[a + 4],
+                    header[a + 5],
+                    header[a + 6],
+                    header[a + 7].isoformat(),
+                ),
+                [
+                    OrderItemStruct(
+                        row[i],
+                        row[i + 1],
+                        row[i + 2],
+                        row[i + 3],
+                        float(row[i + 4]),
+                        row[i + 5],
+                        float(row[i + 6]),
+                    )
+                    for row in item_rows
+                ],
+            )
+        )
+
+    def encode_order_lite(self, row: Sequence) -> bytes:
+        return self._encode(_order_struct(row))
+
+    def decode_order(self, payload: bytes) -> Any:
+        return self._decode_response(payload)
+
+    def decode_order_lite(self, payload: bytes) -> Any:
+        return self._decode_order(payload)
+
+
+SERIALIZERS = {
+    "pydantic": PydanticSerializer,
+    "orjson": OrjsonSerializer,
+    "msgspec": MsgspecSerializer,
+}
+
+_serializer = None
+
+
+def get_serializer():
+    global _serializer
+    if _serializer is None:
+        if SERIALIZER not in SERIALIZERS:
+            raise ValueError(f"Unknown SERIALIZER: {SERIALIZER!r}")
+        _serializer = SERIALIZERS[SERIALIZER]()
+    return _serializer
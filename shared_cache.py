@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+
+# Response cache shared by all worker processes on a host: a set-associative hash table
+# of fixed-size slots in one memory-mapped file on tmpfs. Each key hashes to a set of
+# `ways` slots; a tag array holds the key hash of every slot so a lookup reads one small
+# block before touching a slot.
+#
+# Reads take no lock. Every slot starts with a sequence counter that writers make odd
+# before changing the slot and even again afterwards; a reader copies the key and value
+# and only trusts them if the counter was even and unchanged (a seqlock). Writers of the
+# same set serialize on one of `stripes` fcntl byte-range locks, which the kernel drops
+# if a worker dies mid-write. A full set evicts its least recently read slot.
+#
+# The segment size is the byte budget. Entries that do not fit in one slot are not
+# stored here and stay in Redis only.
+
+MAGIC = b"SHMCv001"
+SEGMENT_HEADER = struct.Struct("<8sIII")  # magic, sets, ways, slot bytes
+SEGMENT_HEADER_SIZE = 64
+# seq, key hash, expires at, last read at, key length, value length
+SLOT_HEADER = struct.Struct("<QQddI4xI")
+_SEQ = struct.Struct("<Q")
+_READ_AT = struct.Struct("<d")
+_READ_AT_OFFSET = 24
+
+
+def _key_hash(key: bytes) -> int:
+    # Stable across processes, unlike hash(); 0 marks an empty slot.
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+class SharedCache:
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int,
+        slot_bytes: int,
+        ways: int,
+        stripes: int,
+        ttl: float,
+    ) -> None:
+        sets = max((max_bytes - SEGMENT_HEADER_SIZE) // (ways * (slot_bytes + 8)), 1)
+        self._fd = self._open(
+            path,
+            SEGMENT_HEADER.pack(MAGIC, sets, ways, slot_bytes),
+            sets * ways * (slot_bytes + 8),
+        )
+        self.sets = sets
+        self.ways = ways
+        self.slot_bytes = slot_bytes
+        self.slots_at = SEGMENT_HEADER_SIZE + self.sets * self.ways * 8
+        self.size = self.slots_at + self.sets * self.ways * self.slot_bytes
+        self._map = mmap.mmap(self._fd, self.size)
+        self._tags = struct.Struct(f"<{self.ways}Q")
+        self.stripes = stripes
+        self.ttl = ttl
+        self.capacity = self.slot_bytes - SLOT_HEADER.size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversized = 0
+
+    @staticmethod
+    def _open_matching(path: Path, header: bytes) -> int | None:
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        if os.pread(fd, len(header), 0) == header:
+            return fd
+        os.close(fd)
+        return None
+
+    @classmethod
+    def _open(cls, path: Path, header: bytes, body_size: int) -> int:
+        fd = cls._open_matching(path, header)
+        if fd is not None:
+            return fd
+        # Missing, or built with another geometry (SHARED_CACHE_MAX_BYTES, _SLOT_BYTES
+        # or _WAYS changed between runs): rebuild it. The lock makes concurrent workers
+        # agree on one file; workers still mapping the old one keep it until they exit.
+        with open(f"{path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            fd = cls._open_matching(path, header)
+            if fd is not None:
+                return fd
+            # Built under a private name and renamed into place, so no worker ever
+            # maps a segment without its header.
+            partial = f"{path}.{os.getpid()}.tmp"
+            fd = os.open(partial, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                os.ftruncate(fd, SEGMENT_HEADER_SIZE + body_size)
+                os.pwrite(fd, header, 0)
+                os.replace(partial, path)
+            except BaseException:
+                os.close(fd)
+                os.unlink(partial)
+                raise
+            return fd
+
+    def _locate(self, key: bytes) -> tuple[int, int]:
+        key_hash = _key_hash(key)
+        return key_hash, key_hash % self.sets
+
+    def _slot_offset(self, set_index: int, way: int) -> int:
+        return self.slots_at + (set_index * self.ways + way) * self.slot_bytes
+
+    def get(self, key: str) -> bytes | None:
+        return self.get_with_expiry(key)[0]
+
+    def get_with_expiry(self, key: str) -> tuple[bytes | None, float]:
+        """The value and its expiry as a time.time() timestamp (0.0: never)."""
+        encoded = key.encode()
+        key_hash, set_index = self._locate(encoded)
+        buffer = self._map
+        tags = self._tags.unpack_from(
+            buffer, SEGMENT_HEADER_SIZE + set_index * self.ways * 8
+        )
+        if key_hash not in tags:
+            self.misses += 1
+            return None, 0.0
+        offset = self._slot_offset(set_index, tags.index(key_hash))
+        seq, slot_hash, expires_at, _, key_length, value_length = SLOT_HEADER.unpack_from(
+            buffer, offset
+        )
+        start = offset + SLOT_HEADER.size
+        if (
+            seq & 1
+            or slot_hash != key_hash
+            or key_length + value_length > self.capacity
+        ):
+            self.misses += 1
+            return None, 0.0
+        stored_key = buffer[start:start + key_length]
+        value = buffer[start + key_length:start + key_length + value_length]
+        now = time.time()
+        if (
+            _SEQ.unpack_from(buffer, offset)[0] != seq
+            or stored_key != encoded
+            or (expires_at and expires_at < now)
+        ):
+            self.misses += 1
+            return None, 0.0
+        # Unlocked and approximate: only eviction reads it.
+        _READ_AT.pack_into(buffer, offset + _READ_AT_OFFSET, now)
+        self.hits += 1
+        return value, expires_at
+
+    def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        """ttl caps the entry below self.ttl (a copy's remaining lifetime elsewhere)."""
+        encoded = key.encode()
+        if ttl is not None and ttl <= 0:
+            return
+        if len(encoded) + len(value) > self.capacity:
+            self.oversized += 1
+            return
+        if ttl is None or 0 < self.ttl < ttl:
+            ttl = self.ttl
+        key_hash, set_index = self._locate(encoded)
+        buffer = self._map
+        stripe = set_index % self.stripes
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+        try:
+            tags_at = SEGMENT_HEADER_SIZE + set_index * self.ways * 8
+            tags = self._tags.unpack_from(buffer, tags_at)
+            if key_hash in tags:
+                way = tags.index(key_hash)
+            else:
+                way = self._victim(set_index, tags)
+            offset = self._slot_offset(set_index, way)
+            # An odd counter left by a writer that died is already "in progress".
+            seq = _SEQ.unpack_from(buffer, offset)[0] | 1
+            _SEQ.pack_into(buffer, offset, seq)
+            now = time.time()
+            start = offset + SLOT_HEADER.size
+            buffer[start:start + len(encoded)] = encoded
+            buffer[start + len(encoded):start + len(encoded) + len(value)] = value
+            SLOT_HEADER.pack_into(
+                buffer,
+                offset,
+                seq,
+                key_hash,
+                now + ttl if ttl > 0 else 0.0,
+                now,
+                len(encoded),
+                len(value),
+            )
+            struct.pack_into("<Q", buffer, tags_at + way * 8, key_hash)
+            _SEQ.pack_into(buffer, offset, seq + 1)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def _victim(self, set_index: int, tags: tuple[int, ...]) -> int:
+        if 0 in tags:
+            return tags.index(0)
+        buffer = self._map
+        now = time.time()
+        victim = 0
+        oldest = float("inf")
+        for way in range(self.ways):
+            offset = self._slot_offset(set_index, way)
+            _, _, expires_at, read_at, _, _ = SLOT_HEADER.unpack_from(buffer, offset)
+            if expires_at and expires_at < now:
+                return way
+            if read_at < oldest:
+                victim, oldest = way, read_at
+        self.evictions += 1
+        return victim
+
+    def clear(self) -> None:
+        """Drop every entry, for all workers."""
+        buffer = self._map
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, self.stripes, 0)
+        try:
+            for index in range(self.sets * self.ways):
+                tag_at = SEGMENT_HEADER_SIZE + index * 8
+                if not struct.unpack_from("<Q", buffer, tag_at)[0]:
+                    continue
+                offset = self.slots_at + index * self.slot_bytes
+                seq = _SEQ.unpack_from(buffer, offset)[0] | 1
+                _SEQ.pack_into(buffer, offset, seq)
+                struct.pack_into("<Q", buffer, offset + 8, 0)
+                struct.pack_into("<Q", buffer, tag_at, 0)
+                _SEQ.pack_into(buffer, offset, seq + 1)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, self.stripes, 0)
+
+    def stats(self) -> dict[str, int]:
+        """Entry count and size are segment-wide; the counters are this worker's."""
+        tags = struct.unpack_from(
+            f"<{self.sets * self.ways}Q", self._map, SEGMENT_HEADER_SIZE
+        )
+        return {
+            "entries": sum(1 for tag in tags if tag),
+            "slots": self.sets * self.ways,
+            "max_bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "oversized": self.oversized,
+        }